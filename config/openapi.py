@@ -1,93 +1,350 @@
-def get_openapi_schema(base_url: str = "") -> dict:
+"""OpenAPI description of the JSON API served at /api/swagger.json.
+
+Paths are written by hand; the component schemas are generated from the
+models, ContactForm and the portfolio.serializers field maps, so they follow the
+code. The schema is built once per process and its encoded JSON memoized
+per `servers` URL.
+"""
+import copy
+import functools
+import hashlib
+import json
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+
+from portfolio import export, ingest
+from portfolio.forms import ContactForm
+from portfolio.models import ContactMessage, Project, ProjectCategory, SocialLinks
+from portfolio.serializers import CONTACT_FIELDS, PROJECT_FIELDS, PROJECT_LINKS, PROJECT_WORK_PERIOD, Column
+
+
+def _model_field_schema(field) -> dict:
+    # subclasses before their bases: DateTimeField < DateField, URLField < CharField
+    if isinstance(field, (models.AutoField, models.BigAutoField)):
+        schema = {"type": "integer", "readOnly": True}
+    elif isinstance(field, models.IntegerField):
+        schema = {"type": "integer"}
+    elif isinstance(field, models.BooleanField):
+        schema = {"type": "boolean"}
+    elif isinstance(field, models.DateTimeField):
+        schema = {"type": "string", "format": "date-time"}
+    elif isinstance(field, models.DateField):
+        schema = {"type": "string", "format": "date"}
+    elif isinstance(field, (models.URLField, models.FileField)):
+        schema = {"type": "string", "format": "uri"}
+    elif isinstance(field, models.EmailField):
+        schema = {"type": "string", "format": "email"}
+    elif isinstance(field, models.JSONField):
+        schema = {"type": "object"}
+    else:
+        schema = {"type": "string"}
+        if getattr(field, 'max_length', None):
+            schema["maxLength"] = field.max_length
+    if field.choices:
+        schema["enum"] = [value for value, _label in field.flatchoices]
+    if field.null:
+        schema["nullable"] = True
+    if field.help_text:
+        schema["description"] = str(field.help_text)
+    return schema
+
+
+def _object_schema(model, columns_by_key: dict) -> dict:
     return {
-        "openapi": "3.0.3",
-        "info": {
-            "title": "Portfolio API",
-            "version": "1.0.0",
-            "description": "API для проектов, отправки формы и соц. ссылок",
+        "type": "object",
+        "properties": {
+            key: _model_field_schema(model._meta.get_field(column))
+            for key, column in columns_by_key.items()
         },
-        "servers": [{"url": base_url or "/"}],
-        "paths": {
-            "/api/projects/": {
-                "get": {
-                    "summary": "Список проектов",
-                    "responses": {
-                        "200": {
-                            "description": "OK",
-                            "content": {
-                                "application/json": {
-                                    "schema": {
-                                        "type": "array",
-                                        "items": {"$ref": "#/components/schemas/Project"}
-                                    }
+    }
+
+
+def _nested_schema(nested) -> dict:
+    return _object_schema(Project, {key: field.column for key, field in nested.fields.items()})
+
+
+def _form_schema(form_class) -> dict:
+    properties, required = {}, []
+    for name, field in form_class.base_fields.items():
+        schema = {"type": "string"}
+        if isinstance(field, forms.EmailField):
+            schema["format"] = "email"
+        elif isinstance(field, forms.URLField):
+            schema["format"] = "uri"
+        if getattr(field, 'max_length', None):
+            schema["maxLength"] = field.max_length
+        properties[name] = schema
+        if field.required:
+            required.append(name)
+    return {"type": "object", "required": required, "properties": properties}
+
+
+def _project_schema() -> dict:
+    # output keys that aren't a plain model column
+    derived = {
+        "category_label": {"type": "string", "description": "Название категории"},
+        "work_period": _nested_schema(PROJECT_WORK_PERIOD),
+        "links": _nested_schema(PROJECT_LINKS),
+        "images": {
+            "type": "object",
+            "description": "Уменьшенные копии картинки: формат (avif, webp) -> ширина в px -> URL",
+            "additionalProperties": {
+                "type": "object",
+                "additionalProperties": {"type": "string", "format": "uri"}
+            }
+        },
+    }
+    properties = {}
+    for name, field in PROJECT_FIELDS.items():
+        if name in derived:
+            properties[name] = derived[name]
+        elif isinstance(field, Column) and field.column == name:
+            # converters keep the column's JSON format (ISO dates, media URLs)
+            properties[name] = _model_field_schema(Project._meta.get_field(name))
+        else:
+            raise ImproperlyConfigured(f"config/openapi.py has no schema for Project field {name!r}")
+    return {"type": "object", "properties": properties}
+
+
+def _paths() -> dict:
+    return {
+        "/api/projects/": {
+            "get": {
+                "summary": "Список проектов",
+                "parameters": [
+                    {
+                        "name": "limit",
+                        "in": "query",
+                        "required": False,
+                        "description": "Размер страницы. Без параметра возвращаются все проекты",
+                        "schema": {"type": "integer", "minimum": 1, "maximum": settings.PROJECTS_API_MAX_LIMIT},
+                    },
+                    {
+                        "name": "cursor",
+                        "in": "query",
+                        "required": False,
+                        "description": "Непрозрачный курсор следующей страницы из заголовка Link",
+                        "schema": {"type": "string"},
+                    },
+                    {
+                        "name": "fields",
+                        "in": "query",
+                        "required": False,
+                        "description": "Список полей Project через запятую, например id,name,image",
+                        "style": "form",
+                        "explode": False,
+                        "schema": {"type": "array", "items": {"type": "string", "enum": list(PROJECT_FIELDS)}},
+                    },
+                    {
+                        "name": "category",
+                        "in": "query",
+                        "required": False,
+                        "schema": {"type": "string", "enum": list(ProjectCategory.values)},
+                    },
+                ],
+                "responses": {
+                    "200": {
+                        "description": "OK",
+                        "headers": {
+                            "Link": {
+                                "description": 'Ссылка на следующую страницу: <url>; rel="next"',
+                                "schema": {"type": "string"},
+                            }
+                        },
+                        "content": {
+                            "application/json": {
+                                "schema": {
+                                    "type": "array",
+                                    "items": {"$ref": "#/components/schemas/Project"}
                                 }
                             }
                         }
-                    }
+                    },
+                    "400": {"description": "Bad Request"}
                 }
-            },
-            "/api/projects/{id}/": {
-                "get": {
-                    "summary": "Детали проекта",
-                    "parameters": [
-                        {"name": "id", "in": "path", "required": True, "schema": {"type": "integer"}}
-                    ],
-                    "responses": {
-                        "200": {
-                            "description": "OK",
-                            "content": {
-                                "application/json": {
-                                    "schema": {"$ref": "#/components/schemas/Project"}
+            }
+        },
+        "/api/projects/search/": {
+            "get": {
+                "summary": "Полнотекстовый поиск по проектам",
+                "parameters": [
+                    {"name": "q", "in": "query", "required": True, "schema": {"type": "string"}},
+                    {
+                        "name": "limit",
+                        "in": "query",
+                        "required": False,
+                        "schema": {"type": "integer", "minimum": 1, "maximum": settings.PROJECTS_API_MAX_LIMIT},
+                    },
+                ],
+                "responses": {
+                    "200": {
+                        "description": "Проекты по убыванию релевантности",
+                        "content": {
+                            "application/json": {
+                                "schema": {
+                                    "type": "array",
+                                    "items": {
+                                        "allOf": [
+                                            {"$ref": "#/components/schemas/Project"},
+                                            {"type": "object", "properties": {"rank": {"type": "number"}}}
+                                        ]
+                                    }
                                 }
                             }
-                        },
-                        "404": {"description": "Not Found"}
-                    }
+                        }
+                    },
+                    "400": {"description": "Bad Request"}
                 }
-            },
-            "/api/contact/": {
-                "post": {
-                    "summary": "Отправка сообщения формы",
-                    "requestBody": {
-                        "required": True,
+            }
+        },
+        "/api/projects/{id}/": {
+            "get": {
+                "summary": "Детали проекта",
+                "parameters": [
+                    {"name": "id", "in": "path", "required": True, "schema": {"type": "integer"}}
+                ],
+                "responses": {
+                    "200": {
+                        "description": "OK",
                         "content": {
-                            "application/json": {"schema": {"$ref": "#/components/schemas/ContactRequest"}},
-                            "application/x-www-form-urlencoded": {"schema": {"$ref": "#/components/schemas/ContactRequest"}},
+                            "application/json": {
+                                "schema": {"$ref": "#/components/schemas/Project"}
+                            }
                         }
                     },
-                    "responses": {
-                        "200": {"description": "OK", "content": {"application/json": {"schema": {"$ref": "#/components/schemas/OkResponse"}}}},
-                        "400": {"description": "Bad Request"}
+                    "404": {"description": "Not Found"}
+                }
+            }
+        },
+        "/api/contact/": {
+            "post": {
+                "summary": "Отправка сообщения формы",
+                "requestBody": {
+                    "required": True,
+                    "content": {
+                        "application/json": {"schema": {"$ref": "#/components/schemas/ContactRequest"}},
+                        "application/x-www-form-urlencoded": {"schema": {"$ref": "#/components/schemas/ContactRequest"}},
+                    }
+                },
+                "responses": {
+                    "200": {"description": "OK", "content": {"application/json": {"schema": {"$ref": "#/components/schemas/ContactResponse"}}}},
+                    "400": {"description": "Bad Request"},
+                    "429": {"description": "Too Many Requests"},
+                    "503": {"description": "Service Unavailable"}
+                }
+            }
+        },
+        "/api/social-links/": {
+            "get": {
+                "summary": "Получить соц. ссылки",
+                "responses": {
+                    "200": {
+                        "description": "OK",
+                        "content": {"application/json": {"schema": {"$ref": "#/components/schemas/SocialLinks"}}}
                     }
                 }
             },
-            "/api/social-links/": {
-                "get": {
-                    "summary": "Получить соц. ссылки",
-                    "responses": {
-                        "200": {
-                            "description": "OK",
-                            "content": {"application/json": {"schema": {"$ref": "#/components/schemas/SocialLinks"}}}
-                        }
+            "post": {
+                "summary": "Обновить соц. ссылки",
+                "security": [{"AdminToken": []}],
+                "requestBody": {
+                    "required": True,
+                    "content": {
+                        "application/json": {"schema": {"$ref": "#/components/schemas/SocialLinks"}},
+                        "application/x-www-form-urlencoded": {"schema": {"$ref": "#/components/schemas/SocialLinks"}},
                     }
                 },
-                "post": {
-                    "summary": "Обновить соц. ссылки",
-                    "security": [{"AdminToken": []}],
-                    "requestBody": {
+                "responses": {
+                    "200": {"description": "OK", "content": {"application/json": {"schema": {"$ref": "#/components/schemas/OkResponse"}}}},
+                    "401": {"description": "Unauthorized"}
+                }
+            }
+        },
+        "/api/export/{kind}/": {
+            "get": {
+                "summary": "Потоковая выгрузка проектов или заявок",
+                "description": (
+                    "Проекты упорядочены по (updated_at, id), заявки по (created_at, id). "
+                    "Выгрузка заявок доступна только staff-пользователю или с заголовком X-Admin-Token."
+                ),
+                # {}: the projects export needs no credentials
+                "security": [{"AdminToken": []}, {"StaffSession": []}, {}],
+                "parameters": [
+                    {
+                        "name": "kind",
+                        "in": "path",
                         "required": True,
+                        "schema": {"type": "string", "enum": list(export.EXPORTS)},
+                    },
+                    {
+                        "name": "format",
+                        "in": "query",
+                        "required": False,
+                        "schema": {"type": "string", "enum": list(export.FORMATS), "default": "ndjson"},
+                    },
+                    {
+                        "name": "since",
+                        "in": "query",
+                        "required": False,
+                        "description": (
+                            "ISO-дата или дата-время: только строки, изменённые (заявки — созданные) "
+                            "в этот момент или позже"
+                        ),
+                        "schema": {"type": "string"},
+                        "example": "2024-05-01T00:00:00+03:00",
+                    },
+                ],
+                "responses": {
+                    "200": {
+                        "description": "Файл-вложение; заявки отдаются с Cache-Control: no-store",
+                        "headers": {
+                            "Content-Disposition": {
+                                "description": 'attachment; filename="<kind>-<время>.<format>"',
+                                "schema": {"type": "string"},
+                            }
+                        },
                         "content": {
-                            "application/json": {"schema": {"$ref": "#/components/schemas/SocialLinks"}},
-                            "application/x-www-form-urlencoded": {"schema": {"$ref": "#/components/schemas/SocialLinks"}},
+                            export.FORMATS['ndjson']: {
+                                "schema": {
+                                    "type": "string",
+                                    "description": "Один JSON-объект Project или ContactMessage на строку",
+                                },
+                            },
+                            export.FORMATS['csv']: {
+                                "schema": {
+                                    "type": "string",
+                                    "description": (
+                                        "UTF-8 с BOM и строкой заголовков; вложенные объекты — столбцы "
+                                        "вида links.github"
+                                    ),
+                                },
+                            },
                         }
                     },
-                    "responses": {
-                        "200": {"description": "OK", "content": {"application/json": {"schema": {"$ref": "#/components/schemas/OkResponse"}}}},
-                        "401": {"description": "Unauthorized"}
-                    }
+                    "400": {"description": "Неизвестный format или неверный since"},
+                    "401": {"description": "Unauthorized (выгрузка заявок)"},
+                    "404": {"description": "Неизвестный kind"}
                 }
             }
+        }
+    }
+
+
+@functools.cache
+def _schema() -> dict:
+    social_fields = {f.name: f.name for f in SocialLinks._meta.concrete_fields if not f.primary_key}
+    return {
+        "openapi": "3.0.3",
+        "info": {
+            "title": "Portfolio API",
+            "version": "1.0.0",
+            "description": "API для проектов, отправки формы и соц. ссылок",
         },
+        "servers": [{"url": "/"}],
+        "paths": _paths(),
         "components": {
             "securitySchemes": {
                 "AdminToken": {
@@ -95,63 +352,45 @@ def get_openapi_schema(base_url: str = "") -> dict:
                     "in": "header",
                     "name": "X-Admin-Token",
                     "description": "Shared admin token из настроек сервера",
+                },
+                "StaffSession": {
+                    "type": "apiKey",
+                    "in": "cookie",
+                    "name": settings.SESSION_COOKIE_NAME,
+                    "description": "Сессия пользователя с is_staff после входа в админку",
                 }
             },
             "schemas": {
-                "Project": {
-                    "type": "object",
-                    "properties": {
-                        "id": {"type": "integer"},
-                        "name": {"type": "string"},
-                        "subtitle": {"type": "string"},
-                        "description": {"type": "string"},
-                        "category": {"type": "string", "enum": ["experience", "freelance", "personal"]},
-                        "category_label": {"type": "string"},
-                        "release_date": {"type": "string", "format": "date", "nullable": True},
-                        "work_period": {
-                            "type": "object",
-                            "properties": {
-                                "start": {"type": "string", "format": "date", "nullable": True},
-                                "end": {"type": "string", "format": "date", "nullable": True}
-                            }
-                        },
-                        "links": {
-                            "type": "object",
-                            "properties": {
-                                "google_play": {"type": "string", "format": "uri", "nullable": True},
-                                "rustore": {"type": "string", "format": "uri", "nullable": True},
-                                "appstore": {"type": "string", "format": "uri", "nullable": True},
-                                "github": {"type": "string", "format": "uri", "nullable": True},
-                                "extra_social": {"type": "string", "format": "uri", "nullable": True}
-                            }
-                        },
-                        "image": {"type": "string", "format": "uri", "nullable": True},
-                        "created_at": {"type": "string", "format": "date-time"},
-                        "updated_at": {"type": "string", "format": "date-time"}
-                    }
-                },
-                "ContactRequest": {
+                "Project": _project_schema(),
+                "ContactRequest": _form_schema(ContactForm),
+                "SocialLinks": _object_schema(SocialLinks, social_fields),
+                "ContactMessage": _object_schema(
+                    ContactMessage, {key: field.column for key, field in CONTACT_FIELDS.items()}
+                ),
+                "OkResponse": {
                     "type": "object",
-                    "required": ["full_name", "email", "message"],
-                    "properties": {
-                        "full_name": {"type": "string"},
-                        "email": {"type": "string", "format": "email"},
-                        "message": {"type": "string"}
-                    }
+                    "properties": {"ok": {"type": "boolean"}}
                 },
-                "SocialLinks": {
+                "ContactResponse": {
                     "type": "object",
                     "properties": {
-                        "telegram": {"type": "string", "format": "uri"},
-                        "github": {"type": "string", "format": "uri"},
-                        "linkedin": {"type": "string", "format": "uri"}
+                        "ok": {"type": "boolean"},
+                        "status": {"type": "string", "enum": [ingest.ACCEPTED, ingest.DUPLICATE]},
                     }
-                },
-                "OkResponse": {
-                    "type": "object",
-                    "properties": {"ok": {"type": "boolean"}}
                 }
             }
         }
     }
 
+
+def get_openapi_schema(base_url: str = "") -> dict:
+    schema = copy.copy(_schema())
+    schema["servers"] = [{"url": base_url or "/"}]
+    return schema
+
+
+@functools.lru_cache(maxsize=16)
+def get_openapi_document(base_url: str = "") -> tuple:
+    """(encoded JSON, ETag) of the schema for `base_url`."""
+    body = json.dumps(get_openapi_schema(base_url), ensure_ascii=False).encode()
+    return body, hashlib.sha1(body).hexdigest()
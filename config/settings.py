@@ -12,13 +12,16 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 import os
 from pathlib import Path
-from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-# Load environment variables from .env file
-load_dotenv(os.path.join(BASE_DIR, '.env'))
+# Load environment variables from .env file. Without one (variables set by
+# systemd or the container) python-dotenv isn't even imported.
+if (BASE_DIR / '.env').is_file():
+    from dotenv import load_dotenv
+
+    load_dotenv(BASE_DIR / '.env')
 
 
 # Quick-start development settings - unsuitable for production
@@ -45,15 +48,26 @@ INSTALLED_APPS = [
     'portfolio',
 ]
 
+# Every entry must be async-capable: under ASGI (DJANGO_ASYNC_API) a
+# sync-only middleware makes the requests behind it take turns on one thread.
 MIDDLEWARE = [
+    # first, so its timings cover the rest of the stack
+    'portfolio.middleware.PerformanceMiddleware',
+    # above everything that reads or changes the body; whitenoise serves
+    # its own precompressed files
+    'portfolio.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # whitenoise's own middleware is sync-only, which under ASGI would put
+    # every request on one thread
+    'portfolio.static.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # sends reads of the public read-only views to DATABASE_REPLICAS
+    'portfolio.routers.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -62,8 +76,15 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Cached explicitly (Django only implies it): compiled templates live
+            # for the whole worker, and gunicorn.conf.py fills it at startup.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -77,25 +98,121 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
+# Serve the JSON API with async views; only makes sense under ASGI (config.asgi)
+ASYNC_API = os.getenv('DJANGO_ASYNC_API', 'False').lower() == 'true'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': os.getenv('DB_NAME', 'postgres'),
-        'USER': os.getenv('DB_USER', 'postgres'),
-        'PASSWORD': os.getenv('DB_PASSWORD', ''),
-        'HOST': os.getenv('DB_HOST', '127.0.0.1'),
-        'PORT': os.getenv('DB_PORT', '5432'),
-        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
-        'OPTIONS': {
-            # Например, можно включать SSL через переменную окружения
-            # 'sslmode': os.getenv('DB_SSLMODE', 'prefer'),
-        },
+if os.getenv('DB_ENGINE', 'postgresql') == 'sqlite':
+    # Local development/testing against db.sqlite3
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('SQLITE_PATH', str(BASE_DIR / 'db.sqlite3')),
+        }
+    }
+    # Extra files posing as replicas, to try the router locally
+    for i, path in enumerate(p for p in os.getenv('SQLITE_REPLICA_PATHS', '').split(',') if p.strip()):
+        DATABASES[f'replica_{i}'] = {**DATABASES['default'], 'NAME': path.strip(), 'TEST': {'MIRROR': 'default'}}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'postgres'),
+            'USER': os.getenv('DB_USER', 'postgres'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', '127.0.0.1'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+            'OPTIONS': {
+                # Например, можно включать SSL через переменную окружения
+                # 'sslmode': os.getenv('DB_SSLMODE', 'prefer'),
+            },
+        }
+    }
+    # Streaming replicas of the same database: DB_REPLICA_HOSTS=10.0.0.2,10.0.0.3:5433
+    for i, host in enumerate(h for h in os.getenv('DB_REPLICA_HOSTS', '').split(',') if h.strip()):
+        replica_host, _, replica_port = host.strip().partition(':')
+        DATABASES[f'replica_{i}'] = {
+            **DATABASES['default'],
+            'HOST': replica_host,
+            'PORT': replica_port or DATABASES['default']['PORT'],
+            'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+            'TEST': {'MIRROR': 'default'},
+        }
+    # Behind PgBouncer in transaction pooling mode (Django 4.2 has no pool of its
+    # own): a server-side cursor doesn't outlive its transaction there, so
+    # .iterator() has to fetch with client-side cursors
+    if os.getenv('DB_PGBOUNCER', 'False').lower() == 'true':
+        for database in DATABASES.values():
+            database['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# Every alias but default is a read replica (portfolio.routers)
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['portfolio.routers.ReplicaRouter']
+# After writing, a client (cookie) and the cached pages (shared cache key)
+# read from the primary for this long, so replica lag doesn't show
+DATABASE_REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', '10'))
+
+
+# Cache
+# locmem — отдельный кеш в каждом процессе; file/redis — общий для всех воркеров
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', 'redis://127.0.0.1:6379/1'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': (
+                'django.core.cache.backends.filebased.FileBasedCache'
+                if CACHE_BACKEND == 'file'
+                else 'django.core.cache.backends.locmem.LocMemCache'
+            ),
+            'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / 'cache') if CACHE_BACKEND == 'file' else 'portfolio'),
+            'OPTIONS': {
+                # locmem evicts the least recently used entries past this limit
+                'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '1000')),
+            },
+        }
     }
-}
+
+# Content versions (portfolio.cache) and the replica pin must be seen by every
+# worker, or a save only invalidates what the saving worker cached. locmem
+# isn't shared, so with it they live in a file cache of their own.
+if CACHE_BACKEND == 'locmem':
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_SHARED_LOCATION', str(BASE_DIR / 'cache' / 'shared')),
+    }
+
+# FileBasedCache culls random entries once it holds MAX_ENTRIES, and an
+# evicted version restarts from the clock, dropping everything cached under
+# the old one. The versions are a couple of keys: in a file cache of their
+# own they never get near the threshold.
+if CACHE_BACKEND in ('locmem', 'file'):
+    CACHES['versions'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_VERSIONS_LOCATION', str(BASE_DIR / 'cache' / 'versions')),
+    }
+
+PORTFOLIO_CACHE_ALIAS = 'default'
+PORTFOLIO_SHARED_CACHE_ALIAS = 'shared' if CACHE_BACKEND == 'locmem' else 'default'
+PORTFOLIO_VERSION_CACHE_ALIAS = 'versions' if CACHE_BACKEND in ('locmem', 'file') else 'default'
+# How long a worker trusts the content version it last read; a save in
+# another worker shows up after at most this long
+PORTFOLIO_VERSION_TTL = float(os.getenv('PORTFOLIO_VERSION_TTL', '1'))  # seconds
+PORTFOLIO_CACHE_TIMEOUT = int(os.getenv('PORTFOLIO_CACHE_TIMEOUT', '86400'))  # seconds
+# How long a worker trusts its in-memory copy of SocialLinks before re-checking
+SOCIAL_LINKS_CACHE_TTL = int(os.getenv('SOCIAL_LINKS_CACHE_TTL', '30'))  # seconds
 
 
 # Password validation
@@ -142,6 +259,10 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Responsive derivatives of Project.image (manage.py build_image_variants)
+PROJECT_IMAGE_WIDTHS = (320, 640, 1024, 1600)
+PROJECT_IMAGE_QUALITY = int(os.getenv('PROJECT_IMAGE_QUALITY', '75'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -150,14 +271,96 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Telegram integration settings
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID', '')
+# Point at a local stub (manage.py telegram_stub) for tests
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')
+# Wait this long inline on a 429; longer retry_after values are rescheduled
+TELEGRAM_MAX_RETRY_WAIT = int(os.getenv('TELEGRAM_MAX_RETRY_WAIT', '5'))  # seconds
+
+# Telegram outbox (manage.py send_telegram_outbox)
+TELEGRAM_OUTBOX_BATCH_SIZE = int(os.getenv('TELEGRAM_OUTBOX_BATCH_SIZE', '50'))
+TELEGRAM_OUTBOX_MAX_ATTEMPTS = int(os.getenv('TELEGRAM_OUTBOX_MAX_ATTEMPTS', '8'))
+TELEGRAM_OUTBOX_BACKOFF_BASE = int(os.getenv('TELEGRAM_OUTBOX_BACKOFF_BASE', '30'))  # seconds
+TELEGRAM_OUTBOX_BACKOFF_MAX = int(os.getenv('TELEGRAM_OUTBOX_BACKOFF_MAX', '3600'))  # seconds
+TELEGRAM_OUTBOX_LEASE = int(os.getenv('TELEGRAM_OUTBOX_LEASE', '120'))  # seconds
+# Contacts a resend job from the admin queues per worker iteration
+CONTACT_RESEND_CHUNK_SIZE = int(os.getenv('CONTACT_RESEND_CHUNK_SIZE', '500'))
 
 # Admin token for social links API (shared secret)
 SOCIAL_ADMIN_TOKEN = os.getenv('SOCIAL_ADMIN_TOKEN', '')
 
+# Upper bound for ?limit= on /api/projects/
+PROJECTS_API_MAX_LIMIT = int(os.getenv('PROJECTS_API_MAX_LIMIT', '100'))
+
+# Token-bucket limits on contact form / API submissions (portfolio.ratelimit)
+RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'True').lower() == 'true'
+# memory: per process; cache: shared through PORTFOLIO_CACHE_ALIAS (use with redis/file caches)
+RATELIMIT_BACKEND = os.getenv('RATELIMIT_BACKEND', 'memory')
+RATELIMIT_CONTACT_IP = os.getenv('RATELIMIT_CONTACT_IP', '5/10m')
+RATELIMIT_CONTACT_EMAIL = os.getenv('RATELIMIT_CONTACT_EMAIL', '3/1h')
+# META key of the client address header set by the proxy, e.g. HTTP_X_REAL_IP
+RATELIMIT_IP_HEADER = os.getenv('RATELIMIT_IP_HEADER', '')
+
+# Contact submissions (portfolio.ingest): sync | batched_wait | batched
+CONTACT_INGEST_MODE = os.getenv('CONTACT_INGEST_MODE', 'sync')
+CONTACT_INGEST_BATCH_SIZE = int(os.getenv('CONTACT_INGEST_BATCH_SIZE', '100'))
+CONTACT_INGEST_FLUSH_MS = int(os.getenv('CONTACT_INGEST_FLUSH_MS', '200'))
+CONTACT_INGEST_WAIT_TIMEOUT = int(os.getenv('CONTACT_INGEST_WAIT_TIMEOUT', '10'))  # seconds, batched_wait
+# Same email + message within this many seconds is a duplicate; 0 disables it.
+# Kept in the shared cache (PORTFOLIO_SHARED_CACHE_ALIAS), so all workers see it
+CONTACT_DEDUP_WINDOW = int(os.getenv('CONTACT_DEDUP_WINDOW', '600'))
+
+# Admin changelists count at most this many rows (portfolio.pagination.EstimatedCountPaginator)
+ADMIN_COUNT_LIMIT = int(os.getenv('ADMIN_COUNT_LIMIT', '10000'))
+
+# Rows fetched per query by /api/export/ and manage.py export_data
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+
+# Performance instrumentation (portfolio.middleware.PerformanceMiddleware)
+# Server-Timing exposes DB timings to clients, so it is off by default in production
+PERF_SERVER_TIMING = os.getenv('PERF_SERVER_TIMING', str(DEBUG)).lower() == 'true'
+# Per-route histogram at /metrics, readable with "Authorization: Bearer <PERF_METRICS_TOKEN>"
+PERF_METRICS = os.getenv('PERF_METRICS', 'False').lower() == 'true'
+PERF_METRICS_TOKEN = os.getenv('PERF_METRICS_TOKEN', '')
+
+# Pre-rendered public pages (manage.py prerender), served by nginx from PRERENDER_ROOT/current
+PRERENDER_ROOT = os.getenv('PRERENDER_ROOT', str(BASE_DIR / 'prerendered'))
+# Public site URL the absolute links in pre-rendered pages are built with
+PRERENDER_BASE_URL = os.getenv('PRERENDER_BASE_URL', '')
+# Rebuild changed pages after every Project / SocialLinks save
+PRERENDER_ON_SAVE = os.getenv('PRERENDER_ON_SAVE', 'False').lower() == 'true'
+PRERENDER_KEEP_BUILDS = int(os.getenv('PRERENDER_KEEP_BUILDS', '3'))
+
+# Public site URL the worker warm-up renders the API pages with (their cached
+# bodies are per origin); without one only the host-independent pages are warmed
+WARMUP_BASE_URL = os.getenv('WARMUP_BASE_URL', PRERENDER_BASE_URL)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'portfolio.warmup': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        # one JSON line per request; PERF_LOG_LEVEL=WARNING silences it
+        'portfolio.performance': {
+            'handlers': ['console'],
+            'level': os.getenv('PERF_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 # Security settings for production
 if not DEBUG:
     # HTTPS settings
     SECURE_SSL_REDIRECT = True
+    # load balancer probes come over plain HTTP
+    SECURE_REDIRECT_EXEMPT = [r'^healthz/']
     SECURE_HSTS_SECONDS = 31536000  # 1 year
     SECURE_HSTS_INCLUDE_SUBDOMAINS = True
     SECURE_HSTS_PRELOAD = True
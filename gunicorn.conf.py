@@ -0,0 +1,11 @@
+"""gunicorn settings read from the project directory (gunicorn's default
+./gunicorn.conf.py); command-line flags in the systemd unit still win."""
+
+
+def post_worker_init(worker):
+    # The application is loaded by now: warm the worker up (templates,
+    # routes, database connection, caches) before it accepts its first
+    # request. /healthz/ready reports the timings.
+    from portfolio import warmup
+
+    warmup.run()
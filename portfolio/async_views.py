@@ -0,0 +1,101 @@
+"""Async versions of the JSON API views, enabled with ASYNC_API=True under ASGI.
+
+They share parsing, serialization and cache keys with portfolio.views, but
+await the ORM and the cache instead of occupying a worker thread.
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse, JsonResponse
+
+from . import conditional, ingest, snapshots
+from .cache import aget_social_links, aremember
+from .ratelimit import CONTACT_LIMITS, ratelimit
+from .serializers import Context, dumps, project_plan
+from .views import (
+    CONTACT_API_TITLE,
+    CONTACT_UNAVAILABLE,
+    _contact_form,
+    _detail_queryset,
+    _is_admin_token_valid,
+    _list_cache_name,
+    _list_page,
+    _list_params,
+    _list_queryset,
+    _list_response,
+    _update_social_links,
+)
+
+
+def _csrf_exempt(view):
+    # django.views.decorators.csrf.csrf_exempt only wraps coroutines since Django 5.0
+    view.csrf_exempt = True
+    return view
+
+
+async def projects_api(request):
+    try:
+        params = _list_params(request)
+    except ValueError as exc:
+        return JsonResponse({"detail": str(exc)}, status=400)
+    etag, last_modified = await conditional.aprojects_validators()
+    response = conditional.not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+
+    async def build():
+        page = await snapshots.apage(params, Context(request).origin)
+        if page is not None:
+            return page
+        rows = [row async for row in _list_queryset(params)]
+        return _list_page(request, rows, params)
+
+    body, next_cursor = await aremember(_list_cache_name(request, params), build)
+    return conditional.set_validators(_list_response(request, body, next_cursor), etag, last_modified)
+
+
+async def project_detail_api(request, pk: int):
+    etag, last_modified = await conditional.aproject_validators(pk)
+    response = conditional.not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+
+    async def build():
+        row = await _detail_queryset(pk).afirst()
+        if row is None:
+            raise Http404
+        return dumps(project_plan().serialize(row, Context(request)))
+
+    body = await aremember(f"detail:{pk}:{request.build_absolute_uri('/')}", build)
+    response = HttpResponse(body, content_type='application/json')
+    return conditional.set_validators(response, etag, last_modified)
+
+
+@_csrf_exempt
+@ratelimit('contact', CONTACT_LIMITS)
+async def contact_api(request):
+    if request.method != 'POST':
+        return JsonResponse({"detail": "Method not allowed"}, status=405)
+    form = _contact_form(request)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    try:
+        status = await ingest.asubmit(form, CONTACT_API_TITLE)
+    except ingest.IngestError:
+        return JsonResponse(CONTACT_UNAVAILABLE, status=503)
+    return JsonResponse({"ok": True, "status": status})
+
+
+@_csrf_exempt
+async def social_links_api(request):
+    if request.method in ('GET', 'HEAD'):
+        etag = await conditional.asocial_links_etag()
+        response = conditional.not_modified(request, etag)
+        if response is not None:
+            return response
+        data = await aget_social_links() or {"telegram": '', "github": '', "linkedin": ''}
+        return conditional.set_validators(JsonResponse(data), etag)
+    if request.method == 'POST':
+        if not _is_admin_token_valid(request):
+            return JsonResponse({"detail": "Unauthorized"}, status=401)
+        await sync_to_async(_update_social_links)(request)
+        return JsonResponse({"ok": True})
+    return JsonResponse({"detail": "Method not allowed"}, status=405)
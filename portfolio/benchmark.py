@@ -0,0 +1,194 @@
+"""Latency and throughput benchmark of the public endpoints.
+
+Data comes from `manage.py seed_benchmark`, which marks everything it
+creates (BENCH_SUBTITLE, BENCH_EMAIL_DOMAIN) so it can be told apart from
+real rows and removed. `manage.py benchmark` then drives ENDPOINTS either
+in-process through the Django test client or over HTTP against a local
+gunicorn, and reports p50/p95/p99 latency, requests per second and the
+database queries per request, read from the Server-Timing header that
+portfolio.middleware adds when PERF_SERVER_TIMING is on.
+
+A report saved as a baseline is the reference for later runs: compare()
+lists every endpoint that got slower, lost throughput or issues more
+queries than the baseline allows.
+"""
+import http.client
+import itertools
+import json
+import math
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+BENCH_SUBTITLE = 'benchmark'
+BENCH_EMAIL_DOMAIN = 'bench.example.com'
+
+# name -> (method, path); {pk} is a project from the seeded data
+ENDPOINTS = {
+    'home': ('GET', '/'),
+    'project_detail': ('GET', '/projects/{pk}/'),
+    'api_projects': ('GET', '/api/projects/'),
+    'api_projects_page': ('GET', '/api/projects/?limit=20'),
+    'api_contact': ('POST', '/api/contact/'),
+}
+
+_QUERIES = re.compile(r'\bdb;[^,]*desc="(\d+) queries"')
+_contact_numbers = itertools.count()
+
+
+def contact_payload() -> bytes:
+    # A new address every time, so the dedup window never kicks in.
+    n = next(_contact_numbers)
+    return json.dumps({
+        "full_name": "Нагрузочный тест",
+        "email": f"load{n}@{BENCH_EMAIL_DOMAIN}",
+        "message": f"Сообщение {n}",
+    }).encode()
+
+
+def queries_from(server_timing: str):
+    match = _QUERIES.search(server_timing or '')
+    return int(match.group(1)) if match else None
+
+
+def percentile(ordered: list, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize(latencies: list, queries: list, errors: int, wall: float) -> dict:
+    ordered = sorted(latencies)
+    counted = [q for q in queries if q is not None]
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "rps": round(len(ordered) / wall, 1) if wall else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+        "queries": round(sum(counted) / len(counted), 2) if counted else None,
+    }
+
+
+def _drive(send, requests: int, concurrency: int) -> dict:
+    """Calls send() `requests` times from `concurrency` threads.
+
+    send() returns (status, Server-Timing header) and must be safe to call
+    from several threads at once.
+    """
+    latencies, queries = [], []
+    errors = 0
+    lock = threading.Lock()
+    remaining = itertools.count(requests, -1)
+
+    def worker():
+        nonlocal errors
+        while next(remaining) > 0:
+            start = time.perf_counter()
+            try:
+                status, timing = send()
+            except Exception:
+                status, timing = 599, ''
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                queries.append(queries_from(timing))
+                errors += status >= 400
+    start = time.perf_counter()
+    if concurrency == 1:
+        # on this thread: it owns the database connection (and, under the
+        # test runner, the transaction holding the data)
+        worker()
+    else:
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return summarize(latencies, queries, errors, time.perf_counter() - start)
+
+
+def run_inprocess(endpoints: dict, requests: int, warmup: int) -> dict:
+    """Sequential requests through the test client, full middleware stack."""
+    from django.test import Client
+
+    client = Client(HTTP_ACCEPT_ENCODING='gzip')
+
+    def sender(method, path):
+        if method == 'POST':
+            return lambda: _status_timing(client.post(path, contact_payload(), content_type='application/json'))
+        return lambda: _status_timing(client.get(path))
+
+    results = {}
+    for name, (method, path) in endpoints.items():
+        send = sender(method, path)
+        for _ in range(warmup):
+            send()
+        results[name] = _drive(send, requests, 1)
+    return results
+
+
+def _status_timing(response) -> tuple:
+    if getattr(response, 'streaming', False):
+        b''.join(response.streaming_content)
+    return response.status_code, response.get('Server-Timing', '')
+
+
+def run_http(base_url: str, endpoints: dict, requests: int, warmup: int, concurrency: int, host: str = '') -> dict:
+    """Requests over HTTP, a new connection for each like nginx's default
+    HTTP/1.0 proxying (and gunicorn's sync workers) does."""
+    url = urlsplit(base_url)
+
+    def sender(method, path):
+        headers = {'Accept-Encoding': 'gzip', 'Host': host or url.netloc, 'Connection': 'close'}
+        if method == 'POST':
+            headers['Content-Type'] = 'application/json'
+
+        def send():
+            conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+            try:
+                body = contact_payload() if method == 'POST' else None
+                conn.request(method, url.path.rstrip('/') + path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                return response.status, response.getheader('Server-Timing', '')
+            finally:
+                conn.close()
+        return send
+
+    results = {}
+    for name, (method, path) in endpoints.items():
+        send = sender(method, path)
+        for _ in range(warmup):
+            send()
+        results[name] = _drive(send, requests, concurrency)
+    return results
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions of `report` against `baseline`, as readable lines.
+
+    Latency may grow and throughput drop by `tolerance` (0.2 = 20%), with
+    half a millisecond of slack for endpoints that answer in microseconds;
+    the average query count may grow by less than half a query.
+    """
+    problems = []
+    for name, current in report['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            continue
+        if current['errors']:
+            problems.append(f"{name}: {current['errors']} errors")
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            limit = base[key] * (1 + tolerance) + 0.5
+            if current[key] > limit:
+                problems.append(f"{name}: {key} {current[key]} > {limit:.2f} (baseline {base[key]})")
+        if current['rps'] < base['rps'] * (1 - tolerance):
+            problems.append(f"{name}: rps {current['rps']} < baseline {base['rps']}")
+        if current['queries'] is not None and base['queries'] is not None \
+                and current['queries'] >= base['queries'] + 0.5:
+            problems.append(f"{name}: queries {current['queries']} > baseline {base['queries']}")
+    return problems
@@ -0,0 +1,167 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from .models import SocialLinks
+
+PROJECTS_VERSION_KEY = 'portfolio:projects:version'
+SOCIAL_LINKS_VERSION_KEY = 'portfolio:social_links:version'
+
+_MISSING = object()
+
+
+def get_cache():
+    return caches[settings.PORTFOLIO_CACHE_ALIAS]
+
+
+def get_shared_cache():
+    """The cache every worker sees (replica pin, dedup keys): the default one
+    unless that is per-process locmem."""
+    return caches[settings.PORTFOLIO_SHARED_CACHE_ALIAS]
+
+
+def get_version_cache():
+    """The shared cache the content versions live in, one that never culls them."""
+    return caches[settings.PORTFOLIO_VERSION_CACHE_ALIAS]
+
+
+def _initial_version() -> int:
+    # If the version key is evicted, counting restarts from the current time,
+    # so it never goes back to a number that old entries are still stored under.
+    return int(time.time() * 1000)
+
+
+# key -> (version, monotonic time it was read): every request needs the
+# version, a file cache costs a stat and a read for it
+_versions_local = {}
+
+
+def _remembered(key: str):
+    entry = _versions_local.get(key)
+    if entry is not None and time.monotonic() - entry[1] < settings.PORTFOLIO_VERSION_TTL:
+        return entry[0]
+    return None
+
+
+def _version(key: str) -> int:
+    version = _remembered(key)
+    if version is not None:
+        return version
+    cache = get_version_cache()
+    version = cache.get(key)
+    if version is None:
+        version = _initial_version()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    _versions_local[key] = (version, time.monotonic())
+    return version
+
+
+async def _aversion(key: str) -> int:
+    version = _remembered(key)
+    if version is not None:
+        return version
+    cache = get_version_cache()
+    version = await cache.aget(key)
+    if version is None:
+        version = _initial_version()
+        if not await cache.aadd(key, version, timeout=None):
+            version = await cache.aget(key, version)
+    _versions_local[key] = (version, time.monotonic())
+    return version
+
+
+def _bump_version(key: str) -> None:
+    cache = get_version_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), timeout=None)
+    # this worker sees its own write at once, the others within
+    # PORTFOLIO_VERSION_TTL
+    _versions_local.pop(key, None)
+
+
+def projects_version() -> int:
+    return _version(PROJECTS_VERSION_KEY)
+
+
+def bump_projects_version() -> None:
+    _bump_version(PROJECTS_VERSION_KEY)
+
+
+def remember(name: str, compute):
+    """Returns the value cached under `name` for the current projects version."""
+    cache = get_cache()
+    key = f"portfolio:projects:{projects_version()}:{name}"
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        cache.set(key, value, timeout=settings.PORTFOLIO_CACHE_TIMEOUT)
+    return value
+
+
+async def aremember(name: str, compute):
+    """Async remember(); `compute` returns an awaitable."""
+    cache = get_cache()
+    key = f"portfolio:projects:{await _aversion(PROJECTS_VERSION_KEY)}:{name}"
+    value = await cache.aget(key, _MISSING)
+    if value is _MISSING:
+        value = await compute()
+        await cache.aset(key, value, timeout=settings.PORTFOLIO_CACHE_TIMEOUT)
+    return value
+
+
+def cached_json(request, name: str, build) -> HttpResponse:
+    """Returns a JSON response for `name`, calling `build()` only on a cache miss.
+
+    `build` must return the encoded bytes. Entries are keyed by the projects
+    content version, so a save/delete of any Project makes them unreachable.
+    """
+    # Image URLs are absolute, so the host is part of the payload.
+    body = remember(f"{name}:{request.build_absolute_uri('/')}", build)
+    return HttpResponse(body, content_type='application/json')
+
+
+# (shared version, monotonic time of the last version check, values)
+_social_links_local = (None, 0.0, None)
+
+
+def get_social_links():
+    """Returns SocialLinks values as a dict (or None if there is no row).
+
+    The values are kept in process memory and the shared version key is
+    consulted at most once per SOCIAL_LINKS_CACHE_TTL, so a page view
+    normally costs neither a query nor a cache round trip.
+    """
+    global _social_links_local
+    version, checked_at, data = _social_links_local
+    now = time.monotonic()
+    if version is not None and now - checked_at < settings.SOCIAL_LINKS_CACHE_TTL:
+        return data
+    current = _version(SOCIAL_LINKS_VERSION_KEY)
+    if current != version:
+        cache = get_cache()
+        key = f"portfolio:social_links:{current}"
+        data = cache.get(key, _MISSING)
+        if data is _MISSING:
+            data = SocialLinks.objects.values('telegram', 'github', 'linkedin').first()
+            cache.set(key, data, timeout=settings.PORTFOLIO_CACHE_TIMEOUT)
+    _social_links_local = (current, now, data)
+    return data
+
+
+async def aget_social_links():
+    version, checked_at, data = _social_links_local
+    if version is not None and time.monotonic() - checked_at < settings.SOCIAL_LINKS_CACHE_TTL:
+        return data
+    return await sync_to_async(get_social_links)()
+
+
+def invalidate_social_links() -> None:
+    global _social_links_local
+    _social_links_local = (None, 0.0, None)
+    _bump_version(SOCIAL_LINKS_VERSION_KEY)
@@ -0,0 +1,225 @@
+"""Negotiated brotli/gzip compression of dynamic responses.
+
+CompressionMiddleware works like django.middleware.gzip.GZipMiddleware, plus
+brotli when the optional `brotli` package is installed. Responses carrying
+an ETag (the condition()-decorated views) are versioned, so their compressed
+bodies are cached under (ETag, URL, encoding) at the highest compression
+level and reused until the content changes; everything else is compressed
+per request at a fast level. Streaming bodies (the exports) are compressed
+chunk by chunk as they go out, async iterators included.
+"""
+import gzip
+import hashlib
+import random
+import re
+import secrets
+import string
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import StreamingBuffer, compress_string
+
+from .cache import get_cache
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+# too small to be worth the CPU and the Content-Encoding header
+MIN_LENGTH = 200
+
+_COMPRESSIBLE_RE = re.compile(r'^(text/|application/(json|javascript|xml))')
+_ACCEPT_RE = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*')
+
+
+def _accepted(header: str) -> set:
+    encodings = set()
+    for item in header.split(','):
+        match = _ACCEPT_RE.fullmatch(item)
+        if not match:
+            continue
+        try:
+            q = float(match.group(2)) if match.group(2) is not None else 1.0
+        except ValueError:
+            continue
+        if q > 0:
+            encodings.add(match.group(1).lower())
+    return encodings
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    accepted = _accepted(accept_encoding)
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(data: bytes, encoding: str, best: bool = False) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if best else 5)
+    if best:
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    # per-request bodies may carry a CSRF token: pad like GZipMiddleware
+    # does against BREACH
+    return compress_string(data, max_random_bytes=100)
+
+
+def _padding_filename(max_random_bytes: int = 100) -> str:
+    # GzipFile writes the name into the header: random length against BREACH,
+    # like django.utils.text.compress_sequence()
+    return ''.join(random.choices(string.ascii_letters, k=secrets.randbelow(max_random_bytes) + 1))
+
+
+class _GzipStream:
+    def __init__(self):
+        self._buf = StreamingBuffer()
+        self._file = gzip.GzipFile(filename=_padding_filename(), mode='wb', compresslevel=6,
+                                   fileobj=self._buf, mtime=0)
+
+    def compress(self, chunk: bytes) -> bytes:
+        self._file.write(chunk)
+        return self._buf.read()
+
+    def finish(self) -> bytes:
+        self._file.close()
+        return self._buf.read()
+
+
+class _BrotliStream:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=5)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.process(chunk)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def _stream_compressor(encoding: str):
+    return _BrotliStream() if encoding == 'br' else _GzipStream()
+
+
+def _compressed_chunks(chunks, encoding: str):
+    compressor = _stream_compressor(encoding)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def _acompressed_chunks(chunks, encoding: str):
+    compressor = _stream_compressor(encoding)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def _cacheable(response) -> bool:
+    # An ETag means the body is fully determined by a content version; a
+    # cookie means it may be per-user.
+    vary = response.get('Vary', '').lower()
+    return response.has_header('ETag') and 'cookie' not in vary and not response.cookies
+
+
+def _cache_key(request, response, encoding: str) -> str:
+    digest = hashlib.sha1(f"{response['ETag']}|{request.build_absolute_uri()}".encode()).hexdigest()
+    return f"portfolio:compressed:{encoding}:{digest}"
+
+
+def _encoding(request, response) -> str | None:
+    """The encoding to compress `response` with, or None to leave it as is."""
+    if response.has_header('Content-Encoding') or not _COMPRESSIBLE_RE.match(response.get('Content-Type', '')):
+        return None
+    # Vary even when this client gets the plain body, so shared caches
+    # don't hand it to everyone.
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if not response.streaming and len(response.content) < MIN_LENGTH:
+        return None
+    return choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+
+
+def _encoded(response, encoding: str) -> None:
+    response['Content-Encoding'] = encoding
+    # The compressed body is no longer byte-identical to what the strong
+    # ETag named (RFC 9110 8.8.1), same as GZipMiddleware does.
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+
+
+def _compress_stream(response, encoding: str) -> None:
+    # Chunk by chunk, never buffered or cached; an async iterator stays
+    # one, so the ASGI handler doesn't have to drain it in a thread.
+    if response.is_async:
+        response.streaming_content = _acompressed_chunks(response.streaming_content, encoding)
+    else:
+        response.streaming_content = _compressed_chunks(response.streaming_content, encoding)
+    del response['Content-Length']
+    _encoded(response, encoding)
+
+
+def _use(response, compressed: bytes, encoding: str) -> None:
+    if len(compressed) >= len(response.content):
+        return
+    response.content = compressed
+    response['Content-Length'] = str(len(compressed))
+    _encoded(response, encoding)
+
+
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        encoding = _encoding(request, response)
+        if encoding is None:
+            return response
+        if response.streaming:
+            _compress_stream(response, encoding)
+        elif _cacheable(response):
+            cache = get_cache()
+            key = _cache_key(request, response, encoding)
+            compressed = cache.get(key)
+            if compressed is None:
+                compressed = compress(response.content, encoding, best=True)
+                cache.set(key, compressed, timeout=settings.PORTFOLIO_CACHE_TIMEOUT)
+            _use(response, compressed, encoding)
+        else:
+            _use(response, compress(response.content, encoding), encoding)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        encoding = _encoding(request, response)
+        if encoding is None:
+            return response
+        if response.streaming:
+            _compress_stream(response, encoding)
+        elif _cacheable(response):
+            cache = get_cache()
+            key = _cache_key(request, response, encoding)
+            compressed = await cache.aget(key)
+            if compressed is None:
+                compressed = compress(response.content, encoding, best=True)
+                await cache.aset(key, compressed, timeout=settings.PORTFOLIO_CACHE_TIMEOUT)
+            _use(response, compressed, encoding)
+        else:
+            _use(response, compress(response.content, encoding), encoding)
+        return response
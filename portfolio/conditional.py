@@ -0,0 +1,117 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .cache import aget_social_links, aremember, get_social_links, remember
+from .models import Project
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha1('|'.join(str(p) for p in parts).encode()).hexdigest()
+
+
+def _projects_etag(state: dict) -> str:
+    return _digest('projects', state['count'], state['last_modified'])
+
+
+def _project_etag(pk, updated_at):
+    if updated_at is None:
+        return None
+    return _digest('project', pk, updated_at)
+
+
+def _projects_state() -> dict:
+    return remember(
+        'state',
+        lambda: Project.objects.aggregate(count=Count('id'), last_modified=Max('updated_at')),
+    )
+
+
+def _project_updated_at(pk):
+    return remember(
+        f'updated_at:{pk}',
+        lambda: Project.objects.filter(pk=pk).values_list('updated_at', flat=True).first(),
+    )
+
+
+def _social_links_digest() -> str:
+    return _digest('social', get_social_links())
+
+
+def projects_etag(request, *args, **kwargs):
+    return _projects_etag(_projects_state())
+
+
+def projects_last_modified(request, *args, **kwargs):
+    return _projects_state()['last_modified']
+
+
+def project_etag(request, pk, *args, **kwargs):
+    return _project_etag(pk, _project_updated_at(pk))
+
+
+def project_last_modified(request, pk, *args, **kwargs):
+    return _project_updated_at(pk)
+
+
+def social_links_etag(request, *args, **kwargs):
+    return _social_links_digest()
+
+
+# HTML pages also render the social links, which carry no timestamp, so they
+# only get an ETag: a Last-Modified based on projects alone would let
+# If-Modified-Since hide a social links change.
+
+def home_etag(request, *args, **kwargs):
+    return _digest(projects_etag(request), _social_links_digest())
+
+
+def project_page_etag(request, pk, *args, **kwargs):
+    etag = project_etag(request, pk)
+    if etag is None:
+        return None
+    return _digest(etag, _social_links_digest())
+
+
+# Async views can't use django.views.decorators.http.condition (Django < 5.0),
+# so they fetch validators with the helpers below and call not_modified().
+
+async def aprojects_validators() -> tuple:
+    state = await aremember(
+        'state',
+        lambda: Project.objects.aaggregate(count=Count('id'), last_modified=Max('updated_at')),
+    )
+    return _projects_etag(state), state['last_modified']
+
+
+async def aproject_validators(pk) -> tuple:
+    updated_at = await aremember(
+        f'updated_at:{pk}',
+        lambda: Project.objects.filter(pk=pk).values_list('updated_at', flat=True).afirst(),
+    )
+    return _project_etag(pk, updated_at), updated_at
+
+
+async def asocial_links_etag() -> str:
+    return _digest('social', await aget_social_links())
+
+
+def not_modified(request, etag=None, last_modified=None):
+    """Same check as condition(): a 304/412 response, or None to run the view."""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    return get_conditional_response(
+        request,
+        etag=quote_etag(etag) if etag else None,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+
+
+def set_validators(response, etag=None, last_modified=None):
+    if etag:
+        response.headers.setdefault('ETag', quote_etag(etag))
+    if last_modified:
+        response.headers.setdefault('Last-Modified', http_date(last_modified.timestamp()))
+    return response
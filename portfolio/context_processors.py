@@ -1,14 +1,14 @@
-from .models import SocialLinks
+from .cache import get_social_links
 
 
 def social_links(_request):
-    link_obj = SocialLinks.objects.first()
+    link_obj = get_social_links()
     links = []
     if link_obj:
         links = [
-            {"label": "Telegram", "url": link_obj.telegram or ''},
-            {"label": "GitHub", "url": link_obj.github or ''},
-            {"label": "LinkedIn", "url": link_obj.linkedin or ''},
+            {"label": "Telegram", "url": link_obj['telegram'] or ''},
+            {"label": "GitHub", "url": link_obj['github'] or ''},
+            {"label": "LinkedIn", "url": link_obj['linkedin'] or ''},
         ]
     return {"social_links": links}
 
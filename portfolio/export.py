@@ -0,0 +1,142 @@
+"""Streaming exports of projects and contact messages as NDJSON or CSV.
+
+Rows are read with .values_list().iterator(chunk_size=EXPORT_CHUNK_SIZE)
+and encoded a few hundred at a time, so memory stays flat whatever the
+number of rows. Projects are exported in (updated_at, id) order and
+contacts in (created_at, id) order; `since` keeps rows changed at or
+after that moment, so a consumer can resume from the last timestamp it
+saw. Used by /api/export/<kind>/ and manage.py export_data.
+"""
+import csv
+import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import ContactMessage, Project
+from .serializers import CONTACT_FIELDS, PROJECT_FIELDS, Nested, contact_plan, dumps, project_plan
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+# kind -> (model, fields, plan factory, column `since` filters on)
+EXPORTS = {
+    'projects': (Project, PROJECT_FIELDS, project_plan, 'updated_at'),
+    'contacts': (ContactMessage, CONTACT_FIELDS, contact_plan, 'created_at'),
+}
+
+# rows encoded per chunk handed to the server
+_ROWS_PER_WRITE = 200
+
+# Spreadsheets run a cell starting with one of these as a formula; contact
+# messages are visitor input, so such cells get a leading quote.
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def parse_since(value: str | None):
+    """ISO date or datetime -> aware datetime; raises ValueError."""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError("since must be an ISO date or datetime")
+        moment = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def filename(kind: str, fmt: str) -> str:
+    return f"{kind}-{timezone.now():%Y%m%d-%H%M%S}.{fmt}"
+
+
+def queryset(kind: str, since):
+    model, _fields, plan_factory, since_column = EXPORTS[kind]
+    rows = model.objects.order_by(since_column, 'id')
+    if since is not None:
+        rows = rows.filter(**{f'{since_column}__gte': since})
+    return rows.values_list(*plan_factory().columns)
+
+
+def _rows(kind: str, since):
+    return queryset(kind, since).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+
+def _records(kind: str, since, context):
+    plan = EXPORTS[kind][2]()
+    for row in _rows(kind, since):
+        yield plan.serialize(row, context)
+
+
+def _ndjson(records):
+    for record in records:
+        yield dumps(record) + b'\n'
+
+
+class _Echo:
+    """File-like object whose write() hands the CSV line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def _csv(kind: str, records):
+    # Nested objects become "name.key" columns; other dicts (images) stay JSON.
+    fields = EXPORTS[kind][1]
+    columns = []
+    for name, field in fields.items():
+        if isinstance(field, Nested):
+            columns.extend((name, key) for key in field.fields)
+        else:
+            columns.append((name, None))
+
+    def cell(value):
+        if value is None:
+            return ''
+        if isinstance(value, (dict, list)):
+            return dumps(value).decode()
+        if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+            return "'" + value
+        return value
+
+    writer = csv.writer(_Echo())
+    # BOM so Excel opens the Cyrillic text as UTF-8
+    yield ('\ufeff' + writer.writerow([name if key is None else f'{name}.{key}' for name, key in columns])).encode()
+    for record in records:
+        yield writer.writerow([
+            cell(record[name] if key is None else record[name][key]) for name, key in columns
+        ]).encode()
+
+
+def stream(kind: str, fmt: str, since, context):
+    """Yields the encoded export in chunks of _ROWS_PER_WRITE rows."""
+    records = _records(kind, since, context)
+    lines = _ndjson(records) if fmt == 'ndjson' else _csv(kind, records)
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= _ROWS_PER_WRITE:
+            yield b''.join(batch)
+            batch = []
+    if batch:
+        yield b''.join(batch)
+
+
+async def aiterate(chunks):
+    """Async iterator over a sync one, for StreamingHttpResponse under ASGI.
+
+    Django would otherwise read a sync iterator to the end before sending
+    it. Every step runs in the thread that owns the database connection.
+    """
+    step = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await step(chunks, None)
+        if chunk is None:
+            break
+        yield chunk
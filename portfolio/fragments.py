@@ -0,0 +1,90 @@
+"""Cached template fragments for the HTML pages, and template preloading.
+
+Project cards on the home page are rendered one by one and cached under
+(template version, pk, updated_at), so a page view fetches them with one
+get_many() and renders only the cards of projects saved since. The cards
+come in as plain dicts (the list snapshot stores them that way); only a
+card that has to be rendered becomes a Project. The detail
+page caches its body with {% cache %} on the same values.
+
+A template's version is a hash of its source: a deploy that changes it
+makes the old fragments unreachable instead of serving them until they
+expire.
+
+preload_templates() compiles every project template into the cached
+loader; gunicorn.conf.py calls it when a worker starts.
+"""
+import datetime
+import hashlib
+import logging
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from .cache import get_cache
+from .models import Project
+
+logger = logging.getLogger('portfolio.fragments')
+
+CARD_TEMPLATE = 'portfolio/_project_card.html'
+
+# Fields a card shows, plus what its cache key is made of
+CARD_FIELDS = ('id', 'updated_at', 'name', 'subtitle', 'category', 'image', 'image_variants')
+
+
+def template_version(name: str) -> str:
+    return hashlib.sha1(get_template(name).template.source.encode()).hexdigest()[:12]
+
+
+def card_data(projects) -> list:
+    """Cards of a Project queryset, shaped like snapshots.cards() stores them."""
+    return [
+        {**card, 'updated_at': card['updated_at'].isoformat()}
+        for card in projects.values(*CARD_FIELDS)
+    ]
+
+
+def render_project_cards(cards) -> str:
+    """Renders card_data()/snapshots.cards() dicts; a Project instance is
+    only built for a card that isn't in the cache."""
+    template = get_template(CARD_TEMPLATE)
+    version = template_version(CARD_TEMPLATE)
+    keys = {f"portfolio:card:{version}:{card['id']}:{card['updated_at']}": card for card in cards}
+    cache = get_cache()
+    found = cache.get_many(list(keys))
+    rendered = {}
+    parts = []
+    for key, card in keys.items():
+        html = found.get(key)
+        if html is None:
+            project = Project(**{**card, 'updated_at': datetime.datetime.fromisoformat(card['updated_at'])})
+            html = rendered[key] = template.render({'p': project})
+        parts.append(html)
+    if rendered:
+        cache.set_many(rendered, timeout=settings.PORTFOLIO_CACHE_TIMEOUT)
+    return mark_safe(''.join(parts))
+
+
+def preload_templates() -> int:
+    """Compiles the templates under TEMPLATES['DIRS']; returns how many.
+
+    With the cached loader the compiled templates stay in the worker, so
+    the first request it serves doesn't pay for parsing them.
+    """
+    start = time.perf_counter()
+    count = 0
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for directory in engine.engine.dirs:
+            directory = Path(directory)
+            for path in sorted(directory.rglob('*.html')):
+                engine.get_template(path.relative_to(directory).as_posix())
+                count += 1
+    logger.info("Preloaded %d templates in %.1f ms", count, (time.perf_counter() - start) * 1000)
+    return count
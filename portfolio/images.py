@@ -0,0 +1,146 @@
+import hashlib
+import io
+import logging
+from functools import partial
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'projects/variants'
+
+# Preferred first: browsers pick the first <source> they support.
+FORMATS = (
+    ('avif', 'AVIF', 'image/avif'),
+    ('webp', 'WEBP', 'image/webp'),
+)
+
+
+def available_formats() -> list:
+    from PIL import Image
+
+    Image.init()
+    return [(ext, pil_format, mime) for ext, pil_format, mime in FORMATS if pil_format in Image.SAVE]
+
+
+def _open(data: bytes):
+    from PIL import Image, ImageOps
+
+    img = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'transparency' in img.info or img.mode in ('LA', 'PA') else 'RGB')
+    return img
+
+
+def build_variants(image) -> dict:
+    """Renders every width/format derivative of `image` (a FieldFile).
+
+    File names carry a hash of the source bytes, so derivatives can be
+    served with far-future caching and are reused when they already exist.
+    """
+    from PIL import Image
+
+    with image.open('rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    img = _open(data)
+    stem = PurePosixPath(image.name).stem
+    widths = sorted({min(w, img.width) for w in settings.PROJECT_IMAGE_WIDTHS})
+
+    formats = {}
+    for ext, pil_format, _mime in available_formats():
+        for width in widths:
+            name = f"{VARIANTS_DIR}/{stem}-{digest}-{width}.{ext}"
+            if not default_storage.exists(name):
+                resized = img.copy()
+                resized.thumbnail((width, img.height), Image.LANCZOS)
+                buf = io.BytesIO()
+                resized.save(buf, pil_format, quality=settings.PROJECT_IMAGE_QUALITY)
+                name = default_storage.save(name, ContentFile(buf.getvalue()))
+            formats.setdefault(ext, {})[str(width)] = name
+    return {
+        'source': image.name,
+        'hash': digest,
+        'width': img.width,
+        'height': img.height,
+        'formats': formats,
+    }
+
+
+def refresh_variants(project, force: bool = False) -> bool:
+    """Brings `project.image_variants` in line with `project.image`. Returns True if changed."""
+    if not project.image:
+        variants = {}
+    elif not force and project.image_variants.get('source') == project.image.name:
+        return False
+    else:
+        try:
+            variants = build_variants(project.image)
+        except Exception:
+            logger.exception('Не удалось построить варианты картинки проекта %s', project.pk)
+            return False
+    if variants == project.image_variants:
+        return False
+    project.image_variants = variants
+    # An ordinary save: the snapshot, the content version and the
+    # pre-rendered pages follow it through the post_save receivers.
+    project.save(update_fields=['image_variants', 'updated_at'])
+    return True
+
+
+def drop_stale_variants(project) -> None:
+    """Forgets variants of a previous image, in the save that replaces it.
+
+    The new ones are only built once that save has committed (see
+    refresh_on_commit()); until then the page shows the plain <img>.
+    """
+    source = project.image.name if project.image else None
+    if project.image_variants and project.image_variants.get('source') != source:
+        project.image_variants = {}
+
+
+def _refresh_saved(pk) -> None:
+    from .models import Project
+
+    project = Project.objects.filter(pk=pk).first()
+    if project is not None:
+        refresh_variants(project)
+
+
+def refresh_on_commit(project) -> None:
+    """Builds the variants of a newly saved image after the save commits.
+
+    Encoding AVIF/WebP takes seconds; outside the transaction it holds no
+    locks, and a rolled-back save leaves no files behind.
+    """
+    if project.image and project.image_variants.get('source') != project.image.name:
+        transaction.on_commit(partial(_refresh_saved, project.pk), robust=True)
+
+
+def variant_urls(variants: dict, absolute=None) -> dict:
+    """{format: {width: url}} for the stored variants."""
+    urls = {}
+    for ext, by_width in (variants or {}).get('formats', {}).items():
+        urls[ext] = {}
+        for width, name in by_width.items():
+            url = default_storage.url(name)
+            urls[ext][width] = absolute(url) if absolute else url
+    return urls
+
+
+def picture_sources(variants: dict) -> list:
+    """<source> attributes for a <picture> element, preferred format first."""
+    mimes = {ext: mime for ext, _pil_format, mime in FORMATS}
+    urls = variant_urls(variants)
+    return [
+        {
+            'type': mimes[ext],
+            'srcset': ', '.join(f"{urls[ext][width]} {width}w" for width in sorted(urls[ext], key=int)),
+        }
+        for ext, _pil_format, _mime in FORMATS
+        if urls.get(ext)
+    ]
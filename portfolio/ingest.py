@@ -0,0 +1,216 @@
+"""Write path for contact form submissions.
+
+submit() stores a validated ContactForm according to CONTACT_INGEST_MODE:
+
+  sync          save the message and its outbox row in one transaction
+                before answering (the default)
+  batched_wait  hand it to the flusher thread and answer once its batch has
+                committed: as durable as sync, one transaction per batch
+  batched       hand it to the flusher and answer at once; messages still
+                queued when the process dies are lost
+
+The flusher bulk_creates a batch every CONTACT_INGEST_FLUSH_MS milliseconds
+or CONTACT_INGEST_BATCH_SIZE messages, whichever comes first.
+
+A submission with the same email and message as one accepted within the
+last CONTACT_DEDUP_WINDOW seconds (10 minutes by default, 0 turns it off)
+is dropped as a duplicate, in any mode; it mostly matters for the batched
+ones, where a double submit can't be told apart by the database. The
+check is a cache.add() on a content hash in the shared cache, so every
+worker sees it.
+
+A message that could not be saved raises IngestError in sync and
+batched_wait modes; the views answer it with 503. When batched_wait times
+out, a message still in the queue is withdrawn, so the 503 is true and a
+retry can't store it twice; one the flusher is already saving is reported
+as accepted.
+"""
+import atexit
+import hashlib
+import logging
+import queue
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .cache import get_shared_cache
+from .models import ContactMessage
+from .outbox import enqueue_contacts
+
+logger = logging.getLogger('portfolio.ingest')
+
+ACCEPTED = 'accepted'
+DUPLICATE = 'duplicate'
+
+
+class IngestError(Exception):
+    pass
+
+
+class _Pending:
+    __slots__ = ('data', 'title', 'dedup_key', 'done', 'error', 'state', 'lock')
+
+    QUEUED, TAKEN, CANCELLED = 'queued', 'taken', 'cancelled'
+
+    def __init__(self, data: dict, title: str, dedup_key):
+        self.data = data
+        self.title = title
+        self.dedup_key = dedup_key
+        self.done = threading.Event()
+        self.error = None
+        self.state = self.QUEUED
+        self.lock = threading.Lock()
+
+    def _move(self, state: str) -> bool:
+        """QUEUED -> `state`; False if the flusher or the waiter got there first."""
+        with self.lock:
+            if self.state != self.QUEUED:
+                return False
+            self.state = state
+            return True
+
+    def take(self) -> bool:
+        """Called by the flusher before saving the item."""
+        return self._move(self.TAKEN)
+
+    def wait(self) -> None:
+        if not self.done.wait(settings.CONTACT_INGEST_WAIT_TIMEOUT):
+            if self._move(self.CANCELLED):
+                _release(self.dedup_key)
+                raise IngestError("Timed out waiting for the contact batch to be saved")
+            # Part of a batch being saved: failing now would have the sender
+            # retry a message that is most likely stored already.
+            logger.warning("Contact batch is slow to commit; reporting the message as accepted")
+            return
+        if self.error is not None:
+            raise IngestError("Could not save the contact message") from self.error
+
+
+def _dedup_key(data: dict):
+    if settings.CONTACT_DEDUP_WINDOW <= 0:
+        return None
+    content = f"{data['email'].strip().lower()}\n{data['message'].strip()}"
+    return f"portfolio:contact-dedup:{hashlib.sha1(content.encode()).hexdigest()}"
+
+
+def _release(key) -> None:
+    # the message wasn't stored after all: let the sender try again
+    if key is not None:
+        get_shared_cache().delete(key)
+
+
+def _save(items: list) -> list:
+    """Saves [(cleaned data, title)] and their outbox rows in one transaction."""
+    with transaction.atomic():
+        contacts = ContactMessage.objects.bulk_create([ContactMessage(**data) for data, _title in items])
+        enqueue_contacts([(contact, title) for contact, (_data, title) in zip(contacts, items)])
+    return contacts
+
+
+class _Flusher(threading.Thread):
+    def __init__(self):
+        super().__init__(name='contact-ingest', daemon=True)
+        self.queue = queue.Queue()
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            first = self.queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = time.monotonic() + settings.CONTACT_INGEST_FLUSH_MS / 1000
+            while len(batch) < settings.CONTACT_INGEST_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self.flush(batch)
+
+    def flush(self, batch: list) -> None:
+        batch = [pending for pending in batch if pending.take()]
+        if not batch:
+            return
+        close_old_connections()
+        try:
+            _save([(p.data, p.title) for p in batch])
+        except Exception as exc:
+            logger.exception("Failed to save %d contact messages", len(batch))
+            for pending in batch:
+                pending.error = exc
+                _release(pending.dedup_key)
+        finally:
+            for pending in batch:
+                pending.done.set()
+
+    def stop(self, timeout: float = 5) -> None:
+        self.queue.put(None)
+        self.join(timeout)
+
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def _get_flusher() -> _Flusher:
+    global _flusher
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = _Flusher()
+            _flusher.start()
+            atexit.register(_flusher.stop)
+        return _flusher
+
+
+def _store(data: dict, title: str, key):
+    """Stores an accepted submission per CONTACT_INGEST_MODE; the pending
+    item to wait for, or None when there is nothing to wait for."""
+    mode = settings.CONTACT_INGEST_MODE
+    if mode == 'sync':
+        try:
+            _save([(data, title)])
+        except Exception as exc:
+            _release(key)
+            raise IngestError("Could not save the contact message") from exc
+        return None
+    pending = _Pending(data, title, key)
+    _get_flusher().queue.put(pending)
+    return pending if mode == 'batched_wait' else None
+
+
+def submit(form, title: str) -> str:
+    """Stores a valid ContactForm; returns ACCEPTED or DUPLICATE.
+
+    Raises IngestError if sync or batched_wait could not save the message.
+    """
+    data = form.cleaned_data
+    key = _dedup_key(data)
+    if key is not None and not get_shared_cache().add(key, 1, timeout=settings.CONTACT_DEDUP_WINDOW):
+        return DUPLICATE
+    pending = _store(data, title, key)
+    if pending is not None:
+        pending.wait()
+    return ACCEPTED
+
+
+async def asubmit(form, title: str) -> str:
+    """submit() for async views: waits for the batch without holding a thread
+    that the sync ORM needs."""
+    data = form.cleaned_data
+    key = _dedup_key(data)
+    if key is not None and not await get_shared_cache().aadd(key, 1, timeout=settings.CONTACT_DEDUP_WINDOW):
+        return DUPLICATE
+    pending = await sync_to_async(_store)(data, title, key)
+    if pending is not None:
+        await sync_to_async(pending.wait, thread_sensitive=False)()
+    return ACCEPTED
@@ -0,0 +1,176 @@
+import http.client
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from portfolio import benchmark
+from portfolio.models import ContactMessage, Project
+from portfolio.telegram_stub import StubTelegramServer
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = ('Измеряет задержку (p50/p95/p99), RPS и число запросов к БД на публичных '
+            'эндпоинтах: в процессе через тестовый клиент или по HTTP через gunicorn. '
+            'Данные — manage.py seed_benchmark')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', action='append', choices=list(benchmark.ENDPOINTS),
+                            help='Можно повторять; по умолчанию все')
+        parser.add_argument('--requests', type=int, default=200, help='Запросов на эндпоинт')
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--http', action='store_true', help='Поднять локальный gunicorn и гонять запросы по HTTP')
+        parser.add_argument('--url', help='Уже запущенный сервер вместо gunicorn, например http://127.0.0.1:8000')
+        parser.add_argument('--host', default='', help='Заголовок Host для --http/--url')
+        parser.add_argument('--concurrency', type=int, default=4, help='Параллельных соединений в HTTP-режиме')
+        parser.add_argument('--workers', type=int, default=2, help='Воркеров gunicorn')
+        parser.add_argument('--worker-class', default='sync',
+                            help='Например uvicorn.workers.UvicornWorker для ASGI')
+        parser.add_argument('--save-baseline', metavar='PATH', help='Сохранить отчёт как эталон')
+        parser.add_argument('--baseline', metavar='PATH', help='Сравнить с эталоном и упасть при регрессии')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Допустимое ухудшение, доля')
+
+    def handle(self, *args, **options):
+        pk = Project.objects.order_by('pk').values_list('pk', flat=True).first()
+        names = options['endpoint'] or list(benchmark.ENDPOINTS)
+        if pk is None and any('{pk}' in benchmark.ENDPOINTS[name][1] for name in names):
+            raise CommandError('Нет проектов: сначала manage.py seed_benchmark')
+        endpoints = {name: (method, path.format(pk=pk))
+                     for name, (method, path) in ((n, benchmark.ENDPOINTS[n]) for n in names)}
+
+        # Nothing may reach api.telegram.org: the outbox rows the contact
+        # endpoint writes would be delivered to the stub.
+        stub = StubTelegramServer().start()
+        overrides = {
+            'TELEGRAM_API_URL': stub.url,
+            'TELEGRAM_BOT_TOKEN': 'benchmark',
+            'TELEGRAM_CHAT_ID': '0',
+            'RATELIMIT_ENABLED': False,
+            'PERF_SERVER_TIMING': True,
+        }
+        try:
+            if options['http'] or options['url']:
+                mode = 'http'
+                results = self._run_http(endpoints, options, overrides)
+            else:
+                mode = 'inprocess'
+                # the per-request log line would drown the report
+                perf_logger = logging.getLogger('portfolio.performance')
+                level = perf_logger.level
+                perf_logger.setLevel(logging.WARNING)
+                try:
+                    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], **overrides):
+                        results = benchmark.run_inprocess(endpoints, options['requests'], options['warmup'])
+                finally:
+                    perf_logger.setLevel(level)
+        finally:
+            stub.shutdown()
+            stub.server_close()
+
+        report = {
+            "mode": mode,
+            "database": connection.vendor,
+            "projects": Project.objects.count(),
+            "contacts": ContactMessage.objects.count(),
+            "requests": options['requests'],
+            "concurrency": options['concurrency'] if mode == 'http' else 1,
+            "results": results,
+        }
+        self._print(report)
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Эталон сохранён: {options['save_baseline']}")
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            if (baseline.get('mode'), baseline.get('projects')) != (mode, report['projects']):
+                self.stderr.write(
+                    f"Эталон снят в другом режиме или на другом объёме данных: "
+                    f"{baseline.get('mode')}, проектов {baseline.get('projects')}"
+                )
+            problems = benchmark.compare(report, baseline, options['tolerance'])
+            if problems:
+                raise CommandError('Регрессия относительно эталона:\n' + '\n'.join(problems))
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def _run_http(self, endpoints, options, overrides):
+        if options['url']:
+            return benchmark.run_http(options['url'], endpoints, options['requests'], options['warmup'],
+                                      options['concurrency'], options['host'])
+        port = _free_port()
+        asgi = 'uvicorn' in options['worker_class'].lower()
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE,
+            'TELEGRAM_API_URL': overrides['TELEGRAM_API_URL'],
+            'TELEGRAM_BOT_TOKEN': overrides['TELEGRAM_BOT_TOKEN'],
+            'TELEGRAM_CHAT_ID': overrides['TELEGRAM_CHAT_ID'],
+            'RATELIMIT_ENABLED': 'False',
+            'PERF_SERVER_TIMING': 'True',
+            'PERF_LOG_LEVEL': 'WARNING',
+        }
+        if asgi:
+            env['DJANGO_ASYNC_API'] = env.get('DJANGO_ASYNC_API', 'True')
+        process = subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn',
+                'config.asgi:application' if asgi else 'config.wsgi:application',
+                '--bind', f'127.0.0.1:{port}',
+                '--workers', str(options['workers']),
+                '--worker-class', options['worker_class'],
+                '--log-level', 'warning',
+            ],
+            cwd=settings.BASE_DIR,
+            env=env,
+        )
+        try:
+            self._wait_ready(process, port)
+            return benchmark.run_http(f'http://127.0.0.1:{port}', endpoints, options['requests'],
+                                      options['warmup'], options['concurrency'], options['host'])
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    def _wait_ready(self, process, port: int, timeout: float = 30) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f'gunicorn завершился с кодом {process.returncode}')
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                conn.request('GET', '/api/social-links/')
+                conn.getresponse().read()
+                conn.close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f'gunicorn не ответил за {timeout:.0f} с')
+
+    def _print(self, report: dict) -> None:
+        self.stdout.write(
+            f"{report['mode']}, {report['database']}: проектов {report['projects']}, "
+            f"сообщений {report['contacts']}, по {report['requests']} запросов, "
+            f"параллельно {report['concurrency']}"
+        )
+        self.stdout.write(f"{'':<20}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'rps':>9}{'queries':>9}{'errors':>8}")
+        for name, r in report['results'].items():
+            queries = '-' if r['queries'] is None else r['queries']
+            self.stdout.write(
+                f"{name:<20}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}{r['rps']:>9}{queries:>9}{r['errors']:>8}"
+            )
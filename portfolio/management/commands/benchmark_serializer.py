@@ -0,0 +1,97 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from portfolio.images import variant_urls
+from portfolio.models import Project
+from portfolio.serializers import Context, dumps_stdlib, orjson, project_plan
+
+
+def _legacy(request) -> bytes:
+    """The per-instance serialization /api/projects/ used before portfolio.serializers."""
+    def isoformat(value):
+        return value.isoformat() if value else None
+
+    data = []
+    for p in Project.objects.all():
+        data.append({
+            "id": p.id,
+            "name": p.name,
+            "subtitle": p.subtitle,
+            "description": p.description,
+            "description_en": p.description_en,
+            "category": p.category,
+            "category_label": p.get_category_display(),
+            "release_date": isoformat(p.release_date),
+            "work_period": {"start": isoformat(p.work_start_date), "end": isoformat(p.work_end_date)},
+            "links": {
+                "google_play": p.link_google_play,
+                "rustore": p.link_rustore,
+                "appstore": p.link_appstore,
+                "github": p.link_github,
+                "extra_social": p.extra_social_link,
+            },
+            "image": request.build_absolute_uri(p.image.url) if p.image else None,
+            "images": variant_urls(p.image_variants, request.build_absolute_uri),
+            "updated_at": isoformat(p.updated_at),
+            "created_at": isoformat(p.created_at),
+        })
+    return dumps_stdlib(data)
+
+
+def _compiled(request, encode) -> bytes:
+    plan = project_plan()
+    return encode(plan.serialize_many(Project.objects.values_list(*plan.columns), Context(request)))
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает сериализацию /api/projects/ на N проектах: экземпляры моделей '
+            'против скомпилированного плана (stdlib json и orjson). Данные откатываются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5, help='Берётся лучший из прогонов')
+
+    def _best(self, func, repeat: int) -> float:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def handle(self, *args, **options):
+        count, repeat = options['count'], options['repeat']
+        host = next((h for h in settings.ALLOWED_HOSTS if h and '*' not in h and not h.startswith('.')), 'localhost')
+        request = RequestFactory(SERVER_NAME=host).get('/api/projects/')
+        variants = {'formats': {ext: {str(w): f'projects/variants/bench-{w}.{ext}' for w in (320, 640, 1024)}
+                                for ext in ('avif', 'webp')}}
+
+        with transaction.atomic():
+            Project.objects.bulk_create(
+                Project(
+                    name=f'Проект {i}',
+                    subtitle='Бенчмарк',
+                    description='Описание ' * 20,
+                    link_github='https://github.com/example/project',
+                    image=f'projects/bench-{i}.png',
+                    image_variants=variants,
+                )
+                for i in range(count)
+            )
+            total = Project.objects.count()
+            runs = [('модели + dict', lambda: _legacy(request)),
+                    ('план + json', lambda: _compiled(request, dumps_stdlib))]
+            if orjson is not None:
+                runs.append(('план + orjson', lambda: _compiled(request, orjson.dumps)))
+
+            self.stdout.write(f'Проектов: {total}, лучший из {repeat}')
+            baseline = None
+            for name, func in runs:
+                seconds = self._best(func, repeat)
+                baseline = baseline or seconds
+                self.stdout.write(f'{name:<16} {seconds * 1000:8.1f} ms  x{baseline / seconds:.1f}')
+            transaction.set_rollback(True)
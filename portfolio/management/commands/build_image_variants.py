@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from portfolio.images import refresh_variants
+from portfolio.models import Project
+
+
+class Command(BaseCommand):
+    help = 'Строит адаптивные варианты картинок (WebP/AVIF) для существующих проектов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Пересобрать даже актуальные варианты')
+
+    def handle(self, *args, **options):
+        updated = 0
+        for project in Project.objects.exclude(image='').exclude(image__isnull=True).iterator():
+            if refresh_variants(project, force=options['force']):
+                updated += 1
+                self.stdout.write(f'{project.pk}: {project.name}')
+        self.stdout.write(self.style.SUCCESS(f'Обновлено проектов: {updated}'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio import snapshots
+
+
+class Command(BaseCommand):
+    help = ('Сверяет снимки проектов (portfolio/snapshots.py) со свежей сериализацией '
+            'таблицы проектов; код возврата 1 при расхождениях')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Пересобрать снимки при расхождениях (или если их ещё нет)')
+
+    def handle(self, *args, **options):
+        problems = snapshots.check()
+        for problem in problems[:50]:
+            self.stdout.write(f'  {problem}')
+        if len(problems) > 50:
+            self.stdout.write(f'  … и ещё {len(problems) - 50}')
+        if not problems:
+            self.stdout.write(self.style.SUCCESS('Снимки совпадают с таблицей проектов'))
+            return
+        if not options['rebuild']:
+            raise CommandError(f'Расхождений: {len(problems)}; исправить: manage.py check_snapshots --rebuild')
+        count = snapshots.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Снимки пересобраны: проектов {count}'))
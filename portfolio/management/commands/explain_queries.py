@@ -0,0 +1,119 @@
+import datetime
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.utils import timezone
+
+from portfolio import export, outbox, snapshots
+from portfolio.models import ContactMessage, Project, ProjectCategory, ProjectListSnapshot, TelegramOutbox
+from portfolio.pagination import after_cursor, decode_cursor, encode_cursor
+from portfolio.views import _detail_queryset, _list_params, _list_queryset
+
+
+def _api_list(**query):
+    return lambda: _list_queryset(_list_params(RequestFactory().get('/api/projects/', query)))
+
+
+def _snapshot_list(**query):
+    return lambda: snapshots._rows(_list_params(RequestFactory().get('/api/projects/', query)))
+
+
+def _hot_queries(now):
+    """(name, queryset factory, sort allowed): what the views, admin and workers run."""
+    cursor = encode_cursor(now, 1)
+    month_ago = (now - datetime.timedelta(days=30)).date()
+    return [
+        ('home: все проекты', lambda: Project.objects.all(), False),
+        ('project_detail', lambda: Project.objects.filter(pk=1), False),
+        ('api/projects', _api_list(limit='12'), False),
+        ('api/projects?category', _api_list(category=ProjectCategory.FREELANCE, limit='12'), False),
+        ('api/projects?cursor', _api_list(limit='12', cursor=cursor), False),
+        ('api/projects?category&cursor', _api_list(category=ProjectCategory.FREELANCE, limit='12', cursor=cursor), False),
+        ('api/projects/<pk>', lambda: _detail_queryset(1), False),
+        ('снимок: весь список', lambda: ProjectListSnapshot.objects.filter(pk=snapshots.LIST_ID), False),
+        ('снимок: ?limit', _snapshot_list(limit='12'), False),
+        ('снимок: ?category&cursor',
+         _snapshot_list(category=ProjectCategory.FREELANCE, limit='12', cursor=cursor), False),
+        ('api/export/projects?since', lambda: export.queryset('projects', now), False),
+        ('api/export/contacts?since', lambda: export.queryset('contacts', now), False),
+        ('admin: проекты', lambda: Project.objects.all()[:100], False),
+        ('admin: проекты по категории',
+         lambda: Project.objects.filter(category=ProjectCategory.FREELANCE)[:100], False),
+        # a date range picks its own index; sorting what it matched is fine
+        ('admin: проекты по release_date',
+         lambda: Project.objects.filter(release_date__gte=month_ago, release_date__lt=now.date())[:100], True),
+        ('admin: проекты по work_start_date',
+         lambda: Project.objects.filter(work_start_date__gte=month_ago, work_start_date__lt=now.date())[:100], True),
+        ('admin: проекты по work_end_date',
+         lambda: Project.objects.filter(work_end_date__gte=month_ago, work_end_date__lt=now.date())[:100], True),
+        ('admin: проекты по created_at',
+         lambda: Project.objects.filter(created_at__gte=now - datetime.timedelta(days=7))[:100], False),
+        ('admin: сообщения', lambda: ContactMessage.objects.order_by('-created_at', '-id')[:100], False),
+        ('admin: сообщения, ?before=',
+         lambda: after_cursor(ContactMessage.objects.order_by('-created_at', '-id'), decode_cursor(cursor))[:100], False),
+        ('admin: очередь Telegram', lambda: TelegramOutbox.objects.all()[:100], False),
+        ('outbox: claim_batch', lambda: outbox.due(now)[:50], False),
+    ]
+
+
+# (plan line -> table scanned in full, plan line -> full sort) per backend
+_PATTERNS = {
+    'sqlite': (
+        re.compile(r'\bSCAN (?!.*\bUSING (?:COVERING )?INDEX\b)(?:TABLE )?(\w+)'),
+        re.compile(r'USE TEMP B-TREE FOR ORDER BY'),
+    ),
+    'postgresql': (
+        re.compile(r'\bSeq Scan on (\w+)'),
+        re.compile(r'^\s*(?:->\s*)?Sort\b'),
+    ),
+}
+
+
+def problems(plan: str, vendor: str, sort_allowed: bool) -> list:
+    if vendor not in _PATTERNS:
+        return []
+    scan, sort = _PATTERNS[vendor]
+    found = []
+    for line in plan.splitlines():
+        match = scan.search(line)
+        if match:
+            found.append(f'seq scan {match.group(1)}')
+        elif sort.search(line) and not sort_allowed:
+            found.append('sort')
+    return found
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN для частых запросов сайта, админки и очереди и отмечает '
+            'полные проходы по таблицам и сортировки без индекса')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--planner-defaults',
+            action='store_true',
+            help='PostgreSQL: не запрещать seq scan. На маленьких таблицах планировщик '
+                 'выбирает его и при наличии индекса, поэтому по умолчанию он выключен',
+        )
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in _PATTERNS:
+            self.stderr.write(f'Разбор планов для {vendor} не поддерживается, планы выводятся как есть')
+        flagged = 0
+        with transaction.atomic():
+            if vendor == 'postgresql' and not options['planner_defaults']:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            for name, factory, sort_allowed in _hot_queries(timezone.now()):
+                plan = factory().explain()
+                found = problems(plan, vendor, sort_allowed)
+                flagged += bool(found)
+                status = self.style.ERROR('; '.join(found)) if found else self.style.SUCCESS('ok')
+                self.stdout.write(f'{name:<40} {status}')
+                if found or options['verbosity'] > 1:
+                    for line in plan.splitlines():
+                        self.stdout.write(f'    {line}')
+        if flagged:
+            raise CommandError(f'Запросов без подходящего индекса: {flagged}')
@@ -0,0 +1,34 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio.export import EXPORTS, FORMATS, parse_since, stream
+from portfolio.serializers import Context
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка проектов или сообщений с формы в NDJSON/CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(EXPORTS))
+        parser.add_argument('--format', choices=list(FORMATS), default='ndjson')
+        parser.add_argument('--since', help='Только записи, изменённые начиная с этой даты (ISO)')
+        parser.add_argument('--output', '-o', help='Файл; по умолчанию stdout')
+        parser.add_argument('--base-url', default=settings.PRERENDER_BASE_URL or 'http://localhost',
+                            help='Адрес сайта для абсолютных ссылок на картинки')
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_since(options['since'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        chunks = stream(options['kind'], options['format'], since, Context(origin=options['base_url']))
+        if options['output']:
+            with open(options['output'], 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
@@ -0,0 +1,103 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+MARKER = '-- portfolio: app import starts --'
+
+# Runs in a fresh interpreter: what a gunicorn worker does before its first
+# request. argv: marker, config module holding `application`, warm up or not.
+_CHILD = """
+import json, resource, sys, time
+marker, entry, warm_up = sys.argv[1:]
+sys.stderr.write(marker + '\\n')
+start = time.perf_counter()
+import importlib
+from django.urls import get_resolver
+importlib.import_module(entry).application
+get_resolver().url_patterns
+boot = time.perf_counter() - start
+warm = None
+if warm_up == '1':
+    from portfolio import warmup
+    warm = warmup.run()['total_ms']
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+# kilobytes on Linux, bytes on macOS
+rss_kb = peak // 1024 if sys.platform == 'darwin' else peak
+print(json.dumps({"boot_ms": round(boot * 1000, 1), "warmup_ms": warm, "rss_kb": rss_kb}))
+"""
+
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def parse(stderr: str) -> list:
+    """[(module, self µs, cumulative µs, depth)] from `-X importtime` output after MARKER."""
+    rows = []
+    seen_marker = False
+    for line in stderr.splitlines():
+        if line == MARKER:
+            seen_marker = True
+            continue
+        match = _LINE.match(line)
+        if seen_marker and match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+class Command(BaseCommand):
+    help = ('Запускает чистый интерпретатор с -X importtime, загружает приложение как воркер '
+            'gunicorn и показывает самые медленные импорты, время загрузки и пиковый RSS')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25, help='Сколько модулей показать')
+        parser.add_argument('--sort', choices=('cumulative', 'self'), default='cumulative',
+                            help='cumulative — вместе с вложенными импортами')
+        parser.add_argument('--asgi', action='store_true', help='Загружать config.asgi вместо config.wsgi')
+        parser.add_argument('--warmup', action='store_true',
+                            help='После загрузки выполнить прогрев (portfolio/warmup.py) и мерить RSS после него')
+        parser.add_argument('--prefix', action='append', default=[],
+                            help='Показывать только модули с этим префиксом, например portfolio; можно повторять')
+        parser.add_argument('--json', action='store_true', help='Вывести отчёт в JSON')
+
+    def handle(self, *args, **options):
+        entry = 'config.asgi' if options['asgi'] else 'config.wsgi'
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', _CHILD, MARKER, entry, '1' if options['warmup'] else '0'],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE},
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f'Приложение не загрузилось:\n{result.stderr[-2000:]}')
+        summary = json.loads(result.stdout.strip().splitlines()[-1])
+        rows = parse(result.stderr)
+        summary['imports'] = len(rows)
+        summary['import_ms'] = round(sum(row[1] for row in rows) / 1000, 1)
+
+        shown = [row for row in rows if not options['prefix'] or row[0].startswith(tuple(options['prefix']))]
+        shown.sort(key=lambda row: row[2] if options['sort'] == 'cumulative' else row[1], reverse=True)
+        shown = shown[:options['top']]
+
+        if options['json']:
+            summary['top'] = [
+                {"module": module, "self_ms": round(self_us / 1000, 2), "cumulative_ms": round(cumulative_us / 1000, 2)}
+                for module, self_us, cumulative_us, _depth in shown
+            ]
+            self.stdout.write(json.dumps(summary, ensure_ascii=False, indent=2))
+            return
+
+        self.stdout.write(f"{'module':<50}{'self ms':>10}{'cum ms':>10}")
+        for module, self_us, cumulative_us, _depth in shown:
+            self.stdout.write(f'{module:<50}{self_us / 1000:>10.1f}{cumulative_us / 1000:>10.1f}')
+        self.stdout.write(
+            f"Загрузка: {summary['boot_ms']} ms, из них импорты {summary['import_ms']} ms "
+            f"({summary['imports']} модулей); пиковый RSS {summary['rss_kb'] / 1024:.1f} MiB"
+        )
+        if summary['warmup_ms'] is not None:
+            self.stdout.write(f"Прогрев: {summary['warmup_ms']} ms")
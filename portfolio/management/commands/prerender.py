@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio.prerender import PrerenderError, build
+
+
+class Command(BaseCommand):
+    help = 'Пре-рендерит публичные страницы и JSON в PRERENDER_ROOT для раздачи статикой'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Перерисовать все страницы (после изменения шаблонов или кода)')
+
+    def handle(self, *args, **options):
+        try:
+            result = build(full=options['full'])
+        except PrerenderError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f"Сборка {result['hash']}: страниц {result['pages']}, "
+            f"отрисовано {result['rendered']}, переиспользовано {result['reused']}"
+        ))
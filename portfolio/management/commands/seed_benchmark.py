@@ -0,0 +1,101 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from portfolio import snapshots
+from portfolio.benchmark import BENCH_EMAIL_DOMAIN, BENCH_SUBTITLE
+from portfolio.cache import bump_projects_version
+from portfolio.models import ContactMessage, Project, ProjectCategory, TelegramOutbox
+
+# name -> (projects, contact messages)
+DATASETS = {
+    'small': (10, 1000),
+    'medium': (1000, 10000),
+    'large': (100000, 1000000),
+}
+
+_BATCH = 5000
+
+
+def _projects(start: int, count: int):
+    categories = ProjectCategory.values
+    today = timezone.localdate()
+    for i in range(start, start + count):
+        started = today - datetime.timedelta(days=30 + i % 2000)
+        yield Project(
+            name=f'Проект {i}',
+            subtitle=BENCH_SUBTITLE,
+            description='Синтетическое описание проекта для нагрузочного теста. ' * 8,
+            description_en='Synthetic project description for the load test. ' * 8,
+            category=categories[i % len(categories)],
+            work_start_date=started,
+            work_end_date=started + datetime.timedelta(days=90),
+            release_date=started + datetime.timedelta(days=100),
+            link_github=f'https://github.com/example/project-{i}',
+        )
+
+
+def _contacts(start: int, count: int):
+    for i in range(start, start + count):
+        yield ContactMessage(
+            full_name=f'Отправитель {i}',
+            email=f'seed{i}@{BENCH_EMAIL_DOMAIN}',
+            message=f'Сообщение {i}: хотим обсудить проект.',
+        )
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими проектами и сообщениями для manage.py benchmark. '
+            'Запускайте на отдельной базе (SQLITE_PATH или DB_NAME)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', nargs='?', choices=list(DATASETS), default='small')
+        parser.add_argument('--projects', type=int, help='Вместо размера из набора')
+        parser.add_argument('--contacts', type=int, help='Вместо размера из набора')
+        parser.add_argument('--clear', action='store_true', help='Только удалить данные бенчмарка')
+        parser.add_argument('--force', action='store_true', help='Продолжить, даже если в базе есть настоящие данные')
+
+    def handle(self, *args, **options):
+        real = (Project.objects.exclude(subtitle=BENCH_SUBTITLE).exists()
+                or ContactMessage.objects.exclude(email__endswith='@' + BENCH_EMAIL_DOMAIN).exists())
+        if real and not options['force']:
+            raise CommandError('В базе есть не синтетические данные; укажите отдельную базу или --force')
+
+        self._clear()
+        if not options['clear']:
+            projects, contacts = DATASETS[options['dataset']]
+            projects = projects if options['projects'] is None else options['projects']
+            contacts = contacts if options['contacts'] is None else options['contacts']
+            self._insert(Project, _projects, projects)
+            self._insert(ContactMessage, _contacts, contacts)
+        # bulk_create and raw DELETEs send no signals, so bump and rebuild by hand
+        bump_projects_version()
+        count = snapshots.rebuild()
+        self.stdout.write(f'Снимки проектов пересобраны: {count}')
+
+    def _insert(self, model, rows, total: int) -> None:
+        for start in range(0, total, _BATCH):
+            with transaction.atomic():
+                model.objects.bulk_create(rows(start, min(_BATCH, total - start)), batch_size=1000)
+            if total > _BATCH:
+                self.stdout.write(f'{model._meta.verbose_name_plural}: {min(start + _BATCH, total)}/{total}')
+        self.stdout.write(self.style.SUCCESS(f'{model._meta.verbose_name_plural}: {total}'))
+
+    def _clear(self) -> None:
+        # Plain DELETEs: queryset.delete() would load every row and send
+        # post_delete per project (cache bump, prerender). Outbox rows and
+        # the project snapshots go first, nothing else references these tables.
+        TelegramOutbox.objects.filter(contact__email__endswith='@' + BENCH_EMAIL_DOMAIN).delete()
+        snapshots.clear()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {ContactMessage._meta.db_table} WHERE email LIKE %s',
+                ['%@' + BENCH_EMAIL_DOMAIN],
+            )
+            contacts = cursor.rowcount
+            cursor.execute(f'DELETE FROM {Project._meta.db_table} WHERE subtitle = %s', [BENCH_SUBTITLE])
+            projects = cursor.rowcount
+        if contacts or projects:
+            self.stdout.write(f'Удалены прежние данные бенчмарка: проектов {projects}, сообщений {contacts}')
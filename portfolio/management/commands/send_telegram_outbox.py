@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio import outbox
+
+
+class Command(BaseCommand):
+    help = 'Отправляет накопленные уведомления из очереди Telegram'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.TELEGRAM_OUTBOX_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='Не завершаться, когда очередь опустела')
+        parser.add_argument('--interval', type=float, default=2.0, help='Пауза между опросами пустой очереди, сек.')
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Больше 1 — отправлять пачку параллельно через пул соединений httpx',
+        )
+
+    def handle(self, *args, **options):
+        if not outbox.is_configured():
+            self.stderr.write('TELEGRAM_BOT_TOKEN / TELEGRAM_CHAT_ID не заданы')
+            return
+        if options['concurrency'] > 1:
+            asyncio.run(self._run_async(options))
+            return
+        while True:
+            queued = outbox.advance_resend_jobs()
+            sent, failed = outbox.drain(options['batch_size'])
+            if not self._report(sent, failed, queued, options):
+                break
+            if sent + failed < options['batch_size'] and not queued:
+                time.sleep(options['interval'])
+
+    async def _run_async(self, options):
+        try:
+            import httpx
+        except ImportError:
+            raise CommandError('Для --concurrency нужен пакет httpx')
+        limits = httpx.Limits(max_connections=options['concurrency'])
+        async with httpx.AsyncClient(limits=limits, timeout=10) as client:
+            while True:
+                queued = await sync_to_async(outbox.advance_resend_jobs)()
+                sent, failed = await outbox.adrain(client, options['batch_size'])
+                if not self._report(sent, failed, queued, options):
+                    break
+                if sent + failed < options['batch_size'] and not queued:
+                    await asyncio.sleep(options['interval'])
+
+    def _report(self, sent, failed, queued, options) -> bool:
+        """Печатает итог пачки; False — пора завершаться."""
+        if queued:
+            self.stdout.write(f'Поставлено в очередь повторной отправкой: {queued}')
+        if sent or failed:
+            self.stdout.write(f'Отправлено: {sent}, ошибок: {failed}')
+        return options['loop'] or sent + failed >= options['batch_size'] or bool(queued)
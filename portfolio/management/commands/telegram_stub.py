@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from portfolio.telegram_stub import StubTelegramServer
+
+
+class Command(BaseCommand):
+    help = 'Запускает локальную заглушку Telegram Bot API (TELEGRAM_API_URL=http://127.0.0.1:<port>)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8081)
+        parser.add_argument('--rate-limit-every', type=int, default=0, help='Отвечать 429 на каждый N-й запрос')
+        parser.add_argument('--retry-after', type=int, default=1)
+
+    def handle(self, *args, **options):
+        server = StubTelegramServer(
+            options['host'],
+            options['port'],
+            rate_limit_every=options['rate_limit_every'],
+            retry_after=options['retry_after'],
+            verbose=True,
+        )
+        self.stdout.write(f'Заглушка Telegram: {server.url}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio import warmup
+
+
+class Command(BaseCommand):
+    help = ('Прогревает процесс и кеш: импорт представлений, соединения с БД, маршруты, '
+            'шаблоны и однократная отрисовка публичных страниц. Выводит время каждого шага')
+
+    def handle(self, *args, **options):
+        status = warmup.run()
+        for step, ms in status['steps_ms'].items():
+            self.stdout.write(f'{step:<12}{ms:>10} ms')
+        self.stdout.write(f"{'total':<12}{status['total_ms']:>10} ms")
+        if not status['ready']:
+            raise CommandError('Прогрев не удался:\n' + '\n'.join(status['errors']))
+        self.stdout.write(self.style.SUCCESS('Готово'))
@@ -0,0 +1,101 @@
+"""In-process per-route request metrics, rendered in Prometheus text format.
+
+Each worker process keeps its own counters; scrape every worker (or run a
+single one) to get the full picture.
+"""
+import bisect
+import threading
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _RouteStats:
+    __slots__ = ('buckets', 'count', 'seconds', 'queries', 'db_seconds', 'bytes')
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.bytes = 0
+
+
+_lock = threading.Lock()
+_routes = {}
+_startup = {}
+
+
+def observe(route: str, method: str, status: int, seconds: float, queries: int,
+            db_seconds: float, size: int) -> None:
+    key = (route, method, str(status))
+    with _lock:
+        stats = _routes.get(key)
+        if stats is None:
+            stats = _routes[key] = _RouteStats()
+        index = bisect.bisect_left(BUCKETS, seconds)
+        if index < len(BUCKETS):
+            stats.buckets[index] += 1
+        stats.count += 1
+        stats.seconds += seconds
+        stats.queries += queries
+        stats.db_seconds += db_seconds
+        stats.bytes += size
+
+
+def observe_startup(step: str, seconds: float) -> None:
+    """Duration of a warm-up step (portfolio/warmup.py); the last run wins."""
+    with _lock:
+        _startup[step] = seconds
+
+
+def reset() -> None:
+    with _lock:
+        _routes.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render() -> str:
+    with _lock:
+        snapshot = [
+            (key, (list(stats.buckets), stats.count, stats.seconds, stats.queries, stats.db_seconds, stats.bytes))
+            for key, stats in sorted(_routes.items())
+        ]
+        startup = sorted(_startup.items())
+
+    lines = [
+        '# HELP portfolio_request_duration_seconds Request wall time.',
+        '# TYPE portfolio_request_duration_seconds histogram',
+    ]
+    # (name, help, index into the snapshot tuple)
+    counters = (
+        ('portfolio_db_queries_total', 'Database queries.', 3),
+        ('portfolio_db_duration_seconds_total', 'Time spent in database queries.', 4),
+        ('portfolio_response_bytes_total', 'Response body bytes.', 5),
+    )
+    labelled = [
+        (f'route="{_escape(route)}",method="{method}",status="{status}"', values)
+        for (route, method, status), values in snapshot
+    ]
+    for labels, (buckets, count, seconds, *_rest) in labelled:
+        cumulative = 0
+        for bound, hits in zip(BUCKETS, buckets):
+            cumulative += hits
+            lines.append(f'portfolio_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'portfolio_request_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+        lines.append(f'portfolio_request_duration_seconds_sum{{{labels}}} {seconds}')
+        lines.append(f'portfolio_request_duration_seconds_count{{{labels}}} {count}')
+    for name, help_text, index in counters:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for labels, values in labelled:
+            lines.append(f'{name}{{{labels}}} {values[index]}')
+    if startup:
+        lines.append('# HELP portfolio_startup_seconds Duration of the last worker warm-up, per step.')
+        lines.append('# TYPE portfolio_startup_seconds gauge')
+        for step, seconds in startup:
+            lines.append(f'portfolio_startup_seconds{{step="{_escape(step)}"}} {seconds}')
+    return '\n'.join(lines) + '\n'
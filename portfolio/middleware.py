@@ -0,0 +1,141 @@
+"""Per-request performance instrumentation.
+
+PerformanceMiddleware measures wall time, database query count and time,
+template render time (TemplateResponse views) and response size. It reports
+them in a Server-Timing header (PERF_SERVER_TIMING), as one JSON log line on
+the `portfolio.performance` logger, and, with PERF_METRICS enabled, in the
+per-route histogram served at /metrics (see portfolio/metrics.py).
+
+It runs natively in both handler modes: under ASGI a sync-only middleware
+would push every request through one thread.
+"""
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger('portfolio.performance')
+
+
+class _RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_started = None
+        self.render_seconds = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += time.perf_counter() - start
+
+
+def _response_size(response) -> int | None:
+    if response.streaming:
+        return None
+    return len(response.content)
+
+
+def _route(request) -> str:
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unmatched>'
+    return match.route or match.view_name or '<unnamed>'
+
+
+def _wrap(stats: _RequestStats):
+    """Installs `stats` on this thread's connections; returns the undo."""
+    wrappers = [connections[alias].execute_wrapper(stats) for alias in connections]
+    for wrapper in wrappers:
+        wrapper.__enter__()
+
+    def unwrap():
+        for wrapper in reversed(wrappers):
+            wrapper.__exit__(None, None, None)
+    return unwrap
+
+
+class PerformanceMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = request._performance = _RequestStats()
+        start = time.perf_counter()
+        unwrap = _wrap(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            unwrap()
+        self._report(request, response, stats, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        stats = request._performance = _RequestStats()
+        start = time.perf_counter()
+        # Connections belong to a thread, and the ORM calls of an async view
+        # run on the request's sync thread (one per request under
+        # ASGIHandler): those are the connections to instrument.
+        unwrap = await sync_to_async(_wrap)(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(unwrap)()
+        self._report(request, response, stats, time.perf_counter() - start)
+        return response
+
+    def _report(self, request, response, stats: _RequestStats, seconds: float) -> None:
+        size = _response_size(response)
+        if settings.PERF_SERVER_TIMING:
+            timings = [
+                f'app;dur={seconds * 1000:.1f}',
+                f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"',
+            ]
+            if stats.render_seconds is not None:
+                timings.append(f'tpl;dur={stats.render_seconds * 1000:.1f}')
+            response['Server-Timing'] = ', '.join(timings)
+
+        route = _route(request)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'route': route,
+                'status': response.status_code,
+                'duration_ms': round(seconds * 1000, 2),
+                'db_queries': stats.queries,
+                'db_ms': round(stats.db_seconds * 1000, 2),
+                'template_ms': None if stats.render_seconds is None else round(stats.render_seconds * 1000, 2),
+                'bytes': size,
+            }))
+        if settings.PERF_METRICS:
+            metrics.observe(route, request.method, response.status_code, seconds,
+                            stats.queries, stats.db_seconds, size or 0)
+
+    def process_template_response(self, request, response):
+        # Runs just before the handler renders the TemplateResponse; the
+        # post-render callback closes the measurement.
+        stats = getattr(request, '_performance', None)
+        if stats is not None:
+            stats.render_started = time.perf_counter()
+
+            def finish(rendered):
+                stats.render_seconds = time.perf_counter() - stats.render_started
+            response.add_post_render_callback(finish)
+        return response
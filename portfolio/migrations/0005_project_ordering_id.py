@@ -0,0 +1,17 @@
+# Generated by Django 5.0.14 on 2026-10-18 07:13
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0004_telegramoutbox'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='project',
+            options={'ordering': ['-created_at', '-id'], 'verbose_name': 'Проект', 'verbose_name_plural': 'Проекты'},
+        ),
+    ]
@@ -0,0 +1,99 @@
+from django.db import migrations
+
+# The search index lives outside the model: PostgreSQL gets a tsvector column
+# kept current by a trigger plus a GIN index, SQLite an external-content FTS5
+# table kept current by triggers. See portfolio/search.py.
+#
+# On SQLite, a later migration that rebuilds portfolio_project (AlterField,
+# RemoveField...) drops these triggers; such a migration must recreate them.
+
+POSTGRES_FORWARD = [
+    "ALTER TABLE portfolio_project ADD COLUMN search_vector tsvector",
+    """
+    CREATE FUNCTION portfolio_project_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(NEW.subtitle, '')), 'B') ||
+            setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'C') ||
+            setweight(to_tsvector('english', coalesce(NEW.description_en, '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER portfolio_project_search_vector
+    BEFORE INSERT OR UPDATE OF name, subtitle, description, description_en ON portfolio_project
+    FOR EACH ROW EXECUTE FUNCTION portfolio_project_search_vector_update()
+    """,
+    # fire the trigger for existing rows
+    "UPDATE portfolio_project SET name = name",
+    "CREATE INDEX portfolio_project_search_vector_gin ON portfolio_project USING gin (search_vector)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS portfolio_project_search_vector_gin",
+    "DROP TRIGGER IF EXISTS portfolio_project_search_vector ON portfolio_project",
+    "DROP FUNCTION IF EXISTS portfolio_project_search_vector_update()",
+    "ALTER TABLE portfolio_project DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE portfolio_project_fts USING fts5(
+        name, subtitle, description, description_en,
+        content='portfolio_project', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER portfolio_project_fts_insert AFTER INSERT ON portfolio_project BEGIN
+        INSERT INTO portfolio_project_fts(rowid, name, subtitle, description, description_en)
+        VALUES (new.id, new.name, new.subtitle, new.description, new.description_en);
+    END
+    """,
+    """
+    CREATE TRIGGER portfolio_project_fts_delete AFTER DELETE ON portfolio_project BEGIN
+        INSERT INTO portfolio_project_fts(portfolio_project_fts, rowid, name, subtitle, description, description_en)
+        VALUES ('delete', old.id, old.name, old.subtitle, old.description, old.description_en);
+    END
+    """,
+    """
+    CREATE TRIGGER portfolio_project_fts_update AFTER UPDATE ON portfolio_project BEGIN
+        INSERT INTO portfolio_project_fts(portfolio_project_fts, rowid, name, subtitle, description, description_en)
+        VALUES ('delete', old.id, old.name, old.subtitle, old.description, old.description_en);
+        INSERT INTO portfolio_project_fts(rowid, name, subtitle, description, description_en)
+        VALUES (new.id, new.name, new.subtitle, new.description, new.description_en);
+    END
+    """,
+    "INSERT INTO portfolio_project_fts(portfolio_project_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS portfolio_project_fts_insert",
+    "DROP TRIGGER IF EXISTS portfolio_project_fts_delete",
+    "DROP TRIGGER IF EXISTS portfolio_project_fts_update",
+    "DROP TABLE IF EXISTS portfolio_project_fts",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for sql in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0006_project_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': POSTGRES_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.0.14 on 2026-10-18 07:33
+
+from django.db import migrations, models
+
+# AddIndex is a plain CREATE INDEX on SQLite too, so the table isn't rebuilt
+# and the FTS triggers from 0007 survive.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0007_project_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['created_at', 'id'], name='contact_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['-created_at', '-id'], name='project_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['category', '-created_at', '-id'], name='project_category_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['updated_at', 'id'], name='project_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['release_date'], name='project_release_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['work_start_date'], name='project_work_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['work_end_date'], name='project_work_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='telegramoutbox',
+            index=models.Index(fields=['-created_at'], name='outbox_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='telegramoutbox',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['next_attempt_at', 'id'], name='outbox_pending_due_idx'),
+        ),
+    ]
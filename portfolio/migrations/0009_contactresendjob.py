@@ -0,0 +1,38 @@
+# Generated by Django 5.0.14 on 2026-10-18 07:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('portfolio', '0008_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContactResendJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255, verbose_name='Заголовок уведомлений')),
+                ('query', models.BinaryField()),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Всего')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Поставлено в очередь')),
+                ('cursor_created_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('cursor_id', models.BigIntegerField(blank=True, editable=False, null=True)),
+                ('status', models.CharField(choices=[('pending', 'В работе'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершена')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Запустил')),
+            ],
+            options={
+                'verbose_name': 'Повторная отправка',
+                'verbose_name_plural': 'Повторные отправки',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
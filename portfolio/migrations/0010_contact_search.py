@@ -0,0 +1,98 @@
+from django.db import migrations
+
+# Full-text index for the ContactMessage admin search, built like the
+# project one in 0007: a tsvector column with a trigger and a GIN index on
+# PostgreSQL, an external-content FTS5 table with triggers on SQLite. See
+# portfolio/search.py.
+#
+# On SQLite, a later migration that rebuilds portfolio_contactmessage
+# (AlterField, RemoveField...) drops these triggers; such a migration must
+# recreate them.
+
+POSTGRES_FORWARD = [
+    "ALTER TABLE portfolio_contactmessage ADD COLUMN search_vector tsvector",
+    """
+    CREATE FUNCTION portfolio_contactmessage_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            to_tsvector('simple', coalesce(NEW.full_name, '') || ' ' || coalesce(NEW.email, '')) ||
+            to_tsvector('russian', coalesce(NEW.message, ''));
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER portfolio_contactmessage_search_vector
+    BEFORE INSERT OR UPDATE OF full_name, email, message ON portfolio_contactmessage
+    FOR EACH ROW EXECUTE FUNCTION portfolio_contactmessage_search_vector_update()
+    """,
+    # fire the trigger for existing rows
+    "UPDATE portfolio_contactmessage SET full_name = full_name",
+    "CREATE INDEX portfolio_contactmessage_search_vector_gin ON portfolio_contactmessage USING gin (search_vector)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS portfolio_contactmessage_search_vector_gin",
+    "DROP TRIGGER IF EXISTS portfolio_contactmessage_search_vector ON portfolio_contactmessage",
+    "DROP FUNCTION IF EXISTS portfolio_contactmessage_search_vector_update()",
+    "ALTER TABLE portfolio_contactmessage DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE portfolio_contactmessage_fts USING fts5(
+        full_name, email, message,
+        content='portfolio_contactmessage', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER portfolio_contactmessage_fts_insert AFTER INSERT ON portfolio_contactmessage BEGIN
+        INSERT INTO portfolio_contactmessage_fts(rowid, full_name, email, message)
+        VALUES (new.id, new.full_name, new.email, new.message);
+    END
+    """,
+    """
+    CREATE TRIGGER portfolio_contactmessage_fts_delete AFTER DELETE ON portfolio_contactmessage BEGIN
+        INSERT INTO portfolio_contactmessage_fts(portfolio_contactmessage_fts, rowid, full_name, email, message)
+        VALUES ('delete', old.id, old.full_name, old.email, old.message);
+    END
+    """,
+    """
+    CREATE TRIGGER portfolio_contactmessage_fts_update AFTER UPDATE ON portfolio_contactmessage BEGIN
+        INSERT INTO portfolio_contactmessage_fts(portfolio_contactmessage_fts, rowid, full_name, email, message)
+        VALUES ('delete', old.id, old.full_name, old.email, old.message);
+        INSERT INTO portfolio_contactmessage_fts(rowid, full_name, email, message)
+        VALUES (new.id, new.full_name, new.email, new.message);
+    END
+    """,
+    "INSERT INTO portfolio_contactmessage_fts(portfolio_contactmessage_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS portfolio_contactmessage_fts_insert",
+    "DROP TRIGGER IF EXISTS portfolio_contactmessage_fts_delete",
+    "DROP TRIGGER IF EXISTS portfolio_contactmessage_fts_update",
+    "DROP TABLE IF EXISTS portfolio_contactmessage_fts",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for sql in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0009_contactresendjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': POSTGRES_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.14 on 2026-10-18 07:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0010_contact_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectListSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.TextField()),
+                ('cards', models.JSONField()),
+                ('count', models.PositiveIntegerField()),
+                ('built_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Снимок списка проектов',
+                'verbose_name_plural': 'Снимки списка проектов',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProjectSnapshot',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='portfolio.project')),
+                ('category', models.CharField(choices=[('experience', 'Опыт'), ('freelance', 'Фриланс'), ('personal', 'Персональный')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('payload', models.TextField()),
+                ('card', models.JSONField()),
+            ],
+            options={
+                'verbose_name': 'Снимок проекта',
+                'verbose_name_plural': 'Снимки проектов',
+                'ordering': ['-created_at', '-project'],
+                'indexes': [models.Index(fields=['-created_at', '-project'], name='snapshot_created_idx'), models.Index(fields=['category', '-created_at', '-project'], name='snapshot_category_created_idx')],
+            },
+        ),
+    ]
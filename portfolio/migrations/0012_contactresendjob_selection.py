@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:02
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fail_pending_jobs(apps, schema_editor):
+    # their pickled selection isn't carried over; the admin can start them again
+    ContactResendJob = apps.get_model('portfolio', 'ContactResendJob')
+    ContactResendJob.objects.filter(status='pending').update(
+        status='failed',
+        last_error='Задача создана до обновления, запустите повторную отправку заново',
+        finished_at=timezone.now(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0011_project_snapshots'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_pending_jobs, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='contactresendjob',
+            name='query',
+        ),
+        migrations.AddField(
+            model_name='contactresendjob',
+            name='selection',
+            field=models.JSONField(default=dict, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='contactresendjob',
+            name='total',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Всего'),
+        ),
+    ]
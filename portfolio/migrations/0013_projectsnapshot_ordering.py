@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:06
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0012_contactresendjob_selection'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='projectsnapshot',
+            options={'ordering': ['-created_at', '-project_id'], 'verbose_name': 'Снимок проекта', 'verbose_name_plural': 'Снимки проектов'},
+        ),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, router, transaction
+from django.utils import timezone
 
 
 class ProjectCategory(models.TextChoices):
@@ -22,6 +24,8 @@ class Project(models.Model):
     link_github = models.URLField(blank=True, null=True, verbose_name='GitHub')
 
     image = models.ImageField(upload_to='projects/', blank=True, null=True, verbose_name='Картинка')
+    # Responsive derivatives of `image`, see portfolio.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     category = models.CharField(
         max_length=20,
         choices=ProjectCategory.choices,
@@ -35,13 +39,91 @@ class Project(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='project_created_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], name='project_category_created_idx'),
+            # export order and Max('updated_at') behind the ETags
+            models.Index(fields=['updated_at', 'id'], name='project_updated_idx'),
+            # admin date filters
+            models.Index(fields=['release_date'], name='project_release_date_idx'),
+            models.Index(fields=['work_start_date'], name='project_work_start_idx'),
+            models.Index(fields=['work_end_date'], name='project_work_end_idx'),
+        ]
         verbose_name = 'Проект'
         verbose_name_plural = 'Проекты'
 
     def __str__(self) -> str:
         return self.name
 
+    def save(self, *args, **kwargs):
+        # post_save rewrites the snapshots (portfolio.snapshots); in one
+        # transaction with the row, readers never see them disagree.
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+    @property
+    def image_sources(self) -> list:
+        from .images import picture_sources
+
+        return picture_sources(self.image_variants)
+
+
+class ProjectSnapshot(models.Model):
+    """Готовое представление проекта для публичных страниц, см. portfolio.snapshots.
+
+    Пересобирается при каждом сохранении проекта; вручную не редактируется.
+    """
+
+    project = models.OneToOneField(
+        Project,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='snapshot',
+    )
+    # copies of the project's columns the API filters and pages by
+    category = models.CharField(max_length=20, choices=ProjectCategory.choices)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    # the /api/projects/ object, JSON, with the site origin left as a placeholder
+    payload = models.TextField()
+    # what a home page card shows (fragments.CARD_FIELDS)
+    card = models.JSONField()
+
+    class Meta:
+        ordering = ['-created_at', '-project_id']
+        indexes = [
+            models.Index(fields=['-created_at', '-project'], name='snapshot_created_idx'),
+            models.Index(fields=['category', '-created_at', '-project'], name='snapshot_category_created_idx'),
+        ]
+        verbose_name = 'Снимок проекта'
+        verbose_name_plural = 'Снимки проектов'
+
+    def __str__(self) -> str:
+        return f"#{self.pk}"
+
+
+class ProjectListSnapshot(models.Model):
+    """Весь список проектов одним документом (единственная строка, id=1).
+
+    Пока строки нет, снимки не собраны и страницы читают таблицу проектов.
+    """
+
+    # the /api/projects/ response, JSON array, origin placeholders as in ProjectSnapshot
+    payload = models.TextField()
+    # [{id, updated_at, *CARD_FIELDS}] in list order, for the home page
+    cards = models.JSONField()
+    count = models.PositiveIntegerField()
+    built_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Снимок списка проектов'
+        verbose_name_plural = 'Снимки списка проектов'
+
+    def __str__(self) -> str:
+        return f"{self.count} ({self.built_at:%Y-%m-%d %H:%M:%S})"
+
 
 class ContactMessage(models.Model):
     full_name = models.CharField(max_length=255, verbose_name='Имя')
@@ -51,6 +133,9 @@ class ContactMessage(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='contact_created_idx'),
+        ]
         verbose_name = 'Сообщение с формы'
         verbose_name_plural = 'Сообщения с формы'
 
@@ -58,6 +143,99 @@ class ContactMessage(models.Model):
         return f"{self.full_name} <{self.email}>"
 
 
+class TelegramOutbox(models.Model):
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Ожидает отправки'
+        SENT = 'sent', 'Отправлено'
+        FAILED = 'failed', 'Ошибка'
+
+    contact = models.ForeignKey(
+        ContactMessage,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='telegram_notifications',
+        verbose_name='Сообщение с формы',
+    )
+    text = models.TextField(verbose_name='Текст')
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name='Статус',
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Попыток')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='Следующая попытка')
+    last_error = models.TextField(blank=True, default='', verbose_name='Последняя ошибка')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True, verbose_name='Доставлено')
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='outbox_created_idx'),
+            # the worker's claim query; sent rows pile up and are never read by it
+            models.Index(
+                fields=['next_attempt_at', 'id'],
+                name='outbox_pending_due_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
+        verbose_name = 'Уведомление Telegram'
+        verbose_name_plural = 'Очередь уведомлений Telegram'
+
+    def __str__(self) -> str:
+        return f"#{self.pk} ({self.get_status_display()})"
+
+
+class ContactResendJob(models.Model):
+    """Повторная отправка выбранных в админке сообщений, пачками в фоне.
+
+    Воркер `send_telegram_outbox` продвигает задачу по CONTACT_RESEND_CHUNK_SIZE
+    сообщений: ставит их в очередь Telegram и запоминает, где остановился.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'В работе'
+        DONE = 'done', 'Готово'
+        FAILED = 'failed', 'Ошибка'
+
+    title = models.CharField(max_length=255, verbose_name='Заголовок уведомлений')
+    # {"ids": [...]} или {"search": "..."}, см. portfolio.outbox.create_resend_job
+    selection = models.JSONField(default=dict, editable=False)
+    # считает воркер при первом проходе
+    total = models.PositiveIntegerField(blank=True, null=True, verbose_name='Всего')
+    processed = models.PositiveIntegerField(default=0, verbose_name='Поставлено в очередь')
+    # последнее обработанное сообщение в порядке ('-created_at', '-id')
+    cursor_created_at = models.DateTimeField(blank=True, null=True, editable=False)
+    cursor_id = models.BigIntegerField(blank=True, null=True, editable=False)
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name='Статус',
+    )
+    last_error = models.TextField(blank=True, default='', verbose_name='Ошибка')
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='+',
+        verbose_name='Запустил',
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True, verbose_name='Завершена')
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Повторная отправка'
+        verbose_name_plural = 'Повторные отправки'
+
+    def __str__(self) -> str:
+        return f"#{self.pk} ({self.processed}/{'?' if self.total is None else self.total})"
+
+
 class SocialLinks(models.Model):
     telegram = models.URLField(blank=True, null=True, verbose_name='Telegram')
     github = models.URLField(blank=True, null=True, verbose_name='GitHub')
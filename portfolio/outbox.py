@@ -0,0 +1,190 @@
+import asyncio
+import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ContactMessage, ContactResendJob, TelegramOutbox
+from .pagination import after_cursor
+from .search import search_contacts
+from .telegram import RateLimited, get_notifier
+
+
+def is_configured() -> bool:
+    return bool(settings.TELEGRAM_BOT_TOKEN and settings.TELEGRAM_CHAT_ID)
+
+
+def format_contact(contact: ContactMessage, title: str) -> str:
+    return (
+        f"{title}:\n"
+        f"Имя: {contact.full_name}\n"
+        f"Email: {contact.email}\n"
+        f"Сообщение: {contact.message}"
+    )
+
+
+def enqueue_contact(contact: ContactMessage, title: str):
+    """Ставит уведомление в очередь; отправкой занимается `manage.py send_telegram_outbox`."""
+    if not is_configured():
+        return None
+    return TelegramOutbox.objects.create(contact=contact, text=format_contact(contact, title))
+
+
+def enqueue_contacts(items: list) -> None:
+    """Пакетный enqueue_contact: items — пары (contact, title), одним INSERT."""
+    if not is_configured() or not items:
+        return
+    TelegramOutbox.objects.bulk_create(
+        TelegramOutbox(contact=contact, text=format_contact(contact, title)) for contact, title in items
+    )
+
+
+def create_resend_job(title: str, user=None, ids=None, search: str = '') -> ContactResendJob:
+    """Задача повторной отправки сообщений, выбранных в админке.
+
+    Выборка хранится как JSON: `ids` — отмеченные сообщения, иначе все,
+    что находит поиск `search` (пустой — все сообщения), так что выбор
+    «все N сообщений» по миллионной таблице не грузит id в память.
+    Сколько их всего, считает воркер, а не запрос админки.
+    """
+    selection = {"ids": list(ids)} if ids is not None else {"search": search}
+    return ContactResendJob.objects.create(
+        title=title,
+        selection=selection,
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+
+
+def resend_queryset(selection: dict):
+    """ContactMessage выборки задачи (см. create_resend_job)."""
+    queryset = ContactMessage.objects.all()
+    if 'ids' in selection:
+        return queryset.filter(pk__in=selection['ids'])
+    return search_contacts(queryset, selection.get('search', ''))
+
+
+def advance_resend_jobs(chunk_size: int | None = None) -> int:
+    """Ставит в очередь следующую пачку самой старой незавершённой задачи.
+
+    Пачка, её строки очереди и сдвиг курсора пишутся в одной транзакции,
+    так что упавший воркер не задвоит уведомления. Возвращает размер пачки.
+    """
+    chunk_size = chunk_size or settings.CONTACT_RESEND_CHUNK_SIZE
+    with transaction.atomic():
+        job = (
+            ContactResendJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ContactResendJob.Status.PENDING)
+            .order_by('id')
+            .first()
+        )
+        if job is None:
+            return 0
+        queryset = resend_queryset(job.selection)
+        if job.total is None:
+            job.total = queryset.count()
+        cursor = (job.cursor_created_at, job.cursor_id) if job.cursor_id is not None else None
+        contacts = list(after_cursor(queryset.order_by('-created_at', '-id'), cursor)[:chunk_size])
+        enqueue_contacts([(contact, job.title) for contact in contacts])
+        if contacts:
+            job.cursor_created_at, job.cursor_id = contacts[-1].created_at, contacts[-1].pk
+            job.processed += len(contacts)
+        if len(contacts) < chunk_size:
+            job.status = ContactResendJob.Status.DONE
+            job.finished_at = timezone.now()
+        job.save(update_fields=['total', 'cursor_created_at', 'cursor_id', 'processed', 'status', 'finished_at'])
+    return len(contacts)
+
+
+def backoff(attempts: int) -> datetime.timedelta:
+    seconds = settings.TELEGRAM_OUTBOX_BACKOFF_BASE * (2 ** max(attempts - 1, 0))
+    return datetime.timedelta(seconds=min(seconds, settings.TELEGRAM_OUTBOX_BACKOFF_MAX))
+
+
+def due(now):
+    """Записи, которые пора отправить, в порядке очереди."""
+    return (
+        TelegramOutbox.objects
+        .filter(status=TelegramOutbox.Status.PENDING, next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'id')
+    )
+
+
+def claim_batch(batch_size: int) -> list:
+    """Забирает пачку готовых к отправке записей, продлевая их аренду.
+
+    Пока запись "арендована", другие воркеры её не видят, поэтому
+    несколько процессов могут разбирать очередь параллельно, а запись
+    упавшего воркера снова станет доступна после истечения аренды.
+    """
+    now = timezone.now()
+    lease_until = now + datetime.timedelta(seconds=settings.TELEGRAM_OUTBOX_LEASE)
+    with transaction.atomic():
+        items = list(due(now).select_for_update(skip_locked=True)[:batch_size])
+        if items:
+            TelegramOutbox.objects.filter(pk__in=[i.pk for i in items]).update(
+                next_attempt_at=lease_until, attempts=F('attempts') + 1
+            )
+    for item in items:
+        item.attempts += 1
+    return items
+
+
+def _record_failure(item: TelegramOutbox, error: Exception) -> None:
+    item.last_error = get_notifier().clean_error(error)[:1000]
+    if item.attempts >= settings.TELEGRAM_OUTBOX_MAX_ATTEMPTS:
+        item.status = TelegramOutbox.Status.FAILED
+    else:
+        delay = backoff(item.attempts)
+        if isinstance(error, RateLimited):
+            delay = max(delay, datetime.timedelta(seconds=error.retry_after))
+        item.next_attempt_at = timezone.now() + delay
+    item.save(update_fields=['status', 'next_attempt_at', 'last_error'])
+
+
+def _record_success(items: list) -> None:
+    TelegramOutbox.objects.filter(pk__in=[item.pk for item in items]).update(
+        status=TelegramOutbox.Status.SENT, sent_at=timezone.now(), last_error=''
+    )
+
+
+def _record(items: list, errors: list) -> tuple[int, int]:
+    delivered = [item for item, error in zip(items, errors) if error is None]
+    _record_success(delivered)
+    for item, error in zip(items, errors):
+        if error is not None:
+            _record_failure(item, error)
+    return len(delivered), len(items) - len(delivered)
+
+
+def drain(batch_size: int | None = None) -> tuple[int, int]:
+    """Отправляет одну пачку. Возвращает (доставлено, не доставлено).
+
+    Уведомления пачки склеиваются в минимальное число сообщений Telegram.
+    """
+    if not is_configured():
+        return 0, 0
+    items = claim_batch(batch_size or settings.TELEGRAM_OUTBOX_BATCH_SIZE)
+    if not items:
+        return 0, 0
+    errors = get_notifier().send_bulk([item.text for item in items])
+    return _record(items, errors)
+
+
+async def _asend(client, text: str):
+    try:
+        await get_notifier().asend(client, text)
+    except Exception as exc:
+        return exc
+    return None
+
+
+async def adrain(client, batch_size: int | None = None) -> tuple[int, int]:
+    """Как drain(), но отправляет пачку параллельно через общий httpx.AsyncClient."""
+    if not is_configured():
+        return 0, 0
+    items = await sync_to_async(claim_batch)(batch_size or settings.TELEGRAM_OUTBOX_BATCH_SIZE)
+    errors = await asyncio.gather(*(_asend(client, item.text) for item in items))
+    return await sync_to_async(_record)(items, list(errors))
@@ -0,0 +1,83 @@
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+def parse_limit(value):
+    if not value:
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return min(limit, settings.PROJECTS_API_MAX_LIMIT)
+
+
+def encode_cursor(created_at, pk) -> str:
+    """Cursor pointing after the row with these ordering values."""
+    raw = json.dumps([created_at.isoformat(), pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        created_at, pk = json.loads(raw)
+        return datetime.datetime.fromisoformat(created_at), int(pk)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def after_cursor(queryset, cursor):
+    """Rows that follow `cursor` in the ('-created_at', '-id') order."""
+    if cursor is None:
+        return queryset
+    created_at, pk = cursor
+    return queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator for admin changelists over large tables.
+
+    Counts at most ADMIN_COUNT_LIMIT rows (a COUNT over a LIMIT subquery).
+    An unfiltered PostgreSQL table past the limit reports the planner's
+    estimate from pg_class.reltuples instead. `estimated` tells the
+    template the number isn't exact.
+    """
+
+    estimated = False
+
+    @cached_property
+    def count(self):
+        limit = settings.ADMIN_COUNT_LIMIT
+        queryset = self.object_list
+        count = queryset.order_by()[:limit + 1].count()
+        if count <= limit:
+            return count
+        self.estimated = True
+        if not queryset.query.where:
+            estimate = _reltuples(queryset.db, queryset.model._meta.db_table)
+            if estimate > limit:
+                return estimate
+        return limit
+
+
+def _reltuples(alias: str, table: str) -> int:
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return -1
+    with connection.cursor() as cursor:
+        # -1 until the table has been vacuumed or analyzed
+        cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        row = cursor.fetchone()
+    return row[0] if row else -1
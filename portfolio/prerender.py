@@ -0,0 +1,212 @@
+"""Pre-rendered snapshot of the public pages for a static server.
+
+build() renders every page from pages() through the regular views into
+PRERENDER_ROOT/builds/<hash>/ and then atomically repoints the
+PRERENDER_ROOT/current symlink at it. Each page is stored under a key equal
+to the ETag the live view would send; an incremental build hard-links pages
+whose key is unchanged from the previous build instead of rendering them.
+
+Only parameterless GETs are pre-rendered; requests with a query string,
+the contact form, the admin and the rest of the API stay on Django (see the
+nginx snippet in README.md).
+"""
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.urls import resolve, reverse
+
+from . import conditional
+from .models import Project
+
+if TYPE_CHECKING:
+    from django.test import RequestFactory
+
+logger = logging.getLogger('portfolio.prerender')
+
+
+class PrerenderError(Exception):
+    pass
+
+
+def pages() -> list:
+    """[(url path, key)] to pre-render; a None key is always re-rendered."""
+    # The validator helpers don't look at the request.
+    result = [
+        (reverse('home'), conditional.home_etag(None)),
+        (reverse('projects_api'), conditional.projects_etag(None)),
+        (reverse('swagger_json'), None),
+    ]
+    social = conditional.social_links_etag(None)
+    for pk, updated_at in Project.objects.values_list('pk', 'updated_at'):
+        etag = conditional._project_etag(pk, updated_at)
+        result.append((reverse('project_detail', args=[pk]), conditional._digest(etag, social)))
+        result.append((reverse('project_detail_api', args=[pk]), etag))
+    return result
+
+
+def _factory() -> 'RequestFactory':
+    # django.test costs a worker ~20 ms of imports; only builds need it
+    from django.test import RequestFactory
+
+    base_url = settings.PRERENDER_BASE_URL
+    if not base_url:
+        raise PrerenderError("Set PRERENDER_BASE_URL to the public site URL, e.g. https://example.com")
+    parts = urlsplit(base_url)
+    secure = parts.scheme == 'https'
+    return RequestFactory(
+        SERVER_NAME=parts.hostname,
+        SERVER_PORT=str(parts.port or (443 if secure else 80)),
+        **{'wsgi.url_scheme': parts.scheme},
+    )
+
+
+def render(factory: 'RequestFactory', path: str) -> tuple:
+    """Renders `path` through its view; returns (body, content type)."""
+    match = resolve(path)
+    request = factory.get(path)
+    request.resolver_match = match
+    view = match.func
+    if asyncio.iscoroutinefunction(view):
+        view = async_to_sync(view)
+    response = view(request, *match.args, **match.kwargs)
+    if hasattr(response, 'render'):
+        response = response.render()
+    if response.status_code != 200:
+        raise PrerenderError(f"{path}: HTTP {response.status_code}")
+    return response.content, response['Content-Type']
+
+
+def _file_for(path: str, content_type: str) -> str:
+    name = path.lstrip('/')
+    if not name or name.endswith('/'):
+        name += 'index.json' if content_type.startswith('application/json') else 'index.html'
+    return name
+
+
+def _manifest_path(build_dir: Path) -> Path:
+    # next to the build rather than inside it, so the static server can't serve it
+    return build_dir.with_name(f'{build_dir.name}.json')
+
+
+def _read_manifest(current: Path) -> dict:
+    if not current.is_symlink():
+        return {}
+    try:
+        return json.loads(_manifest_path(current.resolve()).read_text())['pages']
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def _write(target: Path, body: bytes) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_bytes(body)
+
+
+def _reuse(source: Path, target: Path) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def _point_current(root: Path, build_dir: Path) -> None:
+    link = root / 'current'
+    tmp = root / '.current.tmp'
+    if tmp.is_symlink():
+        tmp.unlink()
+    tmp.symlink_to(build_dir.relative_to(root))
+    os.replace(tmp, link)
+
+
+def _prune(root: Path, keep: int) -> None:
+    current = (root / 'current').resolve()
+    builds = sorted(
+        (p for p in (root / 'builds').iterdir() if p.is_dir()),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True,
+    )
+    for build_dir in builds[keep:]:
+        if build_dir.resolve() != current:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            _manifest_path(build_dir).unlink(missing_ok=True)
+
+
+def build(full: bool = False) -> dict:
+    """Builds a new snapshot and makes it current.
+
+    Returns {"hash", "rendered", "reused", "pages"}. With full=False, pages
+    whose key matches the current build are reused; pass full=True after
+    template or code changes.
+    """
+    root = Path(settings.PRERENDER_ROOT)
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return _build(root, full)
+
+
+def _build(root: Path, full: bool) -> dict:
+    factory = _factory()
+    current = root / 'current'
+    previous = {} if full else _read_manifest(current)
+    staging = Path(tempfile.mkdtemp(prefix='.build-', dir=root))
+    manifest = {}
+    rendered = reused = 0
+    try:
+        for path, key in pages():
+            entry = previous.get(path)
+            if key is not None and entry and entry['key'] == key:
+                _reuse(current / entry['file'], staging / entry['file'])
+                manifest[path] = entry
+                reused += 1
+                continue
+            body, content_type = render(factory, path)
+            name = _file_for(path, content_type)
+            _write(staging / name, body)
+            manifest[path] = {'key': key, 'file': name, 'sha1': hashlib.sha1(body).hexdigest()}
+            rendered += 1
+
+        build_hash = hashlib.sha1(
+            json.dumps(sorted((path, entry['sha1']) for path, entry in manifest.items())).encode()
+        ).hexdigest()[:12]
+        build_dir = root / 'builds' / build_hash
+        if build_dir.exists():
+            # same content as an earlier build, e.g. a save that changed nothing visible
+            shutil.rmtree(staging)
+            os.utime(build_dir)
+        else:
+            build_dir.parent.mkdir(exist_ok=True)
+            staging.chmod(0o755)
+            os.rename(staging, build_dir)
+        manifest_tmp = root / '.manifest.tmp'
+        manifest_tmp.write_text(json.dumps({'hash': build_hash, 'pages': manifest}, indent=1))
+        os.replace(manifest_tmp, _manifest_path(build_dir))
+        _point_current(root, build_dir)
+        _prune(root, settings.PRERENDER_KEEP_BUILDS)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return {'hash': build_hash, 'rendered': rendered, 'reused': reused, 'pages': len(manifest)}
+
+
+def build_on_commit() -> None:
+    """Incremental build for the save-signal hook; failures are only logged
+    so they never break the admin save that triggered them."""
+    try:
+        result = build()
+    except Exception:
+        logger.exception("Prerender failed")
+    else:
+        logger.info("Prerendered build %(hash)s: %(rendered)d rendered, %(reused)d reused", result)
@@ -0,0 +1,256 @@
+"""Token-bucket rate limiting for the contact endpoints.
+
+A rate "N/period" is a bucket of N tokens refilled evenly over the period.
+It is stored in its GCRA form: one "theoretical arrival time" per key, so a
+check is a single read and write with no database access.
+
+Backends (RATELIMIT_BACKEND):
+  memory  per-process dict, bounded LRU; enough for a single worker
+  cache   the PORTFOLIO_CACHE_ALIAS cache, shared by all workers when that
+          is redis or file. Every stored value carries a random token and a
+          write must first win cache.add() of a claim on the token it read,
+          so concurrent hits on one key can't both take the last token. That
+          is as atomic as the backend's add(): redis, memcached and locmem
+          are, the file cache's add() is a check-then-write.
+
+A request under several limits (per IP and per e-mail) takes a token from
+each only when all of them allow it.
+
+Usage:
+
+    @ratelimit('contact', CONTACT_LIMITS)
+    def contact_api(request): ...
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from .cache import get_cache
+
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate: str) -> tuple:
+    """(count, period in seconds): "5/10m" is five requests per ten minutes."""
+    count, _, period = rate.partition('/')
+    period = period.strip() or 's'
+    if period[-1] in _UNITS:
+        seconds = float(period[:-1] or 1) * _UNITS[period[-1]]
+    else:
+        seconds = float(period)
+    return int(count), seconds
+
+
+def _step(tat, now: float, count: int, period: float) -> tuple:
+    """One GCRA step: (new tat to store or None if denied, retry after)."""
+    interval = period / count
+    tat = now if tat is None else max(tat, now)
+    # Compared as the backlog rather than via (tat + interval) - period, which
+    # float rounding can push past `now` and deny a full bucket.
+    wait = (tat - now) - (period - interval)
+    if wait > 0:
+        return None, wait
+    return tat + interval, 0.0
+
+
+class MemoryBackend:
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._tat = OrderedDict()
+        self._lock = threading.Lock()
+
+    def peek(self, key: str, count: int, period: float) -> float:
+        """What hit() would return, without taking a token."""
+        with self._lock:
+            return _step(self._tat.get(key), time.monotonic(), count, period)[1]
+
+    def hit(self, key: str, count: int, period: float) -> float:
+        """Takes a token; returns 0 if allowed, else seconds until the next one."""
+        now = time.monotonic()
+        with self._lock:
+            new_tat, retry_after = _step(self._tat.get(key), now, count, period)
+            if new_tat is not None:
+                self._tat[key] = new_tat
+                self._tat.move_to_end(key)
+                if len(self._tat) > self.max_keys:
+                    self._tat.popitem(last=False)
+        return retry_after
+
+    async def apeek(self, key: str, count: int, period: float) -> float:
+        return self.peek(key, count, period)
+
+    async def ahit(self, key: str, count: int, period: float) -> float:
+        return self.hit(key, count, period)
+
+
+# Attempts at replacing a value other workers keep replacing first; after
+# that the hit is denied for one interval rather than spinning.
+CAS_ATTEMPTS = 5
+
+
+def _unpack(state) -> tuple:
+    """(token, tat) of a stored value, (None, None) if there is none."""
+    if state is None:
+        return None, None
+    if isinstance(state, float):  # stored before the tokens
+        return repr(state), state
+    return state
+
+
+class CacheBackend:
+    """Stores (token, tat); see the module docstring."""
+
+    def peek(self, key: str, count: int, period: float) -> float:
+        return _step(_unpack(get_cache().get(key))[1], time.time(), count, period)[1]
+
+    def hit(self, key: str, count: int, period: float) -> float:
+        cache = get_cache()
+        for _ in range(CAS_ATTEMPTS):
+            token, tat = _unpack(cache.get(key))
+            now = time.time()
+            new_tat, retry_after = _step(tat, now, count, period)
+            if new_tat is None:
+                return retry_after
+            timeout = math.ceil(new_tat - now) + 1
+            new_state = (uuid.uuid4().hex, new_tat)
+            if token is None:
+                if cache.add(key, new_state, timeout=timeout):
+                    return 0.0
+            elif cache.add(f'{key}:{token}', True, timeout=timeout):
+                cache.set(key, new_state, timeout=timeout)
+                return 0.0
+        return period / count
+
+    async def apeek(self, key: str, count: int, period: float) -> float:
+        return _step(_unpack(await get_cache().aget(key))[1], time.time(), count, period)[1]
+
+    async def ahit(self, key: str, count: int, period: float) -> float:
+        cache = get_cache()
+        for _ in range(CAS_ATTEMPTS):
+            token, tat = _unpack(await cache.aget(key))
+            now = time.time()
+            new_tat, retry_after = _step(tat, now, count, period)
+            if new_tat is None:
+                return retry_after
+            timeout = math.ceil(new_tat - now) + 1
+            new_state = (uuid.uuid4().hex, new_tat)
+            if token is None:
+                if await cache.aadd(key, new_state, timeout=timeout):
+                    return 0.0
+            elif await cache.aadd(f'{key}:{token}', True, timeout=timeout):
+                await cache.aset(key, new_state, timeout=timeout)
+                return 0.0
+        return period / count
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    backend_class = CacheBackend if settings.RATELIMIT_BACKEND == 'cache' else MemoryBackend
+    if not isinstance(_backend, backend_class):
+        _backend = backend_class()
+    return _backend
+
+
+def client_ip(request) -> str:
+    # Behind nginx REMOTE_ADDR is the proxy; RATELIMIT_IP_HEADER names the
+    # header it sets (e.g. HTTP_X_REAL_IP). Only trust it behind a proxy.
+    header = settings.RATELIMIT_IP_HEADER
+    value = request.META.get(header, '') if header else ''
+    return value.split(',')[0].strip() or request.META.get('REMOTE_ADDR', '')
+
+
+def submitted_email(request) -> str:
+    if request.content_type and 'application/json' in request.content_type:
+        try:
+            email = json.loads(request.body or b"{}").get('email')
+        except Exception:
+            email = None
+    else:
+        email = request.POST.get('email')
+    return email.strip().lower() if isinstance(email, str) else ''
+
+
+# (name, key function, setting with the rate)
+CONTACT_LIMITS = (
+    ('ip', client_ip, 'RATELIMIT_CONTACT_IP'),
+    ('email', submitted_email, 'RATELIMIT_CONTACT_EMAIL'),
+)
+
+
+def _checks(scope: str, request, limits):
+    for name, key_func, rate_setting in limits:
+        value = key_func(request)
+        if not value:
+            continue
+        digest = hashlib.sha1(value.encode()).hexdigest()
+        count, period = parse_rate(getattr(settings, rate_setting))
+        yield f"portfolio:ratelimit:{scope}:{name}:{digest}", count, period
+
+
+def check(scope: str, request, limits) -> float:
+    """Returns the longest wait, 0 if all limits allow the request.
+
+    A token is taken from every limit only once all of them allow it, so a
+    request rejected by the e-mail limit doesn't use up the IP's quota.
+    """
+    backend = get_backend()
+    checks = list(_checks(scope, request, limits))
+    retry_after = max((backend.peek(*args) for args in checks), default=0.0)
+    if retry_after:
+        return retry_after
+    return max((backend.hit(*args) for args in checks), default=0.0)
+
+
+async def acheck(scope: str, request, limits) -> float:
+    backend = get_backend()
+    checks = list(_checks(scope, request, limits))
+    retry_after = max([await backend.apeek(*args) for args in checks], default=0.0)
+    if retry_after:
+        return retry_after
+    return max([await backend.ahit(*args) for args in checks], default=0.0)
+
+
+def too_many_requests(request, retry_after: float):
+    response = JsonResponse({"detail": "Too many requests"}, status=429)
+    response['Retry-After'] = str(math.ceil(retry_after))
+    return response
+
+
+def ratelimit(scope: str, limits, methods=('POST',), limited=too_many_requests):
+    """Rejects requests over any of `limits` with `limited(request, retry_after)`.
+
+    `limited` must return a response; the default is a JSON 429 with
+    Retry-After. Works on sync and async views.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapped(request, *args, **kwargs):
+                if settings.RATELIMIT_ENABLED and request.method in methods:
+                    retry_after = await acheck(scope, request, limits)
+                    if retry_after:
+                        return limited(request, retry_after)
+                return await view(request, *args, **kwargs)
+            return async_wrapped
+
+        @functools.wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if settings.RATELIMIT_ENABLED and request.method in methods:
+                retry_after = check(scope, request, limits)
+                if retry_after:
+                    return limited(request, retry_after)
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
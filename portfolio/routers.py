@@ -0,0 +1,130 @@
+"""Read-replica routing.
+
+Every alias in DATABASES other than `default` is a replica (see
+DATABASE_REPLICAS in settings). ReplicaMiddleware lets the public
+read-only views (REPLICA_VIEWS, GET/HEAD only) read from a random replica;
+everything else, the admin included, reads and writes the primary.
+
+Replicas lag behind, so reads go back to the primary after a write:
+
+* the client that wrote gets a cookie and reads from the primary for
+  DATABASE_REPLICA_PIN_SECONDS;
+* a write to a model the public pages show (PUBLIC_MODELS) pins every
+  client for that long. Otherwise the page cache, invalidated by the same
+  write, would be refilled from a replica that hasn't seen it yet and keep
+  the old data until it expires.
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .cache import get_shared_cache
+
+REPLICA_VIEWS = frozenset({
+    'home',
+    'project_detail',
+    'projects_api',
+    'project_detail_api',
+    'projects_search_api',
+    'social_links_api',
+})
+
+PUBLIC_MODELS = frozenset({'project', 'projectsnapshot', 'projectlistsnapshot', 'sociallinks'})
+
+PIN_COOKIE = 'primary_db'
+PRIMARY_UNTIL_KEY = 'portfolio:replica:primary-until'
+
+
+class _Routing:
+    def __init__(self):
+        self.replica = False
+        self.wrote = False
+
+
+_state: ContextVar = ContextVar('portfolio_db_routing', default=None)
+
+
+def pin_primary() -> None:
+    get_shared_cache().set(PRIMARY_UNTIL_KEY, True, timeout=settings.DATABASE_REPLICA_PIN_SECONDS)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is not None and state.replica and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            # the rest of the request must see what it wrote
+            state.wrote = True
+            state.replica = False
+        if model._meta.app_label == 'portfolio' and model._meta.model_name in PUBLIC_MODELS:
+            pin_primary()
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = _Routing()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._pin(response, state)
+
+    async def __acall__(self, request):
+        # Each request runs in a task of its own, and the sync_to_async
+        # threads of the ORM copy the task's context: the router sees this
+        # state there, and the reset keeps it from reaching anything else.
+        state = _Routing()
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._pin(response, state)
+
+    def _pin(self, response, state: _Routing):
+        if state.wrote:
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.DATABASE_REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _state.get()
+        if (
+            state is not None
+            and request.method in ('GET', 'HEAD')
+            and request.resolver_match.url_name in REPLICA_VIEWS
+            and PIN_COOKIE not in request.COOKIES
+            and not get_shared_cache().get(PRIMARY_UNTIL_KEY)
+        ):
+            state.replica = True
+        return None
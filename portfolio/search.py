@@ -0,0 +1,115 @@
+"""Full-text search over projects and contact messages.
+
+PostgreSQL: `search_vector` tsvector column (Russian + English configs,
+weighted name > subtitle > descriptions) with a GIN index.
+SQLite: FTS5 table `portfolio_project_fts` ranked with bm25().
+Other backends fall back to icontains. Both indexes are created and kept
+current by migration 0007.
+
+Contact messages get the same pair of indexes from migration 0010, used
+unranked by the admin: search_contacts() narrows a queryset to matches.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Project
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+_POSTGRES_SQL = """
+    SELECT p.id, ts_rank(p.search_vector, q.query) AS score
+    FROM portfolio_project p,
+         (SELECT websearch_to_tsquery('russian', %s) || websearch_to_tsquery('english', %s) AS query) q
+    WHERE p.search_vector @@ q.query
+    ORDER BY score DESC, p.id DESC
+"""
+
+# bm25() is lower-is-better; weights follow the column order in the FTS table
+_SQLITE_SQL = """
+    SELECT rowid, -bm25(portfolio_project_fts, 10.0, 5.0, 1.0, 1.0) AS score
+    FROM portfolio_project_fts
+    WHERE portfolio_project_fts MATCH %s
+    ORDER BY score DESC, rowid DESC
+"""
+
+
+def _fts5_query(query: str) -> str:
+    # Quote every word so user input can't use FTS5 syntax; prefix-match each.
+    return ' '.join(f'"{word}"*' for word in _WORD_RE.findall(query))
+
+
+def search_project_ids(query: str, limit: int | None = None) -> list:
+    """[(project id, rank)] best match first."""
+    query = query.strip()
+    if not query:
+        return []
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        sql, params = _POSTGRES_SQL, [query, query]
+    elif vendor == 'sqlite':
+        match = _fts5_query(query)
+        if not match:
+            return []
+        sql, params = _SQLITE_SQL, [match]
+    else:
+        fields = ('name', 'subtitle', 'description', 'description_en')
+        condition = Q()
+        for field in fields:
+            condition |= Q(**{f'{field}__icontains': query})
+        ids = Project.objects.filter(condition).values_list('id', flat=True)
+        return [(pk, 1.0) for pk in (ids[:limit] if limit else ids)]
+    if limit:
+        sql += ' LIMIT %s'
+        params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(pk, float(rank)) for pk, rank in cursor.fetchall()]
+
+
+def search_projects(query: str, limit: int | None = None) -> list:
+    """Projects matching `query` in rank order, each with a `search_rank` attribute."""
+    ranked = search_project_ids(query, limit)
+    projects = Project.objects.in_bulk([pk for pk, _rank in ranked])
+    result = []
+    for pk, rank in ranked:
+        if pk in projects:
+            projects[pk].search_rank = rank
+            result.append(projects[pk])
+    return result
+
+
+# Names and addresses aren't Russian words: the 'simple' config keeps them as typed.
+_CONTACT_POSTGRES_SQL = """
+    SELECT id FROM portfolio_contactmessage
+    WHERE search_vector @@ (websearch_to_tsquery('simple', %s) || websearch_to_tsquery('russian', %s))
+"""
+
+_CONTACT_SQLITE_SQL = """
+    SELECT rowid FROM portfolio_contactmessage_fts WHERE portfolio_contactmessage_fts MATCH %s
+"""
+
+
+def search_contacts(queryset, query: str):
+    """`queryset` of ContactMessage narrowed to messages matching `query`.
+
+    The match is a subquery, so it composes with the admin's filters and
+    ordering without pulling the matching ids into Python.
+    """
+    query = query.strip()
+    if not query:
+        return queryset
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        return queryset.filter(pk__in=RawSQL(_CONTACT_POSTGRES_SQL, [query, query]))
+    if vendor == 'sqlite':
+        match = _fts5_query(query)
+        if not match:
+            return queryset.none()
+        return queryset.filter(pk__in=RawSQL(_CONTACT_SQLITE_SQL, [match]))
+    condition = Q()
+    for field in ('full_name', 'email', 'message'):
+        condition |= Q(**{f'{field}__icontains': query})
+    return queryset.filter(condition)
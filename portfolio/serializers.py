@@ -0,0 +1,196 @@
+"""Declarative serializer for the Project JSON payload.
+
+PROJECT_FIELDS declares every output key as a Column (one model column plus
+an optional converter) or a Nested object of Columns. A Plan compiles a
+field selection once into the list of columns to fetch with
+.values_list() and one getter per key, so a page is serialized straight
+from row tuples without creating model instances. Per-request state (the
+absolute site origin and media base URL) lives in a Context built once
+per request.
+
+dumps() encodes with orjson when it is installed, else with the stdlib.
+"""
+import functools
+import json
+
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.encoding import filepath_to_uri
+
+from .models import ProjectCategory
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+class Context:
+    """Per-request values the converters need.
+
+    Outside a request (management commands) pass the site `origin`,
+    e.g. "https://example.com", instead.
+    """
+
+    def __init__(self, request=None, origin: str | None = None):
+        self.request = request
+        if origin is not None:
+            self.origin = origin.rstrip('/')
+
+    @functools.cached_property
+    def origin(self) -> str:
+        return self.request.build_absolute_uri('/')[:-1]
+
+    def absolute(self, url: str) -> str:
+        return self.origin + url if url.startswith('/') else url
+
+    @functools.cached_property
+    def media_base(self) -> str | None:
+        # FileSystemStorage.url() is base_url joined with the quoted name;
+        # its urljoin() dominated serialization time, so concatenate instead.
+        if isinstance(default_storage, FileSystemStorage):
+            return self.absolute(default_storage.base_url)
+        return None
+
+    def media_url(self, name: str) -> str:
+        if self.media_base is not None:
+            return self.media_base + filepath_to_uri(name)
+        return self.absolute(default_storage.url(name))
+
+
+class Column:
+    def __init__(self, column: str, convert=None):
+        """`convert(value, context)` turns the raw column value into JSON."""
+        self.column = column
+        self.columns = (column,)
+        self.convert = convert
+
+    def compile(self, index: dict):
+        i = index[self.column]
+        convert = self.convert
+        if convert is None:
+            return lambda row, context: row[i]
+        return lambda row, context: convert(row[i], context)
+
+
+class Nested:
+    def __init__(self, fields: dict):
+        self.fields = fields
+        self.columns = tuple(column for field in fields.values() for column in field.columns)
+
+    def compile(self, index: dict):
+        getters = tuple((key, field.compile(index)) for key, field in self.fields.items())
+        return lambda row, context: {key: get(row, context) for key, get in getters}
+
+
+class Plan:
+    """A compiled selection of PROJECT_FIELDS.
+
+    `columns` is what to pass to .values_list(); `index` maps a column to
+    its position in the fetched row. `extra` columns are fetched even when
+    not serialized (e.g. the keyset pagination cursor).
+    """
+
+    def __init__(self, fields: dict, names, extra=()):
+        columns = [*extra]
+        for name in names:
+            columns.extend(fields[name].columns)
+        self.columns = tuple(dict.fromkeys(columns))
+        self.index = {column: i for i, column in enumerate(self.columns)}
+        self.getters = tuple((name, fields[name].compile(self.index)) for name in names)
+
+    def serialize(self, row, context: Context) -> dict:
+        return {name: get(row, context) for name, get in self.getters}
+
+    def serialize_many(self, rows, context: Context) -> list:
+        getters = self.getters
+        return [{name: get(row, context) for name, get in getters} for row in rows]
+
+
+def _isoformat(value, context):
+    return value.isoformat() if value else None
+
+
+CATEGORY_LABELS = {value: str(label) for value, label in ProjectCategory.choices}
+
+
+def _category_label(value, context):
+    return CATEGORY_LABELS.get(value, value)
+
+
+def _media_url(name, context):
+    return context.media_url(name) if name else None
+
+
+def _image_urls(variants, context):
+    # same shape as portfolio.images.variant_urls()
+    return {
+        ext: {width: context.media_url(name) for width, name in by_width.items()}
+        for ext, by_width in (variants or {}).get('formats', {}).items()
+    }
+
+
+PROJECT_WORK_PERIOD = Nested({
+    "start": Column('work_start_date', _isoformat),
+    "end": Column('work_end_date', _isoformat),
+})
+
+PROJECT_LINKS = Nested({
+    "google_play": Column('link_google_play'),
+    "rustore": Column('link_rustore'),
+    "appstore": Column('link_appstore'),
+    "github": Column('link_github'),
+    "extra_social": Column('extra_social_link'),
+})
+
+# Output key -> field. config/openapi.py documents these, so a key that
+# isn't a plain model column needs a schema there.
+PROJECT_FIELDS = {
+    "id": Column('id'),
+    "name": Column('name'),
+    "subtitle": Column('subtitle'),
+    "description": Column('description'),
+    "description_en": Column('description_en'),
+    "category": Column('category'),
+    "category_label": Column('category', _category_label),
+    "release_date": Column('release_date', _isoformat),
+    "work_period": PROJECT_WORK_PERIOD,
+    "links": PROJECT_LINKS,
+    "image": Column('image', _media_url),
+    "images": Column('image_variants', _image_urls),
+    "updated_at": Column('updated_at', _isoformat),
+    "created_at": Column('created_at', _isoformat),
+}
+
+# fetched for every list row: the keyset cursor is built from them
+CURSOR_COLUMNS = ('created_at', 'id')
+
+
+CONTACT_FIELDS = {
+    "id": Column('id'),
+    "full_name": Column('full_name'),
+    "email": Column('email'),
+    "message": Column('message'),
+    "created_at": Column('created_at', _isoformat),
+}
+
+
+@functools.lru_cache(maxsize=64)
+def project_plan(names: tuple | None = None) -> Plan:
+    """Compiled plan for a tuple of PROJECT_FIELDS keys (None: all of them)."""
+    return Plan(PROJECT_FIELDS, names or tuple(PROJECT_FIELDS), extra=CURSOR_COLUMNS)
+
+
+@functools.cache
+def contact_plan() -> Plan:
+    return Plan(CONTACT_FIELDS, tuple(CONTACT_FIELDS))
+
+
+def dumps_stdlib(data) -> bytes:
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def dumps(data) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data)
+    return dumps_stdlib(data)
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import snapshots
+from .cache import bump_projects_version, invalidate_social_links
+from .images import drop_stale_variants, refresh_on_commit
+from .prerender import build_on_commit
+from .models import Project, SocialLinks
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def project_changed(sender, **kwargs):
+    # Bump after commit so a concurrent reader can't cache pre-commit data
+    # under the new version.
+    transaction.on_commit(bump_projects_version)
+
+
+@receiver(post_save, sender=Project)
+def project_snapshot_saved(sender, instance, raw=False, **kwargs):
+    # Runs inside Project.save()'s transaction. A fixture load saves rows
+    # one by one with raw=True: drop the snapshots instead of rebuilding
+    # them per row, the next ordinary save brings them back.
+    if raw:
+        snapshots.clear()
+    else:
+        snapshots.project_saved(instance.pk)
+
+
+@receiver(pre_delete, sender=Project)
+def project_snapshot_deleted(sender, instance, **kwargs):
+    # Before the cascade takes the snapshot: its payload is how the entry
+    # is found in the list. The delete's transaction is already open.
+    snapshots.project_deleted(instance.pk)
+
+
+@receiver(pre_save, sender=Project)
+def project_image_changing(sender, instance, raw=False, **kwargs):
+    if not raw:
+        drop_stale_variants(instance)
+
+
+@receiver(post_save, sender=Project)
+def project_image_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_on_commit(instance)
+
+
+@receiver(post_save, sender=SocialLinks)
+@receiver(post_delete, sender=SocialLinks)
+def social_links_changed(sender, **kwargs):
+    # Covers both SocialLinksAdmin and the social_links_api POST.
+    transaction.on_commit(invalidate_social_links)
+
+
+# Registered after the receivers above so its on_commit callback runs after
+# the cache versions are bumped and sees the new ETags.
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=SocialLinks)
+@receiver(post_delete, sender=SocialLinks)
+def prerender_changed(sender, raw=False, **kwargs):
+    if settings.PRERENDER_ON_SAVE and not raw:
+        transaction.on_commit(build_on_commit)
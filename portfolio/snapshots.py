@@ -0,0 +1,291 @@
+"""Materialized project snapshots for the public read paths.
+
+Each Project has a ProjectSnapshot holding its /api/projects/ object
+already encoded and the values its home page card shows;
+ProjectListSnapshot holds the whole list as one JSON document plus the
+cards. /api/projects/ without `fields` and the home page read these
+instead of serializing Project rows: the full list is one primary-key
+lookup, a filtered or paged list one range scan of an index, however many
+fields Project grows.
+
+Writes: saving or deleting a Project rewrites its snapshot and the list
+document in the same transaction (Project.save() is atomic). Only the
+project's own entry in the list changes: it is cut out of the stored
+document and the new one goes in before the entry of the project that
+follows it, so a save reads no other snapshot. The list row is locked
+first so concurrent saves don't overwrite each other's list.
+
+Until rebuild() has run (fresh install, or after a raw load / bulk
+import cleared them) both tables are empty and the pages read Project as
+before. The first save in that state rebuilds everything once it has
+committed, outside the save's transaction.
+`manage.py check_snapshots` compares the snapshots with a fresh
+serialization and can rebuild them.
+
+URLs in the payloads are absolute and depend on the request's host, so
+they are stored with ORIGIN in its place, right after the opening quote
+of the string, and with_origin() substitutes it on the way out. JSON
+escapes NUL (PostgreSQL can't even store it in text), and a quote inside
+a string is escaped as well, so user text can't produce the marker.
+"""
+import datetime
+
+from django.db import transaction
+
+from .models import Project, ProjectListSnapshot, ProjectSnapshot
+from .pagination import after_cursor, encode_cursor
+from .serializers import Context, dumps, project_plan
+
+LIST_ID = 1
+
+# The origin projects are serialized with; see the module docstring.
+ORIGIN = '\x00origin'
+_MARKER = '"' + dumps(ORIGIN).decode()[1:-1]
+
+# Project columns a card needs besides id and updated_at
+CARD_COLUMNS = ('name', 'subtitle', 'category', 'image', 'image_variants')
+
+
+def with_origin(payload: str, origin: str) -> bytes:
+    return payload.replace(_MARKER, '"' + dumps(origin).decode()[1:-1]).encode()
+
+
+def _columns() -> tuple:
+    return tuple(dict.fromkeys((*project_plan().columns, *CARD_COLUMNS)))
+
+
+def _snapshot(row: tuple, index: dict, context: Context) -> ProjectSnapshot:
+    plan = project_plan()
+    return ProjectSnapshot(
+        project_id=row[index['id']],
+        category=row[index['category']],
+        created_at=row[index['created_at']],
+        updated_at=row[index['updated_at']],
+        payload=dumps(plan.serialize(row, context)).decode(),
+        card={column: row[index[column]] for column in CARD_COLUMNS},
+    )
+
+
+def expected(projects=None):
+    """Unsaved ProjectSnapshots for `projects` (default: all), built from the database."""
+    columns = _columns()
+    index = {column: i for i, column in enumerate(columns)}
+    context = Context(origin=ORIGIN)
+    projects = Project.objects.all() if projects is None else projects
+    for row in projects.order_by('pk').values_list(*columns).iterator(chunk_size=2000):
+        yield _snapshot(row, index, context)
+
+
+def enabled() -> bool:
+    return ProjectListSnapshot.objects.filter(pk=LIST_ID).exists()
+
+
+def _card(pk, updated_at: datetime.datetime, card: dict) -> dict:
+    return {'id': pk, 'updated_at': updated_at.isoformat(), **card}
+
+
+def _joined() -> tuple:
+    """(list payload, cards) joined from the stored ProjectSnapshots."""
+    payloads = []
+    cards = []
+    snapshots = ProjectSnapshot.objects.order_by('-created_at', '-project_id').values_list(
+        'project_id', 'updated_at', 'payload', 'card',
+    )
+    for pk, updated_at, payload, card in snapshots.iterator(chunk_size=2000):
+        payloads.append(payload)
+        cards.append(_card(pk, updated_at, card))
+    return '[' + ','.join(payloads) + ']', cards
+
+
+def _rebuild_list() -> None:
+    # Lock the list row before reading the snapshots: a concurrent save
+    # waits here and then sees this transaction's snapshot.
+    ProjectListSnapshot.objects.select_for_update().filter(pk=LIST_ID).first()
+    payload, cards = _joined()
+    ProjectListSnapshot.objects.update_or_create(
+        pk=LIST_ID,
+        defaults={'payload': payload, 'cards': cards, 'count': len(cards)},
+    )
+
+
+def rebuild() -> int:
+    """Rebuilds every snapshot; returns the number of projects."""
+    with transaction.atomic():
+        ProjectListSnapshot.objects.select_for_update().filter(pk=LIST_ID).first()
+        ProjectSnapshot.objects.all().delete()
+        batch = []
+        for snapshot in expected():
+            batch.append(snapshot)
+            if len(batch) == 1000:
+                ProjectSnapshot.objects.bulk_create(batch)
+                batch = []
+        ProjectSnapshot.objects.bulk_create(batch)
+        _rebuild_list()
+        return ProjectListSnapshot.objects.values_list('count', flat=True).get(pk=LIST_ID)
+
+
+def clear() -> None:
+    """Drops the snapshots; the pages read Project until the next rebuild."""
+    with transaction.atomic():
+        ProjectListSnapshot.objects.all().delete()
+        ProjectSnapshot.objects.all().delete()
+
+
+def _replace(listed: ProjectListSnapshot, pk, old_payload, snapshot) -> None:
+    """Puts `snapshot` (None: nothing) in place of project `pk`'s entry,
+    `old_payload`, in the locked list row."""
+    payloads = listed.payload[1:-1]
+    cards = [card for card in listed.cards if card['id'] != pk]
+    if old_payload is None and len(cards) != len(listed.cards):
+        return _rebuild_list()
+    if old_payload is not None:
+        # The quotes inside JSON strings are escaped, so a payload only
+        # occurs in the list as its own entry.
+        start = payloads.find(old_payload)
+        if start == -1:
+            return _rebuild_list()
+        end = start + len(old_payload)
+        # the entry and the comma between it and a neighbour
+        if end < len(payloads):
+            end += 1
+        elif start:
+            start -= 1
+        payloads = payloads[:start] + payloads[end:]
+    if snapshot is not None:
+        card = _card(pk, snapshot.updated_at, snapshot.card)
+        following = after_cursor(ProjectSnapshot.objects.exclude(pk=pk), (snapshot.created_at, pk)).values_list(
+            'project_id', 'payload',
+        ).first()
+        if following is None:
+            payloads = f'{payloads},{snapshot.payload}' if payloads else snapshot.payload
+            cards.append(card)
+        else:
+            at = payloads.find(following[1])
+            index = next((i for i, other in enumerate(cards) if other['id'] == following[0]), None)
+            if at == -1 or index is None:
+                return _rebuild_list()
+            payloads = f'{payloads[:at]}{snapshot.payload},{payloads[at:]}'
+            cards.insert(index, card)
+    listed.payload = '[' + payloads + ']'
+    listed.cards = cards
+    listed.count = len(cards)
+    listed.save(update_fields=['payload', 'cards', 'count', 'built_at'])
+
+
+def _build_if_missing() -> None:
+    if not enabled():
+        rebuild()
+
+
+def project_saved(pk) -> None:
+    with transaction.atomic():
+        listed = ProjectListSnapshot.objects.select_for_update().filter(pk=LIST_ID).first()
+        if listed is None:
+            # Not built yet: the pages read Project until then, so there is
+            # no need to hold up this transaction with every other project.
+            transaction.on_commit(_build_if_missing, robust=True)
+            return
+        old_payload = ProjectSnapshot.objects.filter(pk=pk).values_list('payload', flat=True).first()
+        snapshot = next(expected(Project.objects.filter(pk=pk)), None)
+        if snapshot is not None:
+            snapshot.save()
+        else:  # deleted in the meantime
+            ProjectSnapshot.objects.filter(pk=pk).delete()
+        _replace(listed, pk, old_payload, snapshot)
+
+
+def project_deleted(pk) -> None:
+    with transaction.atomic():
+        listed = ProjectListSnapshot.objects.select_for_update().filter(pk=LIST_ID).first()
+        if listed is None:
+            return
+        old_payload = ProjectSnapshot.objects.filter(pk=pk).values_list('payload', flat=True).first()
+        ProjectSnapshot.objects.filter(pk=pk).delete()
+        _replace(listed, pk, old_payload, None)
+
+
+# Reads
+
+def _rows(params: dict):
+    """Snapshot rows of a filtered or paged list request, one extra row past `limit`."""
+    rows = ProjectSnapshot.objects.all()
+    if params['category']:
+        rows = rows.filter(category=params['category'])
+    rows = after_cursor(rows, params['cursor']).values_list('created_at', 'project_id', 'payload')
+    if params['limit']:
+        rows = rows[:params['limit'] + 1]
+    return rows
+
+
+def _page(rows: list, params: dict, origin: str) -> tuple:
+    next_cursor = None
+    if params['limit'] and len(rows) > params['limit']:
+        rows = rows[:params['limit']]
+        next_cursor = encode_cursor(rows[-1][0], rows[-1][1])
+    return with_origin('[' + ','.join(row[2] for row in rows) + ']', origin), next_cursor
+
+
+def _whole_list(params: dict) -> bool:
+    return not (params['category'] or params['cursor'] or params['limit'])
+
+
+def page(params: dict, origin: str):
+    """(body, next cursor) of /api/projects/ for `params`, or None if the
+    request needs the live path (`fields`) or the snapshots aren't built."""
+    if params['fields']:
+        return None
+    if _whole_list(params):
+        payload = ProjectListSnapshot.objects.filter(pk=LIST_ID).values_list('payload', flat=True).first()
+        return None if payload is None else (with_origin(payload, origin), None)
+    rows = list(_rows(params))
+    # rows only exist while the snapshots are built; an empty page needs a look
+    if not rows and not enabled():
+        return None
+    return _page(rows, params, origin)
+
+
+async def apage(params: dict, origin: str):
+    if params['fields']:
+        return None
+    if _whole_list(params):
+        payload = await ProjectListSnapshot.objects.filter(pk=LIST_ID).values_list('payload', flat=True).afirst()
+        return None if payload is None else (with_origin(payload, origin), None)
+    rows = [row async for row in _rows(params)]
+    if not rows and not await ProjectListSnapshot.objects.filter(pk=LIST_ID).aexists():
+        return None
+    return _page(rows, params, origin)
+
+
+def cards():
+    """The home page cards as stored, dicts of fragments.CARD_FIELDS with
+    updated_at in ISO format, newest first; None if the snapshots aren't
+    built."""
+    return ProjectListSnapshot.objects.filter(pk=LIST_ID).values_list('cards', flat=True).first()
+
+
+def check() -> list:
+    """Differences between the stored snapshots and a fresh build, as messages."""
+    if not enabled():
+        return ['снимки не собраны']
+    problems = []
+    stored = {
+        pk: (category, created_at, updated_at, payload, card)
+        for pk, category, created_at, updated_at, payload, card in ProjectSnapshot.objects.values_list(
+            'project_id', 'category', 'created_at', 'updated_at', 'payload', 'card',
+        ).iterator(chunk_size=2000)
+    }
+    for snapshot in expected():
+        current = stored.pop(snapshot.project_id, None)
+        fresh = (snapshot.category, snapshot.created_at, snapshot.updated_at, snapshot.payload, snapshot.card)
+        if current is None:
+            problems.append(f'проект {snapshot.project_id}: нет снимка')
+        elif current != fresh:
+            problems.append(f'проект {snapshot.project_id}: снимок устарел')
+    for pk in stored:
+        problems.append(f'снимок {pk}: проекта нет')
+
+    listed = ProjectListSnapshot.objects.get(pk=LIST_ID)
+    payload, cards = _joined()
+    if (listed.payload, listed.cards, listed.count) != (payload, cards, len(cards)):
+        problems.append('список проектов не совпадает со снимками')
+    return problems
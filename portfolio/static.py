@@ -0,0 +1,56 @@
+"""WhiteNoise for both handler modes.
+
+whitenoise.middleware.WhiteNoiseMiddleware is sync-only. Under ASGI Django
+adapts it with a thread-sensitive sync_to_async, and every request behind
+it, async views included, then takes turns on one thread. This subclass
+hands requests for anything but a static file straight to an async
+get_response, and does the file lookup and reads in worker threads, so
+the body goes out as an async iterator.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
+
+# per read from a worker thread; FileResponse's own 4 KiB would mean a
+# thread hop every 4 KiB
+BLOCK_SIZE = 64 * 1024
+
+
+def _async_body(response):
+    filelike = response.file_to_stream
+    if filelike is None:  # HEAD, 304, 416
+        return response
+    read = sync_to_async(filelike.read, thread_sensitive=False)
+
+    async def chunks():
+        while chunk := await read(BLOCK_SIZE):
+            yield chunk
+    # FileResponse already closes the file with the response
+    response.streaming_content = chunks()
+    return response
+
+
+class WhiteNoiseMiddleware(BaseWhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # looks the path up on disk
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is None:
+            return await self.get_response(request)
+        response = await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return _async_body(response)
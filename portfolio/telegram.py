@@ -0,0 +1,152 @@
+"""Telegram Bot API client shared by the outbox worker and the admin.
+
+One process-wide TelegramNotifier keeps a pooled keep-alive session, so
+consecutive sends reuse the TLS connection. A 429 response is honored by
+waiting `retry_after` seconds (at least one, up to TELEGRAM_MAX_RETRY_WAIT)
+and retrying, at most `max_attempts` sends in all; otherwise RateLimited
+is raised so the caller can reschedule.
+"""
+import asyncio
+import time
+
+from django.conf import settings
+
+# Telegram rejects messages longer than this
+MESSAGE_LIMIT = 4096
+BULK_SEPARATOR = '\n\n— — —\n\n'
+
+
+class TelegramError(Exception):
+    pass
+
+
+class RateLimited(TelegramError):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Too Many Requests: retry after {retry_after}")
+        self.retry_after = retry_after
+
+
+def _retry_after(response) -> int:
+    try:
+        return int(response.json()['parameters']['retry_after'])
+    except Exception:
+        return int(response.headers.get('Retry-After', 1))
+
+
+def pack(texts: list) -> list:
+    """Groups texts into as few messages as fit MESSAGE_LIMIT.
+
+    Returns a list of (message, [indexes of texts it carries]).
+    """
+    chunks = []
+    current, indexes = '', []
+    for i, text in enumerate(texts):
+        text = text[:MESSAGE_LIMIT]
+        candidate = f"{current}{BULK_SEPARATOR}{text}" if current else text
+        if current and len(candidate) > MESSAGE_LIMIT:
+            chunks.append((current, indexes))
+            current, indexes = text, [i]
+        else:
+            current = candidate
+            indexes.append(i)
+    if current:
+        chunks.append((current, indexes))
+    return chunks
+
+
+class TelegramNotifier:
+    def __init__(self, token: str, chat_id: str, api_url: str = 'https://api.telegram.org',
+                 timeout: float = 10, pool_size: int = 4, max_retry_wait: float = 5, max_attempts: int = 3):
+        self.token = token
+        self.chat_id = chat_id
+        self.api_url = api_url
+        self.url = f"{api_url.rstrip('/')}/bot{token}/sendMessage"
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_retry_wait = max_retry_wait
+        self.max_attempts = max_attempts
+        self._session = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.token and self.chat_id)
+
+    @property
+    def session(self):
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._session = session
+        return self._session
+
+    def clean_error(self, exc: Exception) -> str:
+        # the request URL contains the bot token, keep it out of logs and the admin
+        return str(exc).replace(self.token, '***') if self.token else str(exc)
+
+    def _retry_wait(self, response, attempt: int) -> int:
+        """Seconds to wait before sending again after a 429, or raises RateLimited."""
+        retry_after = max(_retry_after(response), 1)
+        if attempt >= self.max_attempts or retry_after > self.max_retry_wait:
+            raise RateLimited(retry_after)
+        return retry_after
+
+    def send(self, text: str) -> None:
+        for attempt in range(1, self.max_attempts + 1):
+            r = self.session.post(self.url, json={"chat_id": self.chat_id, "text": text}, timeout=self.timeout)
+            if r.status_code != 429:
+                break
+            time.sleep(self._retry_wait(r, attempt))
+        if r.status_code != 200:
+            raise TelegramError(f"HTTP {r.status_code}: {r.text[:200]}")
+
+    def send_bulk(self, texts: list) -> list:
+        """Sends `texts` packed into as few messages as possible.
+
+        Returns one entry per text: None if delivered, else the exception.
+        After a RateLimited error the remaining chunks are not attempted.
+        """
+        results = [None] * len(texts)
+        rate_limited = None
+        for message, indexes in pack(texts):
+            error = rate_limited
+            if error is None:
+                try:
+                    self.send(message)
+                except RateLimited as exc:
+                    error = rate_limited = exc
+                except Exception as exc:
+                    error = exc
+            for i in indexes:
+                results[i] = error
+        return results
+
+    async def asend(self, client, text: str) -> None:
+        """send() over an httpx.AsyncClient supplied by the caller."""
+        for attempt in range(1, self.max_attempts + 1):
+            r = await client.post(self.url, json={"chat_id": self.chat_id, "text": text}, timeout=self.timeout)
+            if r.status_code != 429:
+                break
+            await asyncio.sleep(self._retry_wait(r, attempt))
+        if r.status_code != 200:
+            raise TelegramError(f"HTTP {r.status_code}: {r.text[:200]}")
+
+
+_notifier = None
+
+
+def get_notifier() -> TelegramNotifier:
+    global _notifier
+    token, chat_id, api_url = settings.TELEGRAM_BOT_TOKEN, settings.TELEGRAM_CHAT_ID, settings.TELEGRAM_API_URL
+    if _notifier is None or (_notifier.token, _notifier.chat_id, _notifier.api_url) != (token, chat_id, api_url):
+        _notifier = TelegramNotifier(
+            token,
+            chat_id,
+            api_url=api_url,
+            max_retry_wait=settings.TELEGRAM_MAX_RETRY_WAIT,
+        )
+    return _notifier
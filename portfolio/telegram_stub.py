@@ -0,0 +1,72 @@
+"""Local stand-in for the Telegram Bot API, for tests and benchmarks.
+
+Point TELEGRAM_API_URL at it (see `manage.py telegram_stub`). It accepts
+sendMessage for any token, keeps the received texts in memory and can
+answer every N-th request with 429 to exercise rate-limit handling.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, so connection reuse is visible
+    # Buffer the response so headers and body leave in one segment; otherwise
+    # Nagle + delayed ACK add ~40 ms to every keep-alive request.
+    wbufsize = -1
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        with server.lock:
+            server.requests += 1
+            count = server.requests
+        if not self.path.endswith('/sendMessage'):
+            return self._reply(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+        if server.rate_limit_every and count % server.rate_limit_every == 0:
+            return self._reply(429, {
+                "ok": False,
+                "error_code": 429,
+                "description": "Too Many Requests",
+                "parameters": {"retry_after": server.retry_after},
+            })
+        payload = json.loads(body or b'{}')
+        with server.lock:
+            server.messages.append(payload.get('text', ''))
+            message_id = len(server.messages)
+        self._reply(200, {"ok": True, "result": {"message_id": message_id}})
+
+    def _reply(self, status: int, data: dict):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class StubTelegramServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, rate_limit_every: int = 0,
+                 retry_after: int = 1, verbose: bool = False):
+        super().__init__((host, port), _Handler)
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.messages = []
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'StubTelegramServer':
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
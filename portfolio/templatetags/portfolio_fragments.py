@@ -0,0 +1,11 @@
+from django import template
+
+from ..fragments import render_project_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def project_cards(projects):
+    """The home page cards, each from the fragment cache when it is current."""
+    return render_project_cards(projects)
@@ -1,3 +1,1616 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.template.backends.django import Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, resolve
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from config import openapi
+
+from . import (
+    async_views, benchmark, cache, compression, export, fragments, images, ingest, metrics, outbox, pagination,
+    prerender, ratelimit, routers, serializers, snapshots, telegram, urls, warmup,
+)
+from .admin import ContactMessageAdmin
+from .compression import CompressionMiddleware
+from .forms import ContactForm
+from .middleware import PerformanceMiddleware
+from .pagination import EstimatedCountPaginator
+from .models import ContactMessage, ContactResendJob, Project, SocialLinks, TelegramOutbox
+from .search import search_contacts, search_project_ids
+from .serializers import PROJECT_FIELDS, PROJECT_LINKS, Column, Context, project_plan
+from .telegram import RateLimited, TelegramError, TelegramNotifier
+
+TELEGRAM = {'TELEGRAM_BOT_TOKEN': 'token', 'TELEGRAM_CHAT_ID': '1'}
+
+
+def _caches(shared_dir: str, worker: str) -> dict:
+    """CACHES of one gunicorn worker: its own locmem, the file cache all share."""
+    return {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': worker},
+        'shared': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': shared_dir},
+        'versions': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                     'LOCATION': os.path.join(shared_dir, 'versions')},
+    }
+
+
+class AsyncAPIURLConf:
+    """ROOT_URLCONF of a DJANGO_ASYNC_API=True deployment."""
+
+    urlpatterns = [
+        path('api/projects/', async_views.projects_api, name='projects_api'),
+        path('api/projects/<int:pk>/', async_views.project_detail_api, name='project_detail_api'),
+        path('api/contact/', async_views.contact_api, name='contact_api'),
+        path('api/social-links/', async_views.social_links_api, name='social_links_api'),
+        *urls.urlpatterns,
+    ]
+
+
+@override_settings(RATELIMIT_ENABLED=False, CONTACT_INGEST_MODE='sync', CONTACT_DEDUP_WINDOW=0,
+                   PORTFOLIO_VERSION_TTL=0)
+class PortfolioTestCase(TestCase):
+    """Each test gets empty caches: the database rolls back, the caches wouldn't."""
+
+    def setUp(self):
+        self.shared_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.shared_dir, ignore_errors=True)
+        self.worker(1)
+
+    def worker(self, number: int) -> None:
+        """Switches to the caches of gunicorn worker `number`."""
+        settings = override_settings(
+            CACHES=_caches(self.shared_dir, f'{self.id()}-{number}'),
+            PORTFOLIO_SHARED_CACHE_ALIAS='shared',
+            PORTFOLIO_VERSION_CACHE_ALIAS='versions',
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache._versions_local.clear()
+        cache._social_links_local = (None, 0.0, None)
+
+    def project(self, **kwargs) -> Project:
+        fields = {'name': 'Проект', 'subtitle': 'Подзаголовок', 'description': 'Описание', **kwargs}
+        with self.captureOnCommitCallbacks(execute=True):
+            return Project.objects.create(**fields)
+
+    def contact(self, **kwargs) -> ContactMessage:
+        fields = {'full_name': 'Иван', 'email': 'ivan@example.com', 'message': 'Здравствуйте', **kwargs}
+        return ContactMessage.objects.create(**fields)
+
+
+@override_settings(**TELEGRAM, TELEGRAM_OUTBOX_LEASE=120, TELEGRAM_OUTBOX_MAX_ATTEMPTS=3,
+                   TELEGRAM_OUTBOX_BACKOFF_BASE=30, TELEGRAM_OUTBOX_BACKOFF_MAX=100)
+class OutboxTests(PortfolioTestCase):
+    def enqueue(self, count: int) -> list:
+        outbox.enqueue_contacts([(self.contact(message=f'Сообщение {i}'), 'Заявка') for i in range(count)])
+        return list(TelegramOutbox.objects.order_by('id'))
+
+    def notifier(self, *errors):
+        notifier = mock.Mock()
+        notifier.send_bulk.side_effect = lambda texts: list(errors) or [None] * len(texts)
+        notifier.clean_error.side_effect = str
+        return mock.patch('portfolio.outbox.get_notifier', return_value=notifier)
+
+    def test_backoff(self):
+        self.assertEqual([outbox.backoff(n).total_seconds() for n in range(1, 5)], [30, 60, 100, 100])
+
+    def test_claim_leases_rows(self):
+        self.enqueue(3)
+        start = timezone.now()
+        first = outbox.claim_batch(2)
+        self.assertEqual([item.attempts for item in first], [1, 1])
+        for item in TelegramOutbox.objects.filter(pk__in=[i.pk for i in first]):
+            self.assertGreaterEqual(item.next_attempt_at, start + datetime.timedelta(seconds=120))
+        second = outbox.claim_batch(2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({i.pk for i in first} & {i.pk for i in second})
+        self.assertEqual(outbox.claim_batch(2), [])
+
+    def test_expired_lease_is_claimed_again(self):
+        self.enqueue(1)
+        outbox.claim_batch(1)
+        TelegramOutbox.objects.update(next_attempt_at=timezone.now() - datetime.timedelta(seconds=1))
+        again = outbox.claim_batch(1)
+        self.assertEqual([item.attempts for item in again], [2])
+
+    def test_drain_marks_sent(self):
+        self.enqueue(2)
+        with self.notifier():
+            self.assertEqual(outbox.drain(), (2, 0))
+        self.assertEqual(set(TelegramOutbox.objects.values_list('status', flat=True)), {TelegramOutbox.Status.SENT})
+
+    def test_failure_backs_off(self):
+        self.enqueue(1)
+        start = timezone.now()
+        with self.notifier(TelegramError('HTTP 500')):
+            self.assertEqual(outbox.drain(), (0, 1))
+        item = TelegramOutbox.objects.get()
+        self.assertEqual(item.status, TelegramOutbox.Status.PENDING)
+        self.assertEqual(item.last_error, 'HTTP 500')
+        self.assertGreaterEqual(item.next_attempt_at, start + datetime.timedelta(seconds=30))
+        self.assertLess(item.next_attempt_at, start + datetime.timedelta(seconds=60))
+
+    def test_rate_limit_waits_at_least_retry_after(self):
+        self.enqueue(1)
+        start = timezone.now()
+        with self.notifier(RateLimited(600)):
+            outbox.drain()
+        self.assertGreaterEqual(TelegramOutbox.objects.get().next_attempt_at, start + datetime.timedelta(seconds=600))
+
+    def test_gives_up_after_max_attempts(self):
+        self.enqueue(1)
+        with self.notifier(TelegramError('HTTP 500')):
+            for _ in range(3):
+                TelegramOutbox.objects.update(next_attempt_at=timezone.now())
+                outbox.drain()
+        item = TelegramOutbox.objects.get()
+        self.assertEqual((item.status, item.attempts), (TelegramOutbox.Status.FAILED, 3))
+        self.assertEqual(outbox.claim_batch(1), [])
+
+    def test_resend_job_by_ids(self):
+        contacts = [self.contact(message=f'Сообщение {i}') for i in range(5)]
+        job = outbox.create_resend_job('Повтор', ids=[c.pk for c in contacts[:3]])
+        self.assertIsNone(job.total)
+        self.assertEqual(outbox.advance_resend_jobs(chunk_size=2), 2)
+        self.assertEqual(outbox.advance_resend_jobs(chunk_size=2), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.total, job.processed), (ContactResendJob.Status.DONE, 3, 3))
+        self.assertEqual(
+            set(TelegramOutbox.objects.values_list('contact', flat=True)), {c.pk for c in contacts[:3]},
+        )
+
+    def test_resend_job_by_search(self):
+        self.contact(message='Нужен сайт на Django')
+        self.contact(message='Просто привет')
+        job = outbox.create_resend_job('Повтор', search='django')
+        self.assertEqual(job.selection, {'search': 'django'})
+        outbox.advance_resend_jobs()
+        self.assertEqual(TelegramOutbox.objects.get().contact.message, 'Нужен сайт на Django')
+
+
+class CacheInvalidationTests(PortfolioTestCase):
+    def test_bump_is_visible_through_a_fresh_cache_client(self):
+        before = cache.projects_version()
+        self.project()
+        fresh = caches.create_connection('versions')
+        self.assertNotEqual(fresh.get(cache.PROJECTS_VERSION_KEY), before)
+        self.assertEqual(fresh.get(cache.PROJECTS_VERSION_KEY), cache.projects_version())
+
+    def test_save_in_one_worker_invalidates_the_others(self):
+        self.assertEqual(cache.remember('answer', lambda: 'old'), 'old')
+        self.worker(2)
+        self.assertEqual(cache.remember('answer', lambda: 'old'), 'old')
+        self.project()
+        self.worker(1)
+        self.assertEqual(cache.remember('answer', lambda: 'new'), 'new')
+
+    def test_remember_computes_once_per_version(self):
+        compute = mock.Mock(return_value='value')
+        cache.remember('name', compute)
+        cache.remember('name', compute)
+        self.assertEqual(compute.call_count, 1)
+        cache.bump_projects_version()
+        cache.remember('name', compute)
+        self.assertEqual(compute.call_count, 2)
+
+    def test_evicted_version_does_not_go_back(self):
+        before = cache.projects_version()
+        cache.get_version_cache().delete(cache.PROJECTS_VERSION_KEY)
+        self.assertGreaterEqual(cache.projects_version(), before)
+
+    @override_settings(PORTFOLIO_VERSION_TTL=60)
+    def test_version_is_reread_once_per_ttl(self):
+        version = cache.projects_version()
+        cache.get_version_cache().incr(cache.PROJECTS_VERSION_KEY)  # a save in another worker
+        with mock.patch('portfolio.cache.get_version_cache') as shared:
+            self.assertEqual(cache.projects_version(), version)
+        shared.assert_not_called()
+        later = time.monotonic() + 61
+        with mock.patch('portfolio.cache.time.monotonic', return_value=later):
+            self.assertEqual(cache.projects_version(), version + 1)
+        # this worker's own save is seen at once
+        cache.bump_projects_version()
+        self.assertEqual(cache.projects_version(), version + 2)
+
+    def test_culling_the_shared_cache_keeps_the_versions(self):
+        version = cache.projects_version()
+        settings = override_settings(CACHES={
+            **_caches(self.shared_dir, self.id()),
+            'shared': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                       'LOCATION': self.shared_dir, 'OPTIONS': {'MAX_ENTRIES': 2, 'CULL_FREQUENCY': 1}},
+        })
+        settings.enable()
+        self.addCleanup(settings.disable)
+        for i in range(10):
+            cache.get_shared_cache().set(f'key-{i}', i)
+        self.assertLess(len(os.listdir(self.shared_dir)), 10)
+        self.assertEqual(cache.get_version_cache().get(cache.PROJECTS_VERSION_KEY), version)
+
+    def test_cached_json_is_rebuilt_after_a_save(self):
+        self.client.get('/api/projects/')
+        self.worker(2)
+        self.assertEqual(self.client.get('/api/projects/').json(), [])
+        self.worker(1)
+        self.project(name='Новый')
+        self.worker(2)
+        self.assertEqual([p['name'] for p in self.client.get('/api/projects/').json()], ['Новый'])
+
+    def test_delete_invalidates(self):
+        project = self.project()
+        self.assertEqual(len(self.client.get('/api/projects/').json()), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            project.delete()
+        self.assertEqual(self.client.get('/api/projects/').json(), [])
+
+    @override_settings(SOCIAL_ADMIN_TOKEN='secret')
+    def test_social_links_update_reaches_other_workers(self):
+        self.assertEqual(self.client.get('/api/social-links/').json()['github'], '')
+        self.worker(2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/social-links/', {'github': 'https://github.com/new'},
+                             content_type='application/json', HTTP_X_ADMIN_TOKEN='secret')
+        self.worker(1)
+        self.assertEqual(self.client.get('/api/social-links/').json()['github'], 'https://github.com/new')
+
+    @override_settings(SOCIAL_LINKS_CACHE_TTL=60)
+    def test_social_links_are_read_once_per_ttl(self):
+        SocialLinks.objects.create(github='https://github.com/me')
+        self.assertEqual(cache.get_social_links()['github'], 'https://github.com/me')
+        with self.assertNumQueries(0), mock.patch('portfolio.cache.get_version_cache') as shared:
+            self.assertEqual(cache.get_social_links()['github'], 'https://github.com/me')
+        shared.assert_not_called()
+
+class ConditionalRequestTests(PortfolioTestCase):
+    def assertRevalidates(self, url: str) -> str:
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+        return etag
+
+    def test_projects_list(self):
+        self.project()
+        etag = self.assertRevalidates('/api/projects/')
+        response = self.client.get('/api/projects/')
+        self.assertEqual(
+            self.client.get('/api/projects/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304,
+        )
+        self.project(name='Второй')
+        self.assertEqual(self.client.get('/api/projects/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_invalid_list_request_is_not_revalidated(self):
+        self.project()
+        etag = self.client.get('/api/projects/')['ETag']
+        for url in ('/api/projects/?category=nope', '/api/projects/?limit=0', '/api/projects/?cursor=bad',
+                    '/api/projects/search/?q=', '/api/projects/search/?q=x&limit=x'):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 400, url)
+            self.assertFalse(response.has_header('ETag'), url)
+            self.assertFalse(response.has_header('Last-Modified'), url)
+
+    def test_project_detail(self):
+        project = self.project()
+        url = f'/api/projects/{project.pk}/'
+        etag = self.assertRevalidates(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            project.name = 'Другое название'
+            project.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], 'Другое название')
+        self.assertEqual(self.client.get('/api/projects/999999/').status_code, 404)
+
+    @override_settings(SOCIAL_ADMIN_TOKEN='secret')
+    def test_social_links(self):
+        etag = self.assertRevalidates('/api/social-links/')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/social-links/', {'telegram': 'https://t.me/me'},
+                                        content_type='application/json', HTTP_X_ADMIN_TOKEN='secret')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/api/social-links/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['telegram'], 'https://t.me/me')
+
+    def test_social_links_post_needs_the_token(self):
+        response = self.client.post('/api/social-links/', {'telegram': 'x'}, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+
+class PaginationTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        self.projects = [self.project(name=f'Проект {i}', category='freelance' if i % 2 else 'personal')
+                         for i in range(7)]
+        # three share created_at: the id has to break the tie
+        moment = self.projects[0].created_at
+        Project.objects.filter(pk__in=[p.pk for p in self.projects[2:5]]).update(created_at=moment)
+        snapshots.rebuild()
+        cache.bump_projects_version()
+        self.expected = list(Project.objects.values_list('pk', flat=True))
+
+    def walk(self, url: str) -> list:
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [item['id'] for item in response.json()]
+            match = re.match(r'<([^>]+)>; rel="next"', response.get('Link', ''))
+            url = match.group(1) if match else None
+        return ids
+
+    def test_cursor_round_trip(self):
+        created_at = timezone.now().replace(microsecond=123456)
+        self.assertEqual(pagination.decode_cursor(pagination.encode_cursor(created_at, 42)), (created_at, 42))
+        self.assertIsNone(pagination.decode_cursor(''))
+        with self.assertRaises(ValueError):
+            pagination.decode_cursor('not a cursor')
+
+    def test_parse_limit(self):
+        self.assertIsNone(pagination.parse_limit(None))
+        self.assertEqual(pagination.parse_limit('5'), 5)
+        with override_settings(PROJECTS_API_MAX_LIMIT=10):
+            self.assertEqual(pagination.parse_limit('500'), 10)
+        for value in ('0', '-1', 'x'):
+            with self.assertRaises(ValueError):
+                pagination.parse_limit(value)
+
+    def test_pages_cover_the_list_once(self):
+        for limit in (1, 2, 3, 7, 50):
+            self.assertEqual(self.walk(f'/api/projects/?limit={limit}'), self.expected, limit)
+
+    def test_pages_without_snapshots(self):
+        snapshots.clear()
+        cache.bump_projects_version()
+        self.assertEqual(self.walk('/api/projects/?limit=2'), self.expected)
+
+    def test_pages_with_a_filter(self):
+        expected = list(Project.objects.filter(category='freelance').values_list('pk', flat=True))
+        self.assertEqual(self.walk('/api/projects/?category=freelance&limit=2'), expected)
+
+    def test_pages_with_fields(self):
+        response = self.client.get('/api/projects/?limit=2&fields=id,name')
+        self.assertEqual(set(response.json()[0]), {'id', 'name'})
+        self.assertEqual(self.walk('/api/projects/?limit=3&fields=id'), self.expected)
+
+
+@override_settings(ADMIN_COUNT_LIMIT=3, STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class AdminChangeListTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        start = timezone.now()
+        self.contacts = []
+        for i in range(5):
+            contact = self.contact(message=f'Сообщение {i}')
+            ContactMessage.objects.filter(pk=contact.pk).update(created_at=start + datetime.timedelta(minutes=i))
+            self.contacts.append(contact)
+        # newest first
+        self.contacts.reverse()
+
+    def test_count_is_capped(self):
+        paginator = EstimatedCountPaginator(ContactMessage.objects.all(), 2)
+        self.assertEqual((paginator.count, paginator.estimated), (3, True))
+        paginator = EstimatedCountPaginator(ContactMessage.objects.filter(message__endswith='1'), 2)
+        self.assertEqual((paginator.count, paginator.estimated), (1, False))
+
+    def test_unfiltered_table_uses_the_planner_estimate(self):
+        with mock.patch('portfolio.pagination._reltuples', return_value=1000) as reltuples:
+            self.assertEqual(EstimatedCountPaginator(ContactMessage.objects.all(), 2).count, 1000)
+            self.assertEqual(EstimatedCountPaginator(ContactMessage.objects.exclude(message=''), 2).count, 3)
+        reltuples.assert_called_once_with('default', 'portfolio_contactmessage')
+        if connection.vendor != 'postgresql':
+            self.assertEqual(pagination._reltuples('default', 'portfolio_contactmessage'), -1)
+
+    def changelist(self, url='/admin/portfolio/contactmessage/'):
+        with mock.patch.object(ContactMessageAdmin, 'list_per_page', 2):
+            return self.client.get(url)
+
+    def test_keyset_pages(self):
+        response = self.changelist()
+        cl = response.context['cl']
+        self.assertTrue(cl.keyset)
+        self.assertEqual(cl.result_list, self.contacts[:2])
+        self.assertContains(response, '~3')
+        pages = [cl.result_list]
+        while cl.next_page_url:
+            cl = self.changelist(f'/admin/portfolio/contactmessage/{cl.next_page_url}').context['cl']
+            pages.append(list(cl.result_list))
+        self.assertEqual(pages, [self.contacts[:2], self.contacts[2:4], self.contacts[4:]])
+
+    def test_other_orderings_keep_page_numbers(self):
+        cl = self.changelist('/admin/portfolio/contactmessage/?o=1').context['cl']
+        self.assertFalse(cl.keyset)
+        self.assertIsNone(cl.next_page_url)
+
+    def test_invalid_cursor(self):
+        response = self.changelist('/admin/portfolio/contactmessage/?before=garbage')
+        self.assertRedirects(response, '/admin/portfolio/contactmessage/?e=1', fetch_redirect_response=False)
+
+
+class SearchTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite FTS5')
+        self.django = self.project(name='Магазин на Django', subtitle='Интернет-магазин')
+        self.flutter = self.project(name='Мобильное приложение', subtitle='Flutter',
+                                    description='Бэкенд на Django REST')
+        self.other = self.project(name='Лендинг', subtitle='Вёрстка')
+
+    def test_ranks_name_matches_first(self):
+        ranked = search_project_ids('django')
+        self.assertEqual([pk for pk, _rank in ranked], [self.django.pk, self.flutter.pk])
+        self.assertGreater(ranked[0][1], ranked[1][1])
+
+    def test_prefix_and_limit(self):
+        self.assertEqual([pk for pk, _rank in search_project_ids('djan', limit=1)], [self.django.pk])
+
+    def test_fts_syntax_is_quoted(self):
+        self.assertEqual(search_project_ids('django OR "'), search_project_ids('django or'))
+        self.assertEqual(search_project_ids('*'), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.description = 'Тоже на Django'
+            self.other.save()
+            self.django.delete()
+        self.assertEqual({pk for pk, _rank in search_project_ids('django')}, {self.flutter.pk, self.other.pk})
+
+    def test_api(self):
+        response = self.client.get('/api/projects/search/?q=flutter')
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual([item['id'] for item in results], [self.flutter.pk])
+        self.assertIn('rank', results[0])
+        self.assertEqual(self.client.get('/api/projects/search/?q=python').json(), [])
+
+    def test_contacts(self):
+        match = self.contact(full_name='Пётр', email='petr@example.com', message='Нужен бот')
+        self.contact(message='Нужен сайт')
+        found = search_contacts(ContactMessage.objects.all(), 'petr')
+        self.assertEqual(list(found), [match])
+        self.assertEqual(search_contacts(ContactMessage.objects.all(), '').count(), 2)
+
+
+class SnapshotTests(PortfolioTestCase):
+    def test_saves_keep_snapshots_consistent(self):
+        first = self.project(name='Первый')
+        self.project(name='Второй', category='freelance')
+        self.assertEqual(snapshots.check(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            first.subtitle = 'Новый подзаголовок'
+            first.save()
+            Project.objects.get(name='Второй').delete()
+        self.assertEqual(snapshots.check(), [])
+        self.assertEqual([card['name'] for card in snapshots.cards()], ['Первый'])
+
+    def test_bulk_update_is_detected_and_rebuilt(self):
+        self.project(name='Первый')
+        self.project(name='Второй')
+        first = Project.objects.get(name='Первый')
+        Project.objects.filter(pk=first.pk).update(name='Изменён')
+        self.assertEqual(snapshots.check(), [f'проект {first.pk}: снимок устарел'])
+        self.assertEqual(snapshots.rebuild(), 2)
+        self.assertEqual(snapshots.check(), [])
+
+    def test_snapshot_and_live_responses_match(self):
+        for i in range(3):
+            self.project(name=f'Проект {i}', link_github='https://github.com/me')
+        urls = ('/api/projects/', '/api/projects/?limit=2', '/api/projects/?category=personal')
+        from_snapshots = [self.client.get(url).content for url in urls]
+        snapshots.clear()
+        cache.bump_projects_version()
+        self.assertIsNone(snapshots.cards())
+        self.assertEqual([self.client.get(url).content for url in urls], from_snapshots)
+
+    @override_settings(ALLOWED_HOSTS=['example.com', 'testserver'])
+    def test_origin_follows_the_request(self):
+        with mock.patch('portfolio.signals.refresh_on_commit'):
+            self.project(image='projects/a.png')
+        for host in ('example.com', 'testserver'):
+            body = self.client.get('/api/projects/', HTTP_HOST=host).json()
+            self.assertEqual(body[0]['image'], f'http://{host}/media/projects/a.png')
+            self.assertNotIn('\x00', json.dumps(body))
+
+    def test_first_save_builds_them_after_commit(self):
+        self.project()
+        snapshots.clear()
+        with self.captureOnCommitCallbacks() as callbacks:
+            Project.objects.create(name='Второй')
+        self.assertFalse(snapshots.enabled())
+        for callback in callbacks:
+            callback()
+        self.assertTrue(snapshots.enabled())
+        self.assertEqual(len(snapshots.cards()), 2)
+
+    def test_saves_update_their_entry_only(self):
+        snapshots.rebuild()
+        moment = timezone.now()
+
+        def move(project, **delta):
+            # created_at is auto_now_add: only a later save can set it
+            with self.captureOnCommitCallbacks(execute=True):
+                project.created_at = moment + datetime.timedelta(**delta)
+                project.save()
+
+        with mock.patch('portfolio.snapshots._joined', side_effect=AssertionError('re-joined the list')):
+            projects = [self.project(name=f'Проект {i}') for i in range(5)]
+            for i, project in enumerate(projects):
+                move(project, days=-i)
+            move(projects[2], days=1)
+            move(projects[0], days=-10)
+            move(projects[3], days=-2, hours=-12)
+            move(self.project(name='Между'), days=-3, hours=-12)
+            with self.captureOnCommitCallbacks(execute=True):
+                projects[4].delete()
+                projects[2].delete()
+                projects[0].delete()
+        self.assertEqual(snapshots.check(), [])
+        self.assertEqual([card['name'] for card in snapshots.cards()], ['Проект 1', 'Проект 3', 'Между'])
+        response = self.client.get('/api/projects/')
+        self.assertEqual([item['name'] for item in response.json()], ['Проект 1', 'Проект 3', 'Между'])
+
+    def test_home_builds_projects_only_for_uncached_cards(self):
+        for i in range(3):
+            self.project(name=f'Проект {i}')
+        self.assertContains(self.client.get('/'), 'Проект 2')
+        with mock.patch('portfolio.fragments.Project', side_effect=AssertionError('built a Project')):
+            self.assertContains(self.client.get('/'), 'Проект 2')
+
+
+class FragmentTests(PortfolioTestCase):
+    def deploy(self, name: str, source: str) -> None:
+        """Switches to templates where `name` has a new `source`."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        os.makedirs(os.path.join(directory, os.path.dirname(name)))
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+            f.write(source)
+        templates = [{**settings.TEMPLATES[0], 'DIRS': [directory, *settings.TEMPLATES[0]['DIRS']]}]
+        override = override_settings(TEMPLATES=templates)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_cards_are_cached_per_save(self):
+        first = self.project(name='Первый')
+        self.project(name='Второй')
+        self.client.get('/')
+        with self.captureOnCommitCallbacks(execute=True):
+            first.name = 'Переименован'
+            first.save()
+        rendered = []
+        render = Template.render
+        with mock.patch.object(Template, 'render', lambda *args: rendered.append(args) or render(*args)):
+            response = self.client.get('/')
+        self.assertContains(response, 'Переименован')
+        self.assertContains(response, 'Второй')
+        cards = [args for args in rendered if args[0].template.name == fragments.CARD_TEMPLATE]
+        self.assertEqual(len(cards), 1)
+
+    def test_new_card_template_is_not_served_stale(self):
+        self.project(name='Первый')
+        self.assertNotContains(self.client.get('/'), 'новая карточка')
+        self.deploy(fragments.CARD_TEMPLATE, '<p>{{ p.name }}: новая карточка</p>')
+        self.assertContains(self.client.get('/'), 'Первый: новая карточка')
+
+    def test_new_detail_template_is_not_served_stale(self):
+        project = self.project(name='Первый')
+        url = f'/projects/{project.pk}/'
+        self.assertContains(self.client.get(url), 'Первый')
+        source = fragments.get_template('portfolio/project_detail.html').template.source
+        source = source.replace('<h1>{{ project.name }}', '<h1>{{ project.name }} (v2)')
+        self.deploy('portfolio/project_detail.html', source)
+        self.assertContains(self.client.get(url), 'Первый (v2)')
+
+    def test_version_is_the_source_hash(self):
+        version = fragments.template_version(fragments.CARD_TEMPLATE)
+        self.deploy(fragments.CARD_TEMPLATE, 'другая')
+        self.assertNotEqual(fragments.template_version(fragments.CARD_TEMPLATE), version)
+        self.assertEqual(fragments.template_version(fragments.CARD_TEMPLATE),
+                         hashlib.sha1('другая'.encode()).hexdigest()[:12])
+
+    def test_preload_templates(self):
+        directory = settings.TEMPLATES[0]['DIRS'][0]
+        with self.assertLogs('portfolio.fragments', 'INFO'):
+            count = fragments.preload_templates()
+        self.assertEqual(count, sum(name.endswith('.html') for _, _, names in os.walk(directory) for name in names))
+
+
+class ImageVariantTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media, PROJECT_IMAGE_WIDTHS=(320, 640, 1024))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.variants_dir = os.path.join(media, images.VARIANTS_DIR)
+
+    def upload(self, name: str = 'shot.png', width: int = 800) -> SimpleUploadedFile:
+        from PIL import Image
+
+        buf = io.BytesIO()
+        Image.new('RGB', (width, width // 2), (200, 30, 30)).save(buf, 'PNG')
+        return SimpleUploadedFile(name, buf.getvalue(), content_type='image/png')
+
+    def files(self) -> list:
+        return sorted(os.listdir(self.variants_dir)) if os.path.isdir(self.variants_dir) else []
+
+    def test_built_after_commit_in_one_save(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            project = Project.objects.create(name='Проект', image=self.upload())
+        self.assertEqual(self.files(), [])
+        self.assertEqual(Project.objects.get().image_variants, {})
+        with mock.patch('portfolio.snapshots.project_saved', wraps=snapshots.project_saved) as saved, \
+                self.captureOnCommitCallbacks(execute=True):
+            for callback in callbacks:
+                callback()
+        saved.assert_called_once_with(project.pk)
+
+        variants = Project.objects.get().image_variants
+        self.assertEqual(variants['source'], project.image.name)
+        self.assertEqual((variants['width'], variants['height']), (800, 400))
+        formats = [ext for ext, _pil_format, _mime in images.available_formats()]
+        self.assertIn('webp', formats)
+        for ext in formats:
+            self.assertEqual(sorted(variants['formats'][ext], key=int), ['320', '640', '800'])
+        self.assertEqual(len(self.files()), 3 * len(formats))
+        self.assertEqual(snapshots.check(), [])
+        item = self.client.get('/api/projects/').json()[0]
+        self.assertTrue(item['images']['webp']['640'].startswith('http://testserver/media/projects/variants/'))
+
+    def test_rolled_back_save_leaves_no_files(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                Project.objects.create(name='Проект', image=self.upload())
+                raise RuntimeError('rollback')
+        self.assertEqual(self.files(), [])
+
+    def test_new_image_drops_the_old_variants(self):
+        project = self.project(image=self.upload('first.png'))
+        self.assertEqual(project.image_variants, {})
+        project.refresh_from_db()
+        self.assertTrue(project.image_variants)
+        with self.captureOnCommitCallbacks() as callbacks:
+            project.image = self.upload('second.png', width=500)
+            project.save()
+        self.assertEqual(Project.objects.get().image_variants, {})
+        with self.captureOnCommitCallbacks(execute=True):
+            for callback in callbacks:
+                callback()
+        variants = Project.objects.get().image_variants
+        self.assertEqual(variants['source'], project.image.name)
+        self.assertEqual(sorted(variants['formats']['webp'], key=int), ['320', '500'])
+
+    def test_failed_build_is_logged(self):
+        with self.assertLogs('portfolio.images', 'ERROR'), \
+                mock.patch('portfolio.images.build_variants', side_effect=OSError('broken image')):
+            self.project(image=self.upload())
+        self.assertEqual(Project.objects.get().image_variants, {})
+
+    def test_picture_sources(self):
+        variants = {'formats': {
+            'webp': {'640': 'v/a-640.webp', '320': 'v/a-320.webp'},
+            'avif': {'320': 'v/a-320.avif'},
+        }}
+        self.assertEqual(images.picture_sources(variants), [
+            {'type': 'image/avif', 'srcset': '/media/v/a-320.avif 320w'},
+            {'type': 'image/webp', 'srcset': '/media/v/a-320.webp 320w, /media/v/a-640.webp 640w'},
+        ])
+        self.assertEqual(images.picture_sources({}), [])
+
+
+@override_settings(PRERENDER_BASE_URL='https://example.com', PRERENDER_KEEP_BUILDS=2, ALLOWED_HOSTS=['example.com'])
+class PrerenderTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        settings = override_settings(PRERENDER_ROOT=self.root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.first = self.project(name='Первый')
+        self.second = self.project(name='Второй')
+
+    def current(self, name: str) -> str:
+        with open(os.path.join(self.root, 'current', name), encoding='utf-8') as f:
+            return f.read()
+
+    def test_build(self):
+        result = prerender.build()
+        self.assertEqual((result['pages'], result['rendered'], result['reused']), (7, 7, 0))
+        self.assertIn('Первый', self.current('index.html'))
+        self.assertEqual({item['name'] for item in json.loads(self.current('api/projects/index.json'))},
+                         {'Первый', 'Второй'})
+        self.assertEqual(json.loads(self.current(f'api/projects/{self.first.pk}/index.json'))['name'], 'Первый')
+        self.assertIn('Второй', self.current(f'projects/{self.second.pk}/index.html'))
+        manifests = [name for name in os.listdir(os.path.join(self.root, 'builds')) if name.endswith('.json')]
+        self.assertEqual(manifests, [f"{result['hash']}.json"])
+
+    def test_incremental_build_renders_only_what_changed(self):
+        first = prerender.build()
+        # nothing changed: only the unkeyed swagger.json is rendered, into the same build
+        again = prerender.build()
+        self.assertEqual((again['rendered'], again['reused'], again['hash']), (1, 6, first['hash']))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first.name = 'Переименован'
+            self.first.save()
+        changed = prerender.build()
+        # home, the list, swagger.json and both pages of the saved project
+        self.assertEqual((changed['rendered'], changed['reused']), (5, 2))
+        self.assertNotEqual(changed['hash'], first['hash'])
+        self.assertIn('Переименован', self.current('index.html'))
+        self.assertEqual(os.stat(os.path.join(self.root, 'current', f'projects/{self.second.pk}/index.html')).st_nlink,
+                         2)
+        self.assertEqual(prerender.build(full=True)['rendered'], 7)
+
+    def test_old_builds_are_pruned(self):
+        for name in ('Один', 'Два', 'Три'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.first.name = name
+                self.first.save()
+            prerender.build()
+        builds = [name for name in os.listdir(os.path.join(self.root, 'builds')) if not name.endswith('.json')]
+        self.assertEqual(len(builds), 2)
+        self.assertIn('Три', self.current('index.html'))
+
+    @override_settings(PRERENDER_ON_SAVE=True)
+    def test_build_on_save(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first.name = 'Сохранён'
+            self.first.save()
+        self.assertIn('Сохранён', self.current('index.html'))
+
+    @override_settings(PRERENDER_BASE_URL='')
+    def test_command_needs_the_base_url(self):
+        with self.assertRaisesMessage(CommandError, 'PRERENDER_BASE_URL'):
+            call_command('prerender', stdout=io.StringIO())
+
+
+class OpenAPITests(PortfolioTestCase):
+    def test_schema_follows_the_code(self):
+        response = self.client.get('/api/swagger.json')
+        self.assertEqual(response.status_code, 200)
+        schema = response.json()
+        self.assertEqual(schema['servers'], [{'url': 'http://testserver'}])
+        components = schema['components']['schemas']
+        self.assertEqual(set(components['Project']['properties']), set(PROJECT_FIELDS))
+        self.assertEqual(components['Project']['properties']['release_date']['format'], 'date')
+        self.assertEqual(set(components['Project']['properties']['links']['properties']), set(PROJECT_LINKS.fields))
+        self.assertEqual(set(components['ContactRequest']['properties']), set(ContactForm.base_fields))
+        fields = schema['paths']['/api/projects/']['get']['parameters'][2]
+        self.assertEqual(fields['schema']['items']['enum'], list(PROJECT_FIELDS))
+
+    def test_export(self):
+        operation = self.client.get('/api/swagger.json').json()['paths']['/api/export/{kind}/']['get']
+        parameters = {parameter['name']: parameter for parameter in operation['parameters']}
+        self.assertEqual(parameters['kind']['schema']['enum'], ['projects', 'contacts'])
+        self.assertEqual(parameters['format']['schema']['enum'], ['ndjson', 'csv'])
+        self.assertIn('since', parameters)
+        self.assertEqual(set(operation['responses']['200']['content']), set(export.FORMATS.values()))
+        self.assertIn({'AdminToken': []}, operation['security'])
+        self.assertEqual(operation['responses']['401']['description'], 'Unauthorized (выгрузка заявок)')
+
+    def test_undocumented_field_is_an_error(self):
+        with mock.patch.dict(openapi.PROJECT_FIELDS, {'slug': Column('name')}):
+            with self.assertRaisesMessage(ImproperlyConfigured, "'slug'"):
+                openapi._project_schema()
+
+    def test_etag(self):
+        response = self.client.get('/api/swagger.json')
+        self.assertEqual(response['ETag'], f'"{hashlib.sha1(response.content).hexdigest()}"')
+        again = self.client.get('/api/swagger.json', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(again.status_code, 304)
+        # the servers URL is part of the document
+        other = self.client.get('/api/swagger.json', headers={'If-None-Match': response['ETag']},
+                                HTTP_HOST='localhost')
+        self.assertEqual(other.status_code, 200)
+        self.assertEqual(other.json()['servers'], [{'url': 'http://localhost'}])
+        self.assertNotEqual(other['ETag'], response['ETag'])
+
+
+class SerializerTests(PortfolioTestCase):
+    def test_plan_columns(self):
+        plan = project_plan(('links', 'name', 'category_label', 'category'))
+        self.assertEqual(plan.columns, ('created_at', 'id', 'link_google_play', 'link_rustore', 'link_appstore',
+                                        'link_github', 'extra_social_link', 'name', 'category'))
+        self.assertIs(project_plan(('id',)), project_plan(('id',)))
+
+    def test_serialize(self):
+        # no image file: saved outside captureOnCommitCallbacks, so no variants are built
+        project = Project.objects.create(
+            name='Магазин', subtitle='Подзаголовок', description='Описание', category='freelance',
+            release_date=datetime.date(2024, 5, 1), work_start_date=datetime.date(2023, 1, 1),
+            link_github='https://github.com/me/shop', image='projects/a b.png',
+        )
+        row = Project.objects.filter(pk=project.pk).values_list(*project_plan().columns).get()
+        data = project_plan().serialize(row, Context(origin='https://example.com/'))
+        self.assertEqual(list(data), list(PROJECT_FIELDS))
+        self.assertEqual((data['category'], data['category_label']), ('freelance', 'Фриланс'))
+        self.assertEqual(data['release_date'], '2024-05-01')
+        self.assertEqual(data['work_period'], {'start': '2023-01-01', 'end': None})
+        self.assertEqual(data['links']['github'], 'https://github.com/me/shop')
+        self.assertEqual(data['image'], 'https://example.com/media/projects/a%20b.png')
+        self.assertEqual(data['images'], {})
+        self.assertEqual(data['updated_at'], project.updated_at.isoformat())
+        self.assertEqual(serializers.dumps(data), serializers.dumps_stdlib(data))
+
+    def test_fields_parameter(self):
+        self.project(name='Первый')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/projects/?fields=name,id,name')
+        self.assertEqual(response.json(), [{'name': 'Первый', 'id': mock.ANY}])
+        select = next(query['sql'] for query in queries if 'portfolio_project' in query['sql'])
+        self.assertNotIn('description', select)
+        response = self.client.get('/api/projects/?fields=id,secret')
+        self.assertEqual((response.status_code, response.json()), (400, {'detail': 'Unknown fields: secret'}))
+
+
+class RateLimitTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        ratelimit._backend = None
+        self.addCleanup(setattr, ratelimit, '_backend', None)
+
+    def test_parse_rate(self):
+        self.assertEqual(ratelimit.parse_rate('5/10m'), (5, 600))
+        self.assertEqual(ratelimit.parse_rate('3/1h'), (3, 3600))
+        self.assertEqual(ratelimit.parse_rate('10/s'), (10, 1))
+        self.assertEqual(ratelimit.parse_rate('2/30'), (2, 30))
+
+    def test_gcra_burst_then_refill(self):
+        backend = ratelimit.MemoryBackend()
+        with mock.patch('portfolio.ratelimit.time.monotonic', return_value=1000.0) as clock:
+            self.assertEqual(backend.hit('key', 2, 60), 0)
+            self.assertEqual(backend.hit('key', 2, 60), 0)
+            self.assertAlmostEqual(backend.hit('key', 2, 60), 30)
+            # a denied hit takes no token
+            self.assertAlmostEqual(backend.hit('key', 2, 60), 30)
+            clock.return_value = 1030.0
+            self.assertEqual(backend.hit('key', 2, 60), 0)
+            self.assertAlmostEqual(backend.hit('key', 2, 60), 30)
+            self.assertEqual(backend.hit('other', 2, 60), 0)
+
+    def test_full_bucket_always_allows(self):
+        # (now + period) - period used to round past `now` for some instants
+        for i in range(1000):
+            now = 1000 + i * 0.337  # time.monotonic() scale
+            new_tat, retry_after = ratelimit._step(None, now, 1, 3600)
+            self.assertEqual((new_tat, retry_after), (now + 3600, 0.0), now)
+
+    def test_memory_backend_is_bounded(self):
+        backend = ratelimit.MemoryBackend(max_keys=2)
+        for key in ('a', 'b', 'c'):
+            backend.hit(key, 1, 60)
+        self.assertEqual(list(backend._tat), ['b', 'c'])
+
+    def test_cache_backend(self):
+        backend = ratelimit.CacheBackend()
+        self.assertEqual(backend.peek('key', 1, 60), 0)
+        self.assertEqual(backend.hit('key', 1, 60), 0)
+        self.assertGreater(backend.peek('key', 1, 60), 59)
+        self.assertGreater(backend.hit('key', 1, 60), 59)
+
+    def test_cache_backend_loses_a_race(self):
+        backend = ratelimit.CacheBackend()
+        shared = ratelimit.get_cache()
+        backend.hit('key', 2, 60)
+        # another worker read this value, then this one took the last token
+        stale = shared.get('key')
+        backend.hit('key', 2, 60)
+        reads = [stale]
+        get = shared.get
+        with mock.patch.object(shared, 'get', side_effect=lambda key: reads.pop() if reads else get(key)):
+            self.assertGreater(backend.hit('key', 2, 60), 29)
+        with mock.patch.object(shared, 'get', return_value=stale):
+            # never wins: denied for one interval
+            self.assertEqual(backend.hit('key', 2, 60), 30)
+
+    async def test_async_cache_backend(self):
+        backend = ratelimit.CacheBackend()
+        self.assertEqual(await backend.ahit('key', 1, 60), 0)
+        self.assertGreater(await backend.apeek('key', 1, 60), 59)
+        self.assertGreater(await backend.ahit('key', 1, 60), 59)
+
+    def test_value_stored_before_the_tokens(self):
+        backend = ratelimit.CacheBackend()
+        # one of two tokens taken
+        ratelimit.get_cache().set('key', time.time() + 30, timeout=60)
+        self.assertEqual(backend.hit('key', 2, 60), 0)
+        self.assertGreater(backend.hit('key', 2, 60), 29)
+
+    @override_settings(RATELIMIT_ENABLED=True, RATELIMIT_CONTACT_IP='2/1m', RATELIMIT_CONTACT_EMAIL='1/1h')
+    def test_rejected_request_takes_no_token(self):
+        for backend in ('memory', 'cache'):
+            with self.subTest(backend), override_settings(RATELIMIT_BACKEND=backend):
+                ratelimit.get_cache().clear()
+                ratelimit._backend = None
+                data = {'full_name': 'Иван', 'email': f'{backend}@example.com', 'message': 'Привет'}
+                self.assertEqual(self.client.post('/api/contact/', data, content_type='application/json').status_code,
+                                 200)
+                # over the e-mail limit: the IP keeps its second token
+                self.assertEqual(self.client.post('/api/contact/', data, content_type='application/json').status_code,
+                                 429)
+                other = {**data, 'email': f'other-{backend}@example.com'}
+                self.assertEqual(self.client.post('/api/contact/', other, content_type='application/json').status_code,
+                                 200)
+                self.assertEqual(self.client.post('/api/contact/', other, content_type='application/json').status_code,
+                                 429)
+
+    @override_settings(ROOT_URLCONF=AsyncAPIURLConf, RATELIMIT_ENABLED=True, RATELIMIT_BACKEND='cache',
+                       RATELIMIT_CONTACT_IP='2/1m', RATELIMIT_CONTACT_EMAIL='1/1h')
+    async def test_async_rejected_request_takes_no_token(self):
+        data = {'full_name': 'Иван', 'email': 'ivan@example.com', 'message': 'Привет'}
+        statuses = []
+        for email in ('ivan@example.com', 'ivan@example.com', 'petr@example.com'):
+            response = await self.async_client.post('/api/contact/', {**data, 'email': email},
+                                                    content_type='application/json')
+            statuses.append(response.status_code)
+        self.assertEqual(statuses, [200, 429, 200])
+
+    @override_settings(RATELIMIT_ENABLED=True, RATELIMIT_CONTACT_IP='2/1m', RATELIMIT_CONTACT_EMAIL='100/1m')
+    def test_contact_api_answers_429(self):
+        for _ in range(2):
+            self.assertEqual(self.client.post('/api/contact/', {}, content_type='application/json').status_code, 400)
+        response = self.client.post('/api/contact/', {}, content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        # GET isn't limited
+        self.assertEqual(self.client.get('/api/contact/').status_code, 405)
+
+    @override_settings(RATELIMIT_ENABLED=True, RATELIMIT_CONTACT_IP='100/1m', RATELIMIT_CONTACT_EMAIL='1/1h')
+    def test_contact_form_limits_by_email(self):
+        data = {'full_name': 'Иван', 'email': 'Ivan@Example.com', 'message': 'Привет'}
+        self.assertEqual(self.client.post('/contact/', data).status_code, 302)
+        response = self.client.post('/contact/', {**data, 'email': ' ivan@example.com'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(ContactMessage.objects.count(), 1)
+
+
+class _SyncFlusher:
+    """Stands in for the flusher thread: flushes every item as it is queued."""
+
+    def __init__(self):
+        self.flusher = ingest._Flusher()
+        self.queue = self
+
+    def put(self, pending) -> None:
+        self.flusher.flush([pending])
+
+
+class IngestTests(PortfolioTestCase):
+    DATA = {'full_name': 'Иван', 'email': 'ivan@example.com', 'message': 'Нужен сайт'}
+
+    def submit(self, **data) -> str:
+        form = ContactForm({**self.DATA, **data})
+        self.assertTrue(form.is_valid(), form.errors)
+        return ingest.submit(form, 'Заявка')
+
+    @override_settings(**TELEGRAM)
+    def test_sync_saves_message_and_outbox_row(self):
+        self.assertEqual(self.submit(), ingest.ACCEPTED)
+        contact = ContactMessage.objects.get()
+        self.assertEqual(contact.email, 'ivan@example.com')
+        self.assertIn('Нужен сайт', TelegramOutbox.objects.get(contact=contact).text)
+
+    def test_dedup_can_be_turned_off(self):
+        self.assertEqual(self.submit(), ingest.ACCEPTED)
+        self.assertEqual(self.submit(), ingest.ACCEPTED)
+        self.assertEqual(ContactMessage.objects.count(), 2)
+
+    @override_settings(CONTACT_DEDUP_WINDOW=60)
+    def test_dedup_window(self):
+        self.assertEqual(self.submit(), ingest.ACCEPTED)
+        self.assertEqual(self.submit(email='IVAN@example.com', message=' Нужен сайт '), ingest.DUPLICATE)
+        self.assertEqual(self.submit(message='Другое'), ingest.ACCEPTED)
+        self.assertEqual(ContactMessage.objects.count(), 2)
+
+    @override_settings(CONTACT_DEDUP_WINDOW=60)
+    def test_dedup_is_shared_between_workers(self):
+        self.assertEqual(self.submit(), ingest.ACCEPTED)
+        self.worker(2)
+        self.assertEqual(self.submit(), ingest.DUPLICATE)
+
+    @override_settings(CONTACT_DEDUP_WINDOW=60)
+    def test_sync_failure_raises_ingest_error_and_releases_the_key(self):
+        with mock.patch('portfolio.ingest._save', side_effect=RuntimeError('database is down')):
+            with self.assertRaises(ingest.IngestError):
+                self.submit()
+        self.assertEqual(self.submit(), ingest.ACCEPTED)
+
+    def test_contact_api_answers_503_when_saving_fails(self):
+        with mock.patch('portfolio.ingest._save', side_effect=RuntimeError('database is down')):
+            response = self.client.post('/api/contact/', self.DATA, content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+
+    @override_settings(CONTACT_INGEST_MODE='batched_wait')
+    def test_batched_wait(self):
+        with mock.patch('portfolio.ingest._get_flusher', return_value=_SyncFlusher()):
+            self.assertEqual(self.submit(), ingest.ACCEPTED)
+            with mock.patch('portfolio.ingest._save', side_effect=RuntimeError('database is down')):
+                with self.assertRaises(ingest.IngestError):
+                    self.submit(message='Второе')
+        self.assertEqual(list(ContactMessage.objects.values_list('message', flat=True)), ['Нужен сайт'])
+
+    @override_settings(CONTACT_INGEST_MODE='batched', CONTACT_DEDUP_WINDOW=60)
+    def test_batched_answers_without_waiting(self):
+        queued = []
+        flusher = mock.Mock()
+        flusher.queue.put.side_effect = queued.append
+        with mock.patch('portfolio.ingest._get_flusher', return_value=flusher):
+            self.assertEqual(self.submit(), ingest.ACCEPTED)
+            self.assertEqual(self.submit(), ingest.DUPLICATE)
+        self.assertEqual(len(queued), 1)
+        self.assertEqual(ContactMessage.objects.count(), 0)
+        # a failed batch lets the sender try again
+        with mock.patch('portfolio.ingest._save', side_effect=RuntimeError('database is down')):
+            ingest._Flusher().flush(queued)
+        self.assertIsNotNone(queued[0].error)
+        self.assertIsNone(cache.get_shared_cache().get(queued[0].dedup_key))
+
+    @override_settings(CONTACT_INGEST_MODE='batched_wait', CONTACT_INGEST_WAIT_TIMEOUT=0, CONTACT_DEDUP_WINDOW=60)
+    def test_timeout_withdraws_a_queued_message(self):
+        queued = []
+        flusher = mock.Mock()
+        flusher.queue.put.side_effect = queued.append
+        with mock.patch('portfolio.ingest._get_flusher', return_value=flusher):
+            with self.assertRaises(ingest.IngestError):
+                self.submit()
+        # the flusher gets to it too late and skips it
+        ingest._Flusher().flush(queued)
+        self.assertFalse(ContactMessage.objects.exists())
+        # so the retry the 503 asks for isn't a duplicate
+        with mock.patch('portfolio.ingest._get_flusher', return_value=_SyncFlusher()):
+            self.assertEqual(self.submit(), ingest.ACCEPTED)
+        self.assertEqual(ContactMessage.objects.count(), 1)
+
+    @override_settings(CONTACT_INGEST_MODE='batched_wait', CONTACT_INGEST_WAIT_TIMEOUT=0)
+    def test_timeout_during_the_flush_is_accepted(self):
+        flusher = mock.Mock()
+        flusher.queue.put.side_effect = lambda pending: pending.take()
+        with mock.patch('portfolio.ingest._get_flusher', return_value=flusher):
+            with self.assertLogs('portfolio.ingest', 'WARNING'):
+                self.assertEqual(self.submit(), ingest.ACCEPTED)
+
+    @override_settings(**TELEGRAM)
+    def test_flush_saves_a_batch(self):
+        items = [ingest._Pending({**self.DATA, 'message': f'Заявка {i}'}, 'Заявка', None) for i in range(3)]
+        ingest._Flusher().flush(items)
+        self.assertTrue(all(item.done.is_set() and item.error is None for item in items))
+        self.assertEqual(ContactMessage.objects.count(), 3)
+        self.assertEqual(TelegramOutbox.objects.count(), 3)
+
+
+@override_settings(PERF_SERVER_TIMING=True, PERF_METRICS=True, PERF_METRICS_TOKEN='secret')
+class PerformanceMiddlewareTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def timings(self, response) -> dict:
+        """Server-Timing as {name: (duration ms, description)}."""
+        timings = {}
+        for metric in response['Server-Timing'].split(', '):
+            name, *params = metric.split(';')
+            params = dict(param.split('=', 1) for param in params)
+            timings[name] = (float(params['dur']), params.get('desc', '').strip('"'))
+        return timings
+
+    def test_server_timing_counts_queries(self):
+        self.project()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/projects/?fields=id,name')
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {'app', 'db'})
+        self.assertEqual(timings['db'][1], f'{len(queries)} queries')
+        self.assertGreater(len(queries), 0)
+        self.assertGreaterEqual(timings['app'][0], timings['db'][0])
+
+    def test_template_render_time(self):
+        self.project()
+        self.assertIn('tpl', self.timings(self.client.get('/')))
+
+    @override_settings(PERF_SERVER_TIMING=False)
+    def test_header_can_be_turned_off(self):
+        self.assertFalse(self.client.get('/api/projects/').has_header('Server-Timing'))
+
+    def test_log_line(self):
+        with self.assertLogs('portfolio.performance', 'INFO') as logs:
+            response = self.client.get('/api/projects/')
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((line['route'], line['status'], line['bytes']), ('api/projects/', 200, len(response.content)))
+        self.assertIsInstance(line['db_queries'], int)
+        self.assertIsNone(line['template_ms'])
+
+    def test_metrics(self):
+        self.client.get('/api/projects/')
+        self.client.get('/api/projects/999/')
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        body = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').content.decode()
+        self.assertIn('portfolio_request_duration_seconds_count{route="api/projects/",method="GET",status="200"} 1',
+                      body)
+        self.assertIn('route="api/projects/<int:pk>/",method="GET",status="404"', body)
+        with override_settings(PERF_METRICS=False):
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 404)
+
+    def test_follows_the_handler_mode(self):
+        async def view(request):
+            return HttpResponse()
+        self.assertTrue(iscoroutinefunction(PerformanceMiddleware(view)))
+        self.assertFalse(iscoroutinefunction(PerformanceMiddleware(lambda request: HttpResponse())))
+
+    @override_settings(ROOT_URLCONF=AsyncAPIURLConf)
+    async def test_async_view_queries_are_counted(self):
+        await sync_to_async(self.project)()
+        response = await self.async_client.get('/api/projects/?fields=id,name')
+        self.assertEqual(response.status_code, 200)
+        queries = int(self.timings(response)['db'][1].split()[0])
+        self.assertGreater(queries, 0)
+
+
+class CompressionTests(PortfolioTestCase):
+    def test_negotiation(self):
+        self.assertEqual(compression.choose_encoding('gzip, deflate'), 'gzip')
+        self.assertEqual(compression.choose_encoding('deflate, GZIP;q=0.5'), 'gzip')
+        self.assertIsNone(compression.choose_encoding('gzip;q=0'))
+        self.assertIsNone(compression.choose_encoding('identity'))
+        self.assertIsNone(compression.choose_encoding(''))
+        with mock.patch('portfolio.compression.brotli', None):
+            self.assertEqual(compression.choose_encoding('br, gzip'), 'gzip')
+        with mock.patch('portfolio.compression.brotli', mock.Mock()):
+            self.assertEqual(compression.choose_encoding('gzip, br'), 'br')
+            self.assertEqual(compression.choose_encoding('gzip, br;q=0'), 'gzip')
+
+    def test_versioned_json_is_compressed_once(self):
+        for i in range(5):
+            self.project(name=f'Проект {i}')
+        plain = self.client.get('/api/projects/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+        response = self.client.get('/api/projects/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(response['ETag'], 'W/' + plain['ETag'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        with mock.patch('portfolio.compression.compress', side_effect=AssertionError('compressed again')):
+            again = self.client.get('/api/projects/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(again.content, response.content)
+
+    def test_small_body_is_left_alone(self):
+        response = self.client.get('/api/projects/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.content, b'[]')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_html_is_compressed_per_request(self):
+        self.project()
+        response = self.client.get('/contact/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('csrfmiddlewaretoken', gzip.decompress(response.content).decode())
+
+    def test_streaming_body_is_compressed_as_it_goes(self):
+        chunks = [json.dumps({'n': i}).encode() + b'\n' for i in range(50)]
+        middleware = CompressionMiddleware(
+            lambda request: StreamingHttpResponse(iter(chunks), content_type='text/csv'),
+        )
+        response = middleware(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b''.join(chunks))
+
+    async def test_async_streaming_body_stays_async(self):
+        chunks = [json.dumps({'n': i}).encode() + b'\n' for i in range(50)]
+
+        async def body():
+            for chunk in chunks:
+                yield chunk
+
+        async def view(request):
+            return StreamingHttpResponse(body(), content_type='application/json')
+
+        middleware = CompressionMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertTrue(response.is_async)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        compressed = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(gzip.decompress(compressed), b''.join(chunks))
+
+    @override_settings(ROOT_URLCONF=AsyncAPIURLConf)
+    async def test_async_api(self):
+        for i in range(5):
+            await sync_to_async(self.project)(name=f'Проект {i}')
+        plain = await self.async_client.get('/api/projects/')
+        response = await self.async_client.get('/api/projects/', ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], DATABASE_REPLICA_PIN_SECONDS=10)
+class ReplicaRoutingTests(PortfolioTestCase):
+    """The middleware and the router, without a second database: the views
+    record where their reads would go."""
+
+    def setUp(self):
+        super().setUp()
+        self.router = routers.ReplicaRouter()
+        self.reads = []
+
+    def handle(self, request, write: bool = False):
+        request.resolver_match = resolve(request.path)
+        self.middleware.process_view(request, None, (), {})
+        if write:
+            self.router.db_for_write(ContactMessage)
+        self.reads.append(self.router.db_for_read(Project))
+        return HttpResponse()
+
+    def get(self, path: str, **extra):
+        self.middleware = routers.ReplicaMiddleware(self.handle)
+        return self.middleware(RequestFactory().get(path, **extra))
+
+    def test_public_reads_go_to_a_replica(self):
+        self.get('/api/projects/')
+        self.get('/')
+        self.get('/admin/')
+        self.middleware(RequestFactory().post('/api/projects/'))
+        self.assertEqual(self.reads, ['replica', 'replica', None, None])
+        # outside a request
+        self.assertIsNone(self.router.db_for_read(Project))
+
+    def test_writer_is_pinned_to_the_primary(self):
+        self.middleware = routers.ReplicaMiddleware(lambda request: self.handle(request, write=True))
+        response = self.middleware(RequestFactory().post('/contact/'))
+        self.assertEqual(response.cookies[routers.PIN_COOKIE]['max-age'], 10)
+        self.get('/api/projects/', HTTP_COOKIE=f'{routers.PIN_COOKIE}=1')
+        self.get('/api/projects/')
+        self.assertEqual(self.reads, [None, None, 'replica'])
+
+    def test_public_model_write_pins_everyone(self):
+        self.router.db_for_write(Project)
+        self.get('/api/projects/')
+        self.assertEqual(self.reads, [None])
+        cache.get_shared_cache().delete(routers.PRIMARY_UNTIL_KEY)
+        self.get('/api/projects/')
+        self.assertEqual(self.reads, [None, 'replica'])
+
+    def test_write_in_a_request_moves_its_later_reads(self):
+        self.router.db_for_write(ContactMessage)  # not a public model: nobody else is pinned
+        self.get('/api/projects/')
+        self.middleware = routers.ReplicaMiddleware(lambda request: self.handle(request, write=True))
+        self.middleware(RequestFactory().get('/api/projects/'))
+        self.assertEqual(self.reads, ['replica', None])
+
+    async def test_async_requests(self):
+        async def handle(request):
+            return await sync_to_async(self.handle)(request)
+
+        self.middleware = routers.ReplicaMiddleware(handle)
+        self.assertTrue(iscoroutinefunction(self.middleware))
+        await asyncio.gather(*(self.middleware(RequestFactory().get(path))
+                               for path in ('/api/projects/', '/admin/', '/api/social-links/')))
+        self.assertEqual(sorted(self.reads, key=str), [None, 'replica', 'replica'])
+        # the routing state doesn't outlive the request
+        self.assertIsNone(routers._state.get())
+        self.assertIsNone(await sync_to_async(self.router.db_for_read)(Project))
+
+    async def test_async_writer_is_pinned(self):
+        async def handle(request):
+            return await sync_to_async(self.handle)(request, write=True)
+
+        self.middleware = routers.ReplicaMiddleware(handle)
+        response = await self.middleware(RequestFactory().post('/api/contact/'))
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        self.assertEqual(self.reads, [None])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_off_without_replicas(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            routers.ReplicaMiddleware(self.handle)
+
+    def test_migrations_stay_on_the_primary(self):
+        self.assertTrue(self.router.allow_migrate('default', 'portfolio'))
+        self.assertFalse(self.router.allow_migrate('replica', 'portfolio'))
+
+
+async def _slow_view(request):
+    await asyncio.sleep(AsyncAPITests.delay)
+    return HttpResponse('done')
+
+
+class SlowViewURLConf:
+    urlpatterns = [path('slow/', _slow_view), *AsyncAPIURLConf.urlpatterns]
+
+
+@override_settings(ROOT_URLCONF=AsyncAPIURLConf)
+class AsyncAPITests(PortfolioTestCase):
+    delay = 0.3
+
+    def test_every_middleware_is_async_capable(self):
+        for dotted in settings.MIDDLEWARE:
+            with self.subTest(dotted):
+                self.assertTrue(getattr(import_string(dotted), 'async_capable', False))
+
+    @override_settings(ROOT_URLCONF=SlowViewURLConf)
+    async def test_concurrent_requests_are_not_serialized(self):
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(self.async_client.get('/slow/') for _ in range(5)))
+        elapsed = time.perf_counter() - started
+        self.assertEqual([response.status_code for response in responses], [200] * 5)
+        # one after another would take 5 * delay
+        self.assertLess(elapsed, 2 * self.delay)
+
+    @override_settings(WHITENOISE_AUTOREFRESH=True, WHITENOISE_USE_FINDERS=True)
+    async def test_static_file_is_streamed_asynchronously(self):
+        response = await self.async_client.get('/static/admin/css/base.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertIn(b'body', body)
+
+    async def test_project_list(self):
+        await sync_to_async(self.project)(name='Первый')
+        await sync_to_async(self.project)(name='Второй')
+        response = await self.async_client.get('/api/projects/?fields=id,name&limit=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([set(item) for item in response.json()], [{'id', 'name'}])
+        self.assertIn('rel="next"', response['Link'])
+        again = await self.async_client.get('/api/projects/', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(again.status_code, 304)
+        invalid = await self.async_client.get('/api/projects/?limit=abc')
+        self.assertEqual(invalid.status_code, 400)
+
+    async def test_project_detail(self):
+        project = await sync_to_async(self.project)()
+        response = await self.async_client.get(f'/api/projects/{project.pk}/')
+        self.assertEqual((response.status_code, response.json()['name']), (200, project.name))
+        self.assertEqual((await self.async_client.get('/api/projects/999/')).status_code, 404)
+
+    async def test_contact(self):
+        data = {'full_name': 'Иван', 'email': 'ivan@example.com', 'message': 'Здравствуйте'}
+        response = await self.async_client.post('/api/contact/', data, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['ok'])
+        self.assertTrue(await ContactMessage.objects.filter(email='ivan@example.com').aexists())
+        response = await self.async_client.post('/api/contact/', {}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((await self.async_client.get('/api/contact/')).status_code, 405)
+
+    @override_settings(RATELIMIT_ENABLED=True, RATELIMIT_CONTACT_IP='1/10m')
+    async def test_contact_is_rate_limited(self):
+        data = {'full_name': 'Иван', 'email': 'ivan@example.com', 'message': 'Здравствуйте'}
+        await self.async_client.post('/api/contact/', data, content_type='application/json')
+        response = await self.async_client.post('/api/contact/', data, content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    @override_settings(SOCIAL_ADMIN_TOKEN='token')
+    async def test_social_links(self):
+        update = {'telegram': 'https://t.me/ivan'}
+        response = await self.async_client.post('/api/social-links/', update, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.post('/api/social-links/', update, content_type='application/json',
+                                                headers={'X-Admin-Token': 'token'})
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get('/api/social-links/')
+        self.assertEqual(response.json()['telegram'], 'https://t.me/ivan')
+        again = await self.async_client.get('/api/social-links/', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(again.status_code, 304)
+
+
+class TelegramClientTests(SimpleTestCase):
+    def notifier(self, *responses) -> TelegramNotifier:
+        """A notifier whose session answers with `responses`, (status, json) each."""
+        notifier = TelegramNotifier('token', '1', max_retry_wait=5, max_attempts=3)
+        notifier._session = mock.Mock()
+        notifier._session.post.side_effect = [
+            mock.Mock(status_code=status, headers={}, text=json.dumps(body), **{'json.return_value': body})
+            for status, body in responses
+        ]
+        return notifier
+
+    def sent(self, notifier) -> list:
+        return [call.kwargs['json']['text'] for call in notifier.session.post.call_args_list]
+
+    def test_pack(self):
+        texts = ['a' * 2000, 'b' * 2000, 'c' * 2000, 'd' * 5000]
+        chunks = telegram.pack(texts)
+        self.assertEqual([indexes for _, indexes in chunks], [[0, 1], [2], [3]])
+        self.assertEqual(chunks[0][0], texts[0] + telegram.BULK_SEPARATOR + texts[1])
+        self.assertTrue(all(len(message) <= telegram.MESSAGE_LIMIT for message, _ in chunks))
+
+    def test_send_bulk_packs_texts(self):
+        notifier = self.notifier((200, {'ok': True}))
+        self.assertEqual(notifier.send_bulk(['первое', 'второе']), [None, None])
+        self.assertEqual(self.sent(notifier), [f'первое{telegram.BULK_SEPARATOR}второе'])
+
+    @mock.patch('time.sleep')
+    def test_short_rate_limit_is_waited_out(self, sleep):
+        notifier = self.notifier((429, {'parameters': {'retry_after': 2}}), (200, {'ok': True}))
+        notifier.send('текст')
+        sleep.assert_called_once_with(2)
+        self.assertEqual(len(self.sent(notifier)), 2)
+
+    @mock.patch('time.sleep')
+    def test_long_rate_limit_is_not_waited_out(self, sleep):
+        notifier = self.notifier((429, {'parameters': {'retry_after': 60}}))
+        with self.assertRaises(RateLimited) as raised:
+            notifier.send('текст')
+        self.assertEqual(raised.exception.retry_after, 60)
+        sleep.assert_not_called()
+
+    @mock.patch('time.sleep')
+    def test_retries_are_bounded(self, sleep):
+        notifier = self.notifier(*[(429, {'parameters': {'retry_after': 1}})] * 3)
+        with self.assertRaises(RateLimited):
+            notifier.send('текст')
+        self.assertEqual(len(self.sent(notifier)), 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    @mock.patch('time.sleep')
+    def test_send_bulk_stops_after_rate_limit(self, sleep):
+        texts = ['a' * 3000, 'b' * 3000, 'c' * 3000]
+        notifier = self.notifier((500, {}), (429, {'parameters': {'retry_after': 60}}))
+        results = notifier.send_bulk(texts)
+        self.assertIsInstance(results[0], TelegramError)
+        self.assertNotIsInstance(results[0], RateLimited)
+        self.assertIsInstance(results[1], RateLimited)
+        self.assertIs(results[2], results[1])
+        self.assertEqual(len(self.sent(notifier)), 2)
+
+    def test_errors_hide_the_token(self):
+        notifier = self.notifier()
+        self.assertEqual(notifier.clean_error(Exception(f'{notifier.url} failed')),
+                         'https://api.telegram.org/bot***/sendMessage failed')
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class WarmupTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        warmup._status = None
+        self.addCleanup(setattr, warmup, '_status', None)
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_ready_probe_warms_the_worker_up(self):
+        self.project()
+        response = self.client.get('/healthz/ready')
+        self.assertEqual(response.status_code, 200)
+        status = response.json()
+        self.assertEqual((status['ready'], status['errors']), (True, []))
+        self.assertEqual(set(status['steps_ms']), {'imports', 'database', 'urls', 'templates', 'pages'})
+        self.assertIn('portfolio_startup_seconds{step="total"}', metrics.render())
+        with mock.patch('portfolio.warmup.run') as run:
+            self.assertEqual(self.client.get('/healthz/ready').status_code, 200)
+        run.assert_not_called()
+
+    def test_renders_the_pages_into_the_caches(self):
+        for i in range(2):
+            self.project(name=f'Проект {i}')
+        self.assertTrue(warmup.run()['ready'])
+        with mock.patch('portfolio.fragments.Project', side_effect=AssertionError('built a Project')):
+            self.assertContains(self.client.get('/'), 'Проект 1')
+
+    def test_api_pages_need_the_base_url(self):
+        project = self.project()
+        with mock.patch('portfolio.prerender.render') as render:
+            warmup.run()
+            self.assertNotIn('/api/projects/', [call.args[1] for call in render.call_args_list])
+            with override_settings(WARMUP_BASE_URL='https://example.com'):
+                render.reset_mock()
+                warmup.run()
+        paths = [call.args[1] for call in render.call_args_list]
+        self.assertIn('/api/projects/', paths)
+        self.assertIn(f'/api/projects/{project.pk}/', paths)
+        request = render.call_args.args[0].get('/')
+        self.assertEqual((request.scheme, request.META['HTTP_HOST']), ('https', 'example.com'))
+
+    def test_failed_warm_up_is_retried_by_the_probe(self):
+        with mock.patch('portfolio.warmup._connect', side_effect=RuntimeError('database is down')):
+            with self.assertLogs('portfolio.warmup', 'ERROR'):
+                response = self.client.get('/healthz/ready')
+        self.assertEqual(response.status_code, 503)
+        status = response.json()
+        self.assertEqual(status['errors'], ['database: database is down'])
+        self.assertNotIn('pages', status['steps_ms'])
+        self.assertEqual(self.client.get('/healthz/ready').status_code, 200)
+
+    def test_probe_is_not_cached(self):
+        self.assertIn('no-cache', self.client.get('/healthz/ready')['Cache-Control'])
+
+
+class BenchmarkTests(PortfolioTestCase):
+    def test_percentile(self):
+        ordered = [float(i) for i in range(1, 101)]
+        self.assertEqual(benchmark.percentile(ordered, 50), 50)
+        self.assertEqual(benchmark.percentile(ordered, 99), 99)
+        self.assertEqual(benchmark.percentile([7.0], 95), 7)
+        self.assertEqual(benchmark.percentile([], 50), 0)
+
+    def test_queries_from_server_timing(self):
+        self.assertEqual(benchmark.queries_from('app;dur=1.0, db;dur=0.4;desc="3 queries"'), 3)
+        self.assertIsNone(benchmark.queries_from('app;dur=1.0'))
+        self.assertIsNone(benchmark.queries_from(None))
+
+    def test_compare_reports_regressions(self):
+        base = {'results': {'home': {'errors': 0, 'p50_ms': 10, 'p95_ms': 20, 'p99_ms': 30, 'rps': 100, 'queries': 2}}}
+        same = {'results': {'home': {**base['results']['home'], 'p99_ms': 36}}}
+        self.assertEqual(benchmark.compare(same, base, 0.2), [])
+        worse = {'results': {'home': {'errors': 1, 'p50_ms': 10, 'p95_ms': 30, 'p99_ms': 30, 'rps': 70, 'queries': 3}}}
+        problems = benchmark.compare(worse, base, 0.2)
+        self.assertEqual([line.split(' ')[1] for line in problems], ['1', 'p95_ms', 'rps', 'queries'])
+        # endpoints missing from the baseline aren't compared
+        self.assertEqual(benchmark.compare({'results': {'new': worse['results']['home']}}, base, 0.2), [])
+
+    def test_inprocess_run_against_a_baseline(self):
+        call_command('seed_benchmark', projects=3, contacts=5, stdout=io.StringIO())
+        self.assertEqual(Project.objects.filter(subtitle=benchmark.BENCH_SUBTITLE).count(), 3)
+        path = os.path.join(self.shared_dir, 'baseline.json')
+        out = io.StringIO()
+        call_command('benchmark', requests=3, warmup=1, save_baseline=path, stdout=out)
+        with open(path) as f:
+            report = json.load(f)
+        self.assertEqual(set(report['results']), set(benchmark.ENDPOINTS))
+        for name, result in report['results'].items():
+            self.assertEqual((result['requests'], result['errors']), (3, 0), name)
+            self.assertIsNotNone(result['queries'], name)
+        # one warm-up and three measured contact submissions
+        self.assertEqual(ContactMessage.objects.count(), 5 + 4)
+
+        report['results']['home']['queries'] = -1
+        with open(path, 'w') as f:
+            json.dump(report, f)
+        with self.assertRaisesRegex(CommandError, 'home: queries'):
+            call_command('benchmark', requests=3, warmup=0, endpoint=['home'], baseline=path,
+                         tolerance=100, stdout=out)
+
+    def test_seed_refuses_real_data(self):
+        self.project()
+        with self.assertRaises(CommandError):
+            call_command('seed_benchmark', projects=1, contacts=0, stdout=io.StringIO())
+
+
+class ExportTests(PortfolioTestCase):
+    def export(self, fmt: str) -> str:
+        return b''.join(export.stream('contacts', fmt, None, Context(origin='http://testserver'))).decode('utf-8-sig')
+
+    def test_csv_defuses_formulas(self):
+        for i, text in enumerate(('=HYPERLINK("http://evil")', '+1', '-1', '@SUM(A1)', '\tx', '\rx', 'ok - fine')):
+            self.contact(full_name=f'Имя {i}', email=f'u{i}@example.com', message=text)
+        rows = list(csv.DictReader(io.StringIO(self.export('csv'))))
+        self.assertEqual(
+            [row['message'] for row in rows],
+            ["'=HYPERLINK(\"http://evil\")", "'+1", "'-1", "'@SUM(A1)", "'\tx", "'\rx", 'ok - fine'],
+        )
+        self.assertEqual(rows[0]['full_name'], 'Имя 0')
+
+    def test_ndjson_keeps_values_as_sent(self):
+        self.contact(message='=1+1')
+        record = json.loads(self.export('ndjson'))
+        self.assertEqual(record['message'], '=1+1')
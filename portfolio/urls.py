@@ -1,17 +1,28 @@
+from django.conf import settings
 from django.urls import path
+from django.views.generic import TemplateView
 from . import views
 
+if settings.ASYNC_API:
+    from . import async_views as api_views
+else:
+    api_views = views
+
 
 urlpatterns = [
     path('', views.ProjectListView.as_view(), name='home'),
     path('projects/<int:pk>/', views.ProjectDetailView.as_view(), name='project_detail'),
     path('contact/', views.contact_view, name='contact'),
     # API
-    path('api/projects/', views.projects_api, name='projects_api'),
-    path('api/projects/<int:pk>/', views.project_detail_api, name='project_detail_api'),
-    path('api/contact/', views.contact_api, name='contact_api'),
-    path('api/social-links/', views.social_links_api, name='social_links_api'),
+    path('api/projects/', api_views.projects_api, name='projects_api'),
+    path('api/projects/search/', views.projects_search_api, name='projects_search_api'),
+    path('api/projects/<int:pk>/', api_views.project_detail_api, name='project_detail_api'),
+    path('api/contact/', api_views.contact_api, name='contact_api'),
+    path('api/social-links/', api_views.social_links_api, name='social_links_api'),
+    path('api/export/<slug:kind>/', views.export_api, name='export_api'),
     path('api/swagger.json', views.swagger_json, name='swagger_json'),
-    path('api/docs/', views.ProjectListView.as_view(template_name='portfolio/swagger.html'), name='swagger_ui'),
+    path('metrics', views.metrics_view, name='metrics'),
+    path('healthz/ready', views.ready_view, name='healthz_ready'),
+    path('api/docs/', TemplateView.as_view(template_name='portfolio/swagger.html'), name='swagger_ui'),
 ]
 
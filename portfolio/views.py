@@ -1,172 +1,328 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect
 from django.views.generic import ListView, DetailView
 from django.conf import settings
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import never_cache
 from django.views.decorators.csrf import csrf_exempt
-import requests
+from django.views.decorators.http import condition
+from django.utils.decorators import method_decorator
+import hashlib
 import json
+import math
 
-from .models import Project, SocialLinks
+from . import conditional, export, fragments, ingest, metrics, pagination, snapshots, warmup
+from .models import Project, ProjectCategory, SocialLinks
 from .forms import ContactForm
-from config.openapi import get_openapi_schema
+from .ratelimit import CONTACT_LIMITS, ratelimit
+from .search import search_project_ids
+from .serializers import PROJECT_FIELDS, Context, dumps, project_plan
+from .cache import cached_json, get_social_links, remember
 
 
+@method_decorator(condition(etag_func=conditional.home_etag), name='dispatch')
 class ProjectListView(ListView):
-    model = Project
     template_name = 'portfolio/home.html'
     context_object_name = 'projects'
 
+    def get_queryset(self):
+        # Cards come from the fragment cache; load only what a card shows,
+        # from the list snapshot once it is built.
+        cards = snapshots.cards()
+        if cards is None:
+            return fragments.card_data(Project.objects.all())
+        return cards
+
 
+@method_decorator(condition(etag_func=conditional.project_page_etag), name='dispatch')
 class ProjectDetailView(DetailView):
     model = Project
     template_name = 'portfolio/project_detail.html'
     context_object_name = 'project'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['fragment_timeout'] = settings.PORTFOLIO_CACHE_TIMEOUT
+        context['fragment_version'] = fragments.template_version(self.template_name)
+        return context
+
+
+def _contact_limited(request, retry_after: float):
+    form = ContactForm(request.POST)
+    form.add_error(None, "Слишком много заявок. Попробуйте позже.")
+    response = render(request, 'portfolio/contact.html', {"form": form}, status=429)
+    response['Retry-After'] = str(math.ceil(retry_after))
+    return response
 
+
+@ratelimit('contact', CONTACT_LIMITS, limited=_contact_limited)
 def contact_view(request):
     if request.method == 'POST':
         form = ContactForm(request.POST)
         if form.is_valid():
-            contact: ContactForm = form.save()
-            # Send to Telegram
-            token = settings.TELEGRAM_BOT_TOKEN
-            chat_id = settings.TELEGRAM_CHAT_ID
-            if token and chat_id:
-                text = (
-                    f"Новая заявка с формы:\n"
-                    f"Имя: {contact.full_name}\n"
-                    f"Email: {contact.email}\n"
-                    f"Сообщение: {contact.message}"
-                )
-                try:
-                    requests.post(
-                        f"https://api.telegram.org/bot{token}/sendMessage",
-                        json={"chat_id": chat_id, "text": text},
-                        timeout=10,
-                    )
-                except Exception:
-                    pass
-            return redirect('home')
+            # Telegram notification is delivered by the outbox worker
+            try:
+                ingest.submit(form, "Новая заявка с формы")
+            except ingest.IngestError:
+                form.add_error(None, "Не удалось сохранить заявку. Попробуйте ещё раз.")
+            else:
+                return redirect('home')
     else:
         form = ContactForm()
     return render(request, 'portfolio/contact.html', {"form": form})
 
 
-def _serialize_project(project: Project, request) -> dict:
-    image_url = project.image.url if project.image else None
-    if image_url:
-        image_url = request.build_absolute_uri(image_url)
+def _parse_fields(value: str):
+    if not value:
+        return None
+    fields = [f.strip() for f in value.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in PROJECT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return tuple(dict.fromkeys(fields))
+
+
+def _detail_queryset(pk):
+    return Project.objects.filter(pk=pk).values_list(*project_plan().columns)
+
+
+def _list_params(request) -> dict:
+    """Validated query parameters of /api/projects/; raises ValueError."""
+    category = request.GET.get('category') or None
+    if category and category not in ProjectCategory.values:
+        raise ValueError("Unknown category")
     return {
-        "id": project.id,
-        "name": project.name,
-        "subtitle": project.subtitle,
-        "description": project.description,
-        "description_en": project.description_en,
-        "category": project.category,
-        "category_label": project.get_category_display(),
-        "release_date": project.release_date.isoformat() if project.release_date else None,
-        "work_period": {
-            "start": project.work_start_date.isoformat() if project.work_start_date else None,
-            "end": project.work_end_date.isoformat() if project.work_end_date else None,
-        },
-        "links": {
-            "google_play": project.link_google_play,
-            "rustore": project.link_rustore,
-            "appstore": project.link_appstore,
-            "github": project.link_github,
-            "extra_social": project.extra_social_link,
-        },
-        "image": image_url,
-        "updated_at": project.updated_at.isoformat() if project.updated_at else None,
-        "created_at": project.created_at.isoformat() if project.created_at else None,
+        "category": category,
+        "fields": _parse_fields(request.GET.get('fields', '')),
+        "limit": pagination.parse_limit(request.GET.get('limit')),
+        "cursor": pagination.decode_cursor(request.GET.get('cursor')),
     }
 
 
-def projects_api(request):
+def _list_cache_name(request, params: dict) -> str:
+    fields = ','.join(params['fields'] or [])
+    cursor = request.GET.get('cursor', '')
+    return f"list:{params['category']}:{fields}:{params['limit']}:{cursor}:{request.build_absolute_uri('/')}"
+
+
+def _list_queryset(params: dict):
     projects = Project.objects.all()
-    data = [_serialize_project(p, request) for p in projects]
-    return JsonResponse(data, safe=False)
+    if params['category']:
+        projects = projects.filter(category=params['category'])
+    projects = pagination.after_cursor(projects, params['cursor'])
+    projects = projects.values_list(*project_plan(params['fields']).columns)
+    if params['limit']:
+        # One extra row tells whether there is a next page.
+        projects = projects[:params['limit'] + 1]
+    return projects
+
+
+def _list_page(request, rows: list, params: dict) -> tuple:
+    """Encodes a fetched page of _list_queryset() rows; returns (body, next_cursor)."""
+    plan = project_plan(params['fields'])
+    next_cursor = None
+    if params['limit'] and len(rows) > params['limit']:
+        rows = rows[:params['limit']]
+        last = rows[-1]
+        next_cursor = pagination.encode_cursor(last[plan.index['created_at']], last[plan.index['id']])
+    body = dumps(plan.serialize_many(rows, Context(request)))
+    return body, next_cursor
+
 
+def _list_response(request, body: bytes, next_cursor) -> HttpResponse:
+    response = HttpResponse(body, content_type='application/json')
+    if next_cursor:
+        query = request.GET.copy()
+        query['cursor'] = next_cursor
+        response['Link'] = f'<{request.build_absolute_uri("?" + query.urlencode())}>; rel="next"'
+    return response
 
+
+# The parameters are validated before the conditional check, so an invalid
+# request gets its 400 (without validators) rather than a 304.
+
+def projects_api(request):
+    try:
+        params = _list_params(request)
+    except ValueError as exc:
+        return JsonResponse({"detail": str(exc)}, status=400)
+    return _projects_list(request, params)
+
+
+@condition(etag_func=conditional.projects_etag, last_modified_func=conditional.projects_last_modified)
+def _projects_list(request, params: dict):
+    def build():
+        page = snapshots.page(params, Context(request).origin)
+        if page is not None:
+            return page
+        return _list_page(request, list(_list_queryset(params)), params)
+
+    body, next_cursor = remember(_list_cache_name(request, params), build)
+    return _list_response(request, body, next_cursor)
+
+
+def projects_search_api(request):
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({"detail": "q is required"}, status=400)
+    try:
+        limit = pagination.parse_limit(request.GET.get('limit')) or settings.PROJECTS_API_MAX_LIMIT
+    except ValueError as exc:
+        return JsonResponse({"detail": str(exc)}, status=400)
+    return _search_results(request, query, limit)
+
+
+@condition(etag_func=conditional.projects_etag, last_modified_func=conditional.projects_last_modified)
+def _search_results(request, query: str, limit: int):
+    def build():
+        ranked = search_project_ids(query, limit)
+        plan = project_plan()
+        rows = Project.objects.filter(pk__in=[pk for pk, _rank in ranked]).values_list(*plan.columns)
+        rows = {row[plan.index['id']]: row for row in rows}
+        context = Context(request)
+        results = []
+        for pk, rank in ranked:
+            if pk in rows:
+                data = plan.serialize(rows[pk], context)
+                data["rank"] = rank
+                results.append(data)
+        return dumps(results)
+
+    digest = hashlib.sha1(query.encode()).hexdigest()
+    return cached_json(request, f"search:{limit}:{digest}", build)
+
+
+@condition(etag_func=conditional.project_etag, last_modified_func=conditional.project_last_modified)
 def project_detail_api(request, pk: int):
-    project = get_object_or_404(Project, pk=pk)
-    data = _serialize_project(project, request)
-    return JsonResponse(data)
+    def build():
+        row = _detail_queryset(pk).first()
+        if row is None:
+            raise Http404
+        return dumps(project_plan().serialize(row, Context(request)))
+    return cached_json(request, f'detail:{pk}', build)
 
 
-@csrf_exempt
-def contact_api(request):
-    if request.method != 'POST':
-        return JsonResponse({"detail": "Method not allowed"}, status=405)
-    data = None
+def _contact_form(request) -> ContactForm:
     if request.content_type and 'application/json' in request.content_type:
         try:
             data = json.loads(request.body or b"{}")
         except Exception:
             data = {}
-        form = ContactForm(data)
-    else:
-        form = ContactForm(request.POST)
+        return ContactForm(data)
+    return ContactForm(request.POST)
+
+
+CONTACT_API_TITLE = "Новая заявка с формы (API)"
+CONTACT_UNAVAILABLE = {"detail": "Could not save the message, try again later"}
+
+
+@csrf_exempt
+@ratelimit('contact', CONTACT_LIMITS)
+def contact_api(request):
+    if request.method != 'POST':
+        return JsonResponse({"detail": "Method not allowed"}, status=405)
+    form = _contact_form(request)
     if not form.is_valid():
         return JsonResponse({"errors": form.errors}, status=400)
-    contact = form.save()
-    token = settings.TELEGRAM_BOT_TOKEN
-    chat_id = settings.TELEGRAM_CHAT_ID
-    if token and chat_id:
-        text = (
-            f"Новая заявка с формы (API):\n"
-            f"Имя: {contact.full_name}\n"
-            f"Email: {contact.email}\n"
-            f"Сообщение: {contact.message}"
-        )
+    try:
+        status = ingest.submit(form, CONTACT_API_TITLE)
+    except ingest.IngestError:
+        return JsonResponse(CONTACT_UNAVAILABLE, status=503)
+    return JsonResponse({"ok": True, "status": status})
+
+
+def _is_admin_token_valid(request) -> bool:
+    # Simple token-based guard using Django admin session would be better,
+    # but for simplicity accept a shared token via header X-Admin-Token
+    token = request.headers.get('X-Admin-Token')
+    expected = getattr(settings, 'SOCIAL_ADMIN_TOKEN', '')
+    return bool(expected) and token == expected
+
+
+def _update_social_links(request) -> SocialLinks:
+    obj, _ = SocialLinks.objects.get_or_create(id=1)
+    if request.content_type and 'application/json' in request.content_type:
         try:
-            requests.post(
-                f"https://api.telegram.org/bot{token}/sendMessage",
-                json={"chat_id": chat_id, "text": text},
-                timeout=10,
-            )
+            body = json.loads(request.body or b"{}")
         except Exception:
-            pass
-    return JsonResponse({"ok": True})
+            body = {}
+        obj.telegram = (body.get('telegram') or '').strip()
+        obj.github = (body.get('github') or '').strip()
+        obj.linkedin = (body.get('linkedin') or '').strip()
+    else:
+        obj.telegram = request.POST.get('telegram') or ''
+        obj.github = request.POST.get('github') or ''
+        obj.linkedin = request.POST.get('linkedin') or ''
+    obj.save()
+    return obj
+
+
+@condition(etag_func=conditional.social_links_etag)
+def _social_links_get(request):
+    data = get_social_links() or {"telegram": '', "github": '', "linkedin": ''}
+    return JsonResponse(data)
 
 
 @csrf_exempt
 def social_links_api(request):
-    if request.method == 'GET':
-        obj = SocialLinks.objects.first()
-        data = {
-            "telegram": getattr(obj, 'telegram', ''),
-            "github": getattr(obj, 'github', ''),
-            "linkedin": getattr(obj, 'linkedin', ''),
-        }
-        return JsonResponse(data)
+    if request.method in ('GET', 'HEAD'):
+        return _social_links_get(request)
     if request.method == 'POST':
-        # Simple token-based guard using Django admin session would be better,
-        # but for simplicity accept a shared token via header X-Admin-Token
-        token = request.headers.get('X-Admin-Token')
-        expected = getattr(settings, 'SOCIAL_ADMIN_TOKEN', '')
-        if not expected or token != expected:
+        if not _is_admin_token_valid(request):
             return JsonResponse({"detail": "Unauthorized"}, status=401)
-        obj, _ = SocialLinks.objects.get_or_create(id=1)
-        if request.content_type and 'application/json' in request.content_type:
-            try:
-                body = json.loads(request.body or b"{}")
-            except Exception:
-                body = {}
-            obj.telegram = (body.get('telegram') or '').strip()
-            obj.github = (body.get('github') or '').strip()
-            obj.linkedin = (body.get('linkedin') or '').strip()
-        else:
-            obj.telegram = request.POST.get('telegram') or ''
-            obj.github = request.POST.get('github') or ''
-            obj.linkedin = request.POST.get('linkedin') or ''
-        obj.save()
+        _update_social_links(request)
         return JsonResponse({"ok": True})
     return JsonResponse({"detail": "Method not allowed"}, status=405)
 
 
+def export_api(request, kind: str):
+    if kind not in export.EXPORTS:
+        raise Http404
+    if kind == 'contacts' and not (request.user.is_staff or _is_admin_token_valid(request)):
+        return JsonResponse({"detail": "Unauthorized"}, status=401)
+    fmt = request.GET.get('format', 'ndjson')
+    if fmt not in export.FORMATS:
+        return JsonResponse({"detail": f"format must be one of: {', '.join(export.FORMATS)}"}, status=400)
+    try:
+        since = export.parse_since(request.GET.get('since'))
+    except ValueError as exc:
+        return JsonResponse({"detail": str(exc)}, status=400)
+    chunks = export.stream(kind, fmt, since, Context(request))
+    if isinstance(request, ASGIRequest):
+        chunks = export.aiterate(chunks)
+    response = StreamingHttpResponse(chunks, content_type=export.FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{export.filename(kind, fmt)}"'
+    if kind == 'contacts':
+        response['Cache-Control'] = 'no-store'
+    return response
+
+
 def swagger_json(request):
+    # The schema module is only needed by this rarely requested view.
+    from config.openapi import get_openapi_document
+
     base_url = request.build_absolute_uri('/')[:-1]
-    return JsonResponse(get_openapi_schema(base_url))
+    body, etag = get_openapi_document(base_url)
+    response = conditional.not_modified(request, etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    return conditional.set_validators(response, etag)
+
+
+def metrics_view(request):
+    if not settings.PERF_METRICS:
+        raise Http404
+    expected = settings.PERF_METRICS_TOKEN
+    if not expected or request.headers.get('Authorization') != f'Bearer {expected}':
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@never_cache
+def ready_view(request):
+    # A worker that hasn't warmed up (not started by gunicorn.conf.py, or
+    # the warm-up failed) does it now, on the probe rather than on a visitor.
+    status = warmup.ensure()
+    return JsonResponse(status, status=200 if status['ready'] else 503)
 
 # Create your views here.
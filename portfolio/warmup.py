@@ -0,0 +1,159 @@
+"""Worker warm-up and the readiness state behind /healthz/ready.
+
+run() takes a new worker through the cold path before it serves traffic:
+imports the view modules, opens the database connections, builds the URL
+resolver and resolves every route, compiles the templates and renders the
+public pages once, which fills the response and fragment caches.
+The API pages cache their bodies per origin (their URLs are absolute), so
+they are only rendered when WARMUP_BASE_URL says which origin clients use.
+gunicorn.conf.py calls it when a worker starts; `manage.py warmup` runs it
+by hand (with a shared cache backend that fills the cache for all workers).
+
+Each step is timed. The timings are logged, exported at /metrics as
+portfolio_startup_seconds and returned by /healthz/ready, which answers 503
+until a run in this process has finished without errors.
+"""
+import importlib
+import io
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.urls import get_resolver, resolve, reverse
+
+from . import metrics, prerender
+from .fragments import preload_templates
+from .models import Project
+
+logger = logging.getLogger('portfolio.warmup')
+
+MODULES = ('portfolio.views', 'portfolio.serializers', 'portfolio.search', 'portfolio.conditional')
+
+# URL kwargs for reversing the parametrised routes; pk is the newest project
+_SAMPLE_KWARGS = {'kind': 'projects'}
+
+_PAGES = ('home', 'contact', 'projects_api', 'social_links_api', 'swagger_ui')
+_PROJECT_PAGES = ('project_detail', 'project_detail_api')
+# pages whose cached body depends on the request's origin
+_ORIGIN_PAGES = frozenset({'projects_api', 'project_detail_api'})
+
+_lock = threading.Lock()
+_status = None
+
+
+def _import_modules() -> None:
+    for name in MODULES:
+        importlib.import_module(name)
+    if settings.ASYNC_API:
+        importlib.import_module('portfolio.async_views')
+
+
+def _connect() -> None:
+    for alias in connections:
+        connections[alias].ensure_connection()
+
+
+def _resolve_urls(pk) -> None:
+    from portfolio import urls
+
+    get_resolver().reverse_dict  # builds the resolver's lookup tables
+    for pattern in urls.urlpatterns:
+        kwargs = {name: pk if name == 'pk' else _SAMPLE_KWARGS[name] for name in pattern.pattern.converters}
+        if 'pk' in kwargs and pk is None:
+            continue
+        resolve(reverse(pattern.name, kwargs=kwargs))
+
+
+class _Requests:
+    """The part of RequestFactory prerender.render() uses: importing
+    django.test would cost every worker a few dozen modules."""
+
+    def __init__(self, base_url: str):
+        parts = urlsplit(base_url or 'http://localhost')
+        secure = parts.scheme == 'https'
+        self.environ = {
+            'HTTP_HOST': parts.netloc,
+            'SERVER_NAME': parts.hostname,
+            'SERVER_PORT': str(parts.port or (443 if secure else 80)),
+            'wsgi.url_scheme': parts.scheme,
+        }
+        # behind a TLS-terminating proxy is_secure() looks at the proxy's header
+        if secure and settings.SECURE_PROXY_SSL_HEADER:
+            header, value = settings.SECURE_PROXY_SSL_HEADER
+            self.environ[header] = value
+
+    def get(self, path: str) -> WSGIRequest:
+        return WSGIRequest({
+            **self.environ,
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': path,
+            'wsgi.input': io.BytesIO(),
+        })
+
+
+def _render_pages(pk) -> None:
+    base_url = settings.WARMUP_BASE_URL
+    factory = _Requests(base_url)
+    names = [name for name in _PAGES if base_url or name not in _ORIGIN_PAGES]
+    paths = [reverse(name) for name in names]
+    if pk is not None:
+        names = [name for name in _PROJECT_PAGES if base_url or name not in _ORIGIN_PAGES]
+        paths += [reverse(name, args=[pk]) for name in names]
+    for path in paths:
+        prerender.render(factory, path)
+
+
+def run() -> dict:
+    """Runs every step; returns and remembers the status /healthz/ready reports."""
+    global _status
+    with _lock:
+        started = time.perf_counter()
+        steps = {}
+        errors = []
+        pk = None
+
+        def step(name, func, *args):
+            start = time.perf_counter()
+            try:
+                func(*args)
+            except Exception as exc:
+                logger.exception("Warm-up step %s failed", name)
+                errors.append(f"{name}: {exc}")
+            seconds = time.perf_counter() - start
+            steps[name] = round(seconds * 1000, 1)
+            metrics.observe_startup(name, seconds)
+
+        step('imports', _import_modules)
+        step('database', _connect)
+        if not errors:
+            pk = Project.objects.order_by('-created_at', '-id').values_list('pk', flat=True).first()
+        step('urls', _resolve_urls, pk)
+        step('templates', preload_templates)
+        if not errors:
+            step('pages', _render_pages, pk)
+        total = time.perf_counter() - started
+        metrics.observe_startup('total', total)
+        _status = {
+            "ready": not errors,
+            "total_ms": round(total * 1000, 1),
+            "steps_ms": steps,
+            "errors": errors,
+        }
+        logger.info("Warm-up %s in %.1f ms: %s", 'done' if not errors else 'failed', total * 1000, steps)
+        return _status
+
+
+def status() -> dict | None:
+    return _status
+
+
+def ensure() -> dict:
+    """The last status; runs the warm-up first if it hasn't succeeded yet and
+    no other thread is running it right now."""
+    if (_status is None or not _status['ready']) and not _lock.locked():
+        return run()
+    return _status or {"ready": False, "total_ms": None, "steps_ms": {}, "errors": []}